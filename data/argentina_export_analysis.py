@@ -1,31 +1,33 @@
-import pandas as pd
-import numpy as np
-from scipy import stats
-import matplotlib.pyplot as plt
 import os
 
-# 读取阿根廷出口数据
-df = pd.read_csv('../dataset/agen.csv')
+import pandas as pd
 
-# 去除列名中的空格
-df.columns = df.columns.str.strip()
+import results_store
+from buildcache import fingerprint, is_fresh, module_version, record
+from charts import chart, draw_line_chart, render_all
+from cube import load_cube
+from instrument import phase, write_report
+from loaders import load_indec
+from resampling import resampling_table
 
-# 转换日期列
-df['FECHA_'] = pd.to_datetime(df['FECHA_'])
+AGEN_PATH = '../dataset/agen.csv'
+OUTPUT_DIR = '../dataset/'
+RESULT_FILES = [os.path.join(OUTPUT_DIR, 'argentina_export_tariff_impact.csv'),
+                os.path.join(OUTPUT_DIR, 'argentina_monthly_trends.csv')]
 
 # 设置关税实施时间点（2025年4月9日）
-tariff_date = pd.to_datetime('2025-04-09')
-
-# 筛选2025年的数据用于关税影响分析
-df_2025 = df[df['FECHA_'].dt.year == 2025].copy()
+TARIFF_DATE = pd.Timestamp('2025-04-09')
 
 # 划分关税前后阶段（按月划分）
-pre_tariff_months = [1, 2, 3]  # 关税前月份
-post_tariff_months = [4, 5, 6, 7, 8, 9, 10]  # 关税后月份
+PRE_TARIFF_MONTHS = [1, 2, 3]  # 关税前月份
+POST_TARIFF_MONTHS = [4, 5, 6, 7, 8, 9, 10]  # 关税后月份
+
+
+def load(path=AGEN_PATH):
+    """读取阿根廷出口数据（表头去空格、日期列解析、紧凑类型）"""
+    with phase('load') as p:
+        return p.count(load_indec(path))
 
-# 筛选关税前和关税后的数据
-pre_tariff_data = df_2025[df_2025['FECHA_'].dt.month.isin(pre_tariff_months)].copy()
-post_tariff_data = df_2025[df_2025['FECHA_'].dt.month.isin(post_tariff_months)].copy()
 
 # 定义分析函数
 def export_impact_analysis(pre_data, post_data):
@@ -53,7 +55,9 @@ def export_impact_analysis(pre_data, post_data):
     price_change = post_price_mean - pre_price_mean
     price_change_percent = (price_change / pre_price_mean) * 100 if pre_price_mean != 0 else 0
     
-    # 4. 统计检验
+    # 4. 统计检验（scipy.stats 导入较慢，用到时再加载）
+    from scipy import stats
+
     # 月度数据用于统计检验
     pre_monthly_volume = pre_data.groupby(pre_data['FECHA_'].dt.month)['PESO_NETO_KILOS'].sum().values
     post_monthly_volume = post_data.groupby(post_data['FECHA_'].dt.month)['PESO_NETO_KILOS'].sum().values
@@ -86,6 +90,12 @@ def export_impact_analysis(pre_data, post_data):
         p_value_price = None
         significance_price = "无法计算"
     
+    # 置换检验和 bootstrap 置信区间（三个指标一起计算）
+    resampled = resampling_table(
+        [pre_monthly_volume, pre_monthly_value, pre_monthly_price],
+        [post_monthly_volume, post_monthly_value, post_monthly_price],
+        index=['volume', 'value', 'price'])
+
     # 构建结果字典
     results = {
         'volume': {
@@ -113,202 +123,262 @@ def export_impact_analysis(pre_data, post_data):
             'significance': significance_price
         }
     }
+    for metric, row in resampled.iterrows():
+        results[metric]['perm_p_value'] = row['perm_p_value']
+        results[metric]['ci_low'] = row['ci_low']
+        results[metric]['ci_high'] = row['ci_high']
     
     return results
 
-# 执行分析
-analysis_results = export_impact_analysis(pre_tariff_data, post_tariff_data)
-
-# 打印分析结果
-print(f"\n\n==================== Argentina Soybean Export Tariff Impact Analysis ====================")
-
-# 1. Export Volume Analysis
-print(f"\n1. Export Volume (kg) Analysis:")
-print(f"   Pre-tariff Monthly Avg: {analysis_results['volume']['pre_mean']:,.0f} kg")
-print(f"   Post-tariff Monthly Avg: {analysis_results['volume']['post_mean']:,.0f} kg")
-print(f"   Change: {analysis_results['volume']['change']:,.0f} kg")
-print(f"   Change Percentage: {analysis_results['volume']['change_percent']:.2f}%")
-print(f"   Test Method: Independent Samples t-test")
-print(f"   p-value: {analysis_results['volume']['p_value']:.4f}")
-print(f"   Significance: {analysis_results['volume']['significance']}")
-
-# 2. Export Value Analysis
-print(f"\n2. Export Value (USD) Analysis:")
-print(f"   Pre-tariff Monthly Avg: ${analysis_results['value']['pre_mean']:,.2f}")
-print(f"   Post-tariff Monthly Avg: ${analysis_results['value']['post_mean']:,.2f}")
-print(f"   Change: ${analysis_results['value']['change']:,.2f}")
-print(f"   Change Percentage: {analysis_results['value']['change_percent']:.2f}%")
-print(f"   Test Method: Independent Samples t-test")
-print(f"   p-value: {analysis_results['value']['p_value']:.4f}")
-print(f"   Significance: {analysis_results['value']['significance']}")
-
-# 3. Average Price Analysis
-print(f"\n3. Average Price (USD/kg) Analysis:")
-print(f"   Pre-tariff Avg Price: ${analysis_results['price']['pre_mean']:.4f}/kg")
-print(f"   Post-tariff Avg Price: ${analysis_results['price']['post_mean']:.4f}/kg")
-print(f"   Change: ${analysis_results['price']['change']:.4f}/kg")
-print(f"   Change Percentage: {analysis_results['price']['change_percent']:.2f}%")
-print(f"   Test Method: Independent Samples t-test")
-print(f"   p-value: {analysis_results['price']['p_value']:.4f}")
-print(f"   Significance: {analysis_results['price']['significance']}")
-
-# 4. Comprehensive Assessment
-print(f"\n\n==================== Comprehensive Tariff Impact Assessment ====================")
-print("\nArgentina Soybean Export Impact:")
-
-# Export Volume Assessment
-volume_trend = "increased" if analysis_results['volume']['change'] > 0 else "decreased"
-print(f"   Export Volume: {volume_trend} by {abs(analysis_results['volume']['change_percent']):.2f}% after tariff, impact {analysis_results['volume']['significance']}")
-
-# Export Value Assessment
-value_trend = "increased" if analysis_results['value']['change'] > 0 else "decreased"
-print(f"   Export Value: {value_trend} by {abs(analysis_results['value']['change_percent']):.2f}% after tariff, impact {analysis_results['value']['significance']}")
-
-# Price Assessment
-price_trend = "increased" if analysis_results['price']['change'] > 0 else "decreased"
-print(f"   Price: {price_trend} by {abs(analysis_results['price']['change_percent']):.2f}% after tariff, impact {analysis_results['price']['significance']}")
-
-# 5. 月度趋势分析（包括2023-2025年）
-print(f"\n\n==================== Monthly Trend Analysis (2023-2025) ====================")
-# 按年和月分组进行聚合
-monthly_trends_all_years = df.groupby([df['FECHA_'].dt.year, df['FECHA_'].dt.month]).agg({
-    'PESO_NETO_KILOS': 'sum',
-    'MONTO_FOB_DOLAR': 'sum',
-    'PRECIO_PROMEDIO': 'mean'
-}).round(2)
-
-# 格式化日期为'YYYY-MM'格式用于显示
-monthly_trends_all_years.index = [f"{year}-{month:02d}" for year, month in monthly_trends_all_years.index]
-print(monthly_trends_all_years)
-
-# 2025年月度数据用于保存
-monthly_trends = df_2025.groupby(df_2025['FECHA_'].dt.month).agg({
-    'PESO_NETO_KILOS': 'sum',
-    'MONTO_FOB_DOLAR': 'sum',
-    'PRECIO_PROMEDIO': 'mean'
-}).round(2)
-
-# 保存分析结果到CSV
-results_df = pd.DataFrame({
-    '指标': ['出口量(千克)', '出口额(美元)', '平均价格(美元/千克)'],
-    '关税前平均值': [
-        analysis_results['volume']['pre_mean'],
-        analysis_results['value']['pre_mean'],
-        analysis_results['price']['pre_mean']
-    ],
-    '关税后平均值': [
-        analysis_results['volume']['post_mean'],
-        analysis_results['value']['post_mean'],
-        analysis_results['price']['post_mean']
-    ],
-    '变化量': [
-        analysis_results['volume']['change'],
-        analysis_results['value']['change'],
-        analysis_results['price']['change']
-    ],
-    '变化百分比(%)': [
-        analysis_results['volume']['change_percent'],
-        analysis_results['value']['change_percent'],
-        analysis_results['price']['change_percent']
-    ],
-    'p值': [
-        analysis_results['volume']['p_value'],
-        analysis_results['value']['p_value'],
-        analysis_results['price']['p_value']
-    ],
-    '显著性': [
-        analysis_results['volume']['significance'],
-        analysis_results['value']['significance'],
-        analysis_results['price']['significance']
+
+# 月度趋势的指标：出口量和出口额为合计，价格为平均值
+TREND_MEASURES = {'PESO_NETO_KILOS': 'sum', 'MONTO_FOB_DOLAR': 'sum', 'PRECIO_PROMEDIO': 'mean'}
+
+# 结果数据库中的统一指标名和单位
+STORE_METRICS = {'volume': ('quantity', 'kg'), 'value': ('value', 'USD'), 'price': ('price', 'USD/kg')}
+STORE_TRENDS = {'PESO_NETO_KILOS': 'quantity', 'MONTO_FOB_DOLAR': 'value', 'PRECIO_PROMEDIO': 'price'}
+
+
+def trend_tables(cube):
+    """月度趋势（读取数据立方体）：(2023-2025 年每月的汇总, 2025 年每月的汇总)"""
+    with phase('aggregate'):
+        # 按年和月汇总
+        monthly_trends_all_years = pd.DataFrame({
+            metric: cube.query('argentina', metric, by=('year', 'month'))[measure]
+            for metric, measure in TREND_MEASURES.items()
+        }).round(2)
+
+        # 2025年月度数据用于保存
+        monthly_trends = monthly_trends_all_years.loc[2025]
+
+        # 格式化日期为'YYYY-MM'格式用于显示
+        monthly_trends_all_years.index = [f"{year}-{month:02d}" for year, month in monthly_trends_all_years.index]
+    return monthly_trends_all_years, monthly_trends
+
+
+def analyze(df, cube):
+    """关税影响分析和月度趋势（cube 为 cube.load_cube() 的数据立方体）
+
+    返回 {'impact', 'trends_all_years', 'trends_2025', 'fingerprint'}
+    """
+    # 筛选2025年的数据用于关税影响分析
+    df_2025 = df[df['FECHA_'].dt.year == 2025].copy()
+
+    # 筛选关税前和关税后的数据
+    pre_tariff_data = df_2025[df_2025['FECHA_'].dt.month.isin(PRE_TARIFF_MONTHS)].copy()
+    post_tariff_data = df_2025[df_2025['FECHA_'].dt.month.isin(POST_TARIFF_MONTHS)].copy()
+
+    with phase('test', rows=len(pre_tariff_data) + len(post_tariff_data)):
+        impact = export_impact_analysis(pre_tariff_data, post_tariff_data)
+    trends_all_years, trends_2025 = trend_tables(cube)
+    return {
+        'impact': impact,
+        'trends_all_years': trends_all_years,
+        'trends_2025': trends_2025,
+        'fingerprint': fingerprint(df, TARIFF_DATE, PRE_TARIFF_MONTHS, POST_TARIFF_MONTHS,
+                                   module_version(__file__)),
+    }
+
+
+def print_results(analysis_results):
+    # 打印分析结果
+    print(f"\n\n==================== Argentina Soybean Export Tariff Impact Analysis ====================")
+
+    # 1. Export Volume Analysis
+    print(f"\n1. Export Volume (kg) Analysis:")
+    print(f"   Pre-tariff Monthly Avg: {analysis_results['volume']['pre_mean']:,.0f} kg")
+    print(f"   Post-tariff Monthly Avg: {analysis_results['volume']['post_mean']:,.0f} kg")
+    print(f"   Change: {analysis_results['volume']['change']:,.0f} kg")
+    print(f"   Change Percentage: {analysis_results['volume']['change_percent']:.2f}%")
+    print(f"   Test Method: Independent Samples t-test")
+    print(f"   p-value: {analysis_results['volume']['p_value']:.4f}")
+    print(f"   Permutation p-value: {analysis_results['volume']['perm_p_value']:.4f}")
+    print(f"   Significance: {analysis_results['volume']['significance']}")
+
+    # 2. Export Value Analysis
+    print(f"\n2. Export Value (USD) Analysis:")
+    print(f"   Pre-tariff Monthly Avg: ${analysis_results['value']['pre_mean']:,.2f}")
+    print(f"   Post-tariff Monthly Avg: ${analysis_results['value']['post_mean']:,.2f}")
+    print(f"   Change: ${analysis_results['value']['change']:,.2f}")
+    print(f"   Change Percentage: {analysis_results['value']['change_percent']:.2f}%")
+    print(f"   Test Method: Independent Samples t-test")
+    print(f"   p-value: {analysis_results['value']['p_value']:.4f}")
+    print(f"   Permutation p-value: {analysis_results['value']['perm_p_value']:.4f}")
+    print(f"   Significance: {analysis_results['value']['significance']}")
+
+    # 3. Average Price Analysis
+    print(f"\n3. Average Price (USD/kg) Analysis:")
+    print(f"   Pre-tariff Avg Price: ${analysis_results['price']['pre_mean']:.4f}/kg")
+    print(f"   Post-tariff Avg Price: ${analysis_results['price']['post_mean']:.4f}/kg")
+    print(f"   Change: ${analysis_results['price']['change']:.4f}/kg")
+    print(f"   Change Percentage: {analysis_results['price']['change_percent']:.2f}%")
+    print(f"   Test Method: Independent Samples t-test")
+    print(f"   p-value: {analysis_results['price']['p_value']:.4f}")
+    print(f"   Permutation p-value: {analysis_results['price']['perm_p_value']:.4f}")
+    print(f"   Significance: {analysis_results['price']['significance']}")
+
+    # 4. Comprehensive Assessment
+    print(f"\n\n==================== Comprehensive Tariff Impact Assessment ====================")
+    print("\nArgentina Soybean Export Impact:")
+
+    # Export Volume Assessment
+    volume_trend = "increased" if analysis_results['volume']['change'] > 0 else "decreased"
+    print(f"   Export Volume: {volume_trend} by {abs(analysis_results['volume']['change_percent']):.2f}% after tariff, impact {analysis_results['volume']['significance']}")
+
+    # Export Value Assessment
+    value_trend = "increased" if analysis_results['value']['change'] > 0 else "decreased"
+    print(f"   Export Value: {value_trend} by {abs(analysis_results['value']['change_percent']):.2f}% after tariff, impact {analysis_results['value']['significance']}")
+
+    # Price Assessment
+    price_trend = "increased" if analysis_results['price']['change'] > 0 else "decreased"
+    print(f"   Price: {price_trend} by {abs(analysis_results['price']['change_percent']):.2f}% after tariff, impact {analysis_results['price']['significance']}")
+
+
+def result_tables(results):
+    """(关税影响结果表, 2025 年月度数据表)"""
+    analysis_results = results['impact']
+    results_df = pd.DataFrame({
+        '指标': ['出口量(千克)', '出口额(美元)', '平均价格(美元/千克)'],
+        '关税前平均值': [
+            analysis_results['volume']['pre_mean'],
+            analysis_results['value']['pre_mean'],
+            analysis_results['price']['pre_mean']
+        ],
+        '关税后平均值': [
+            analysis_results['volume']['post_mean'],
+            analysis_results['value']['post_mean'],
+            analysis_results['price']['post_mean']
+        ],
+        '变化量': [
+            analysis_results['volume']['change'],
+            analysis_results['value']['change'],
+            analysis_results['price']['change']
+        ],
+        '变化百分比(%)': [
+            analysis_results['volume']['change_percent'],
+            analysis_results['value']['change_percent'],
+            analysis_results['price']['change_percent']
+        ],
+        'p值': [
+            analysis_results['volume']['p_value'],
+            analysis_results['value']['p_value'],
+            analysis_results['price']['p_value']
+        ],
+        '显著性': [
+            analysis_results['volume']['significance'],
+            analysis_results['value']['significance'],
+            analysis_results['price']['significance']
+        ],
+        '置换检验p值': [
+            analysis_results['volume']['perm_p_value'],
+            analysis_results['value']['perm_p_value'],
+            analysis_results['price']['perm_p_value']
+        ],
+        '变化量95%置信区间下限': [
+            analysis_results['volume']['ci_low'],
+            analysis_results['value']['ci_low'],
+            analysis_results['price']['ci_low']
+        ],
+        '变化量95%置信区间上限': [
+            analysis_results['volume']['ci_high'],
+            analysis_results['value']['ci_high'],
+            analysis_results['price']['ci_high']
+        ]
+    })
+
+    # 保存月度数据
+    trend_df = pd.DataFrame(results['trends_2025']).reset_index()
+    trend_df.columns = ['月份', '出口量(千克)', '出口额(美元)', '平均价格(美元/千克)']
+    return results_df, trend_df
+
+
+def store_records(results):
+    """结果数据库的统一格式：(关税影响, 月度趋势)"""
+    impact = [dict(subject='Global', flow='export', metric=metric, unit=unit, test='Welch t-test',
+                   **{key: value for key, value in results['impact'][name].items() if key != 'significance'})
+              for name, (metric, unit) in STORE_METRICS.items()]
+    trends = results['trends_all_years'].rename_axis('period').reset_index().melt(id_vars='period', var_name='metric')
+    trends = trends.assign(subject='Global', flow='export', metric=trends['metric'].map(STORE_TRENDS))
+    return impact, trends
+
+
+def save(results):
+    """保存结果（输入数据、关税参数和代码都没有变化时跳过）"""
+    # 创建结果目录（如果不存在）
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if not is_fresh(RESULT_FILES, results['fingerprint']):
+        with phase('save'):
+            results_df, trend_df = result_tables(results)
+            results_df.to_csv(RESULT_FILES[0], index=False, encoding='utf-8-sig')
+            trend_df.to_csv(RESULT_FILES[1], index=False, encoding='utf-8-sig')
+            record(RESULT_FILES, results['fingerprint'])
+
+
+def chart_specs(monthly_trends_all_years):
+    """月度出口量、出口额、价格趋势图（英文）"""
+    x_labels = list(monthly_trends_all_years.index)
+
+    # 标记关税实施时间点
+    # 查找2025-04对应的索引位置
+    tax_year_month = '2025-04'
+    tariff_line = None
+    if tax_year_month in x_labels:
+        tariff_line = {'x': x_labels.index(tax_year_month), 'label': 'Tariff Implementation (Apr 2025)'}
+
+    # 只显示部分标签以避免拥挤
+    step = max(1, len(x_labels) // 12)
+    trend_axes = {'xlabel': 'Date (Year-Month)', 'xticks': x_labels[::step], 'ha': 'right', 'vline': tariff_line}
+
+    return [
+        # 1. 月度出口量趋势图（2023-2025）
+        chart('argentina_volume_trend', draw_line_chart,
+              series=[{'x': x_labels, 'y': monthly_trends_all_years['PESO_NETO_KILOS'] / 1000000, 'marker': 'o',
+                       'color': 'blue', 'label': 'Export Volume (Million kg)'}],
+              title='Argentina Soybean Monthly Export Volume Trend (2023-2025)',
+              ylabel='Export Volume (Million kg)', **trend_axes),
+        # 2. 月度出口额趋势图（2023-2025）
+        chart('argentina_value_trend', draw_line_chart,
+              series=[{'x': x_labels, 'y': monthly_trends_all_years['MONTO_FOB_DOLAR'] / 1000000, 'marker': 's',
+                       'color': 'green', 'label': 'Export Value (Million USD)'}],
+              title='Argentina Soybean Monthly Export Value Trend (2023-2025)',
+              ylabel='Export Value (Million USD)', **trend_axes),
+        # 3. 月度价格趋势图（2023-2025）
+        chart('argentina_price_trend', draw_line_chart,
+              series=[{'x': x_labels, 'y': monthly_trends_all_years['PRECIO_PROMEDIO'], 'marker': '^',
+                       'color': 'red', 'label': 'Average Price (USD/kg)'}],
+              title='Argentina Soybean Monthly Average Price Trend (2023-2025)',
+              ylabel='Average Price (USD/kg)', **trend_axes),
     ]
-})
-
-# 保存月度数据
-trend_df = pd.DataFrame(monthly_trends).reset_index()
-trend_df.columns = ['月份', '出口量(千克)', '出口额(美元)', '平均价格(美元/千克)']
-
-# 创建结果目录（如果不存在）
-output_dir = '../dataset/'
-os.makedirs(output_dir, exist_ok=True)
-
-# 保存结果
-results_df.to_csv(os.path.join(output_dir, 'argentina_export_tariff_impact.csv'), index=False, encoding='utf-8-sig')
-trend_df.to_csv(os.path.join(output_dir, 'argentina_monthly_trends.csv'), index=False, encoding='utf-8-sig')
-
-# 生成可视化图表（英文）
-# 1. 月度出口量趋势图（2023-2025）
-plt.figure(figsize=(14, 7))
-x_labels = monthly_trends_all_years.index
-plt.plot(x_labels, monthly_trends_all_years['PESO_NETO_KILOS'] / 1000000, marker='o', linewidth=2, color='blue', label='Export Volume (Million kg)')
-
-# 标记关税实施时间点
-# 查找2025-04对应的索引位置
-tax_year_month = '2025-04'
-if tax_year_month in x_labels:
-    tariff_index = list(x_labels).index(tax_year_month)
-    plt.axvline(x=tariff_index, color='r', linestyle='--', label='Tariff Implementation (Apr 2025)')
-
-plt.title('Argentina Soybean Monthly Export Volume Trend (2023-2025)')
-plt.xlabel('Date (Year-Month)')
-plt.ylabel('Export Volume (Million kg)')
-
-# 优化x轴标签显示
-plt.xticks(rotation=45, ha='right')
-# 只显示部分标签以避免拥挤
-step = max(1, len(x_labels) // 12)
-plt.xticks(x_labels[::step])
-
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('../charts/argentina_volume_trend.png', dpi=300)
-
-# 2. 月度出口额趋势图（2023-2025）
-plt.figure(figsize=(14, 7))
-plt.plot(x_labels, monthly_trends_all_years['MONTO_FOB_DOLAR'] / 1000000, marker='s', linewidth=2, color='green', label='Export Value (Million USD)')
-
-# 标记关税实施时间点
-if tax_year_month in x_labels:
-    plt.axvline(x=tariff_index, color='r', linestyle='--', label='Tariff Implementation (Apr 2025)')
-
-plt.title('Argentina Soybean Monthly Export Value Trend (2023-2025)')
-plt.xlabel('Date (Year-Month)')
-plt.ylabel('Export Value (Million USD)')
-
-# 优化x轴标签显示
-plt.xticks(rotation=45, ha='right')
-plt.xticks(x_labels[::step])
-
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('../charts/argentina_value_trend.png', dpi=300)
-
-# 3. 月度价格趋势图（2023-2025）
-plt.figure(figsize=(14, 7))
-plt.plot(x_labels, monthly_trends_all_years['PRECIO_PROMEDIO'], marker='^', linewidth=2, color='red', label='Average Price (USD/kg)')
-
-# 标记关税实施时间点
-if tax_year_month in x_labels:
-    plt.axvline(x=tariff_index, color='r', linestyle='--', label='Tariff Implementation (Apr 2025)')
-
-plt.title('Argentina Soybean Monthly Average Price Trend (2023-2025)')
-plt.xlabel('Date (Year-Month)')
-plt.ylabel('Average Price (USD/kg)')
-
-# 优化x轴标签显示
-plt.xticks(rotation=45, ha='right')
-plt.xticks(x_labels[::step])
-
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('../charts/argentina_price_trend.png', dpi=300)
-
-print(f"\n\nAnalysis results have been saved to the dataset folder:")
-print(f"- argentina_export_tariff_impact.csv (Argentina Export Tariff Impact)")
-print(f"- argentina_monthly_trends.csv (Monthly Trend Data)")
-print(f"\nCharts have been saved to the charts folder:")
-print(f"- argentina_volume_trend.png (Monthly Export Volume Trend 2023-2025)")
-print(f"- argentina_value_trend.png (Monthly Export Value Trend 2023-2025)")
-print(f"- argentina_price_trend.png (Monthly Average Price Trend 2023-2025)")
\ No newline at end of file
+
+
+def main():
+    results = analyze(load(), load_cube())
+    print_results(results['impact'])
+
+    # 5. 月度趋势分析（包括2023-2025年）
+    print(f"\n\n==================== Monthly Trend Analysis (2023-2025) ====================")
+    print(results['trends_all_years'])
+
+    save(results)
+    # 每次运行的结果都追加到结果数据库
+    with phase('store'):
+        run_id = results_store.record_run('argentina', *store_records(results), fingerprint=results['fingerprint'],
+                                          params={'pre_months': PRE_TARIFF_MONTHS, 'post_months': POST_TARIFF_MONTHS})
+    specs = chart_specs(results['trends_all_years'])
+    with phase('charts', rows=len(specs)):
+        render_all(specs)
+
+    print(f"\n\nAnalysis results have been saved to the dataset folder:")
+    print(f"- argentina_export_tariff_impact.csv (Argentina Export Tariff Impact)")
+    print(f"- argentina_monthly_trends.csv (Monthly Trend Data)")
+    print(f"Results database: {results_store.DB_PATH} (run_id={run_id})")
+    print(f"\nCharts have been saved to the charts folder:")
+    print(f"- argentina_volume_trend.png (Monthly Export Volume Trend 2023-2025)")
+    print(f"- argentina_value_trend.png (Monthly Export Value Trend 2023-2025)")
+    print(f"- argentina_price_trend.png (Monthly Average Price Trend 2023-2025)")
+
+    print(f"\nRun report: {write_report()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import buildcache
+import synth
+from pipeline import DATA_DIR, STAGES, select
+
+# 每个规模一个工作区：dataset/ 放合成数据，charts/ 放图，run/ 为运行目录（脚本的 ../dataset/ 指向工作区）
+WORK_DIR = '../dataset/bench/'
+RESULTS_PATH = '../dataset/benchmark_results.csv'
+
+SIZES = (1_000, 10_000, 100_000)
+
+# 与上次同规模同阶段相比耗时超过该倍数时提示
+REGRESSION_RATIO = 1.25
+
+# 导入检查：分析模块在导入时不应加载这些重依赖（用到时再加载），导入耗时不超过预算
+ANALYSIS_MODULES = ('dataformat', 'tariff_model', 'maps', 'argentina_export_analysis', 'brazil_export_analysis',
+                    'event_sweep', 'pipeline', 'cube', 'server', 'did', 'counterfactual', 'scenario',
+                    'online', 'fx')
+HEAVY_MODULES = ('scipy', 'statsmodels', 'seaborn', 'matplotlib')
+IMPORT_BUDGET_S = 1.0
+
+_IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+wall = time.perf_counter() - start
+print(json.dumps({{'import_s': wall, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def workspace(rows, seed=0, work_dir=WORK_DIR):
+    """准备某一规模的工作区，合成数据的参数和生成代码没变时复用已有数据"""
+    root = os.path.abspath(os.path.join(work_dir, str(rows)))
+    dataset_dir = os.path.join(root, 'dataset')
+    for name in ('dataset', 'charts', 'run'):
+        os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    marker = os.path.join(root, 'synth.json')
+    params = {'rows': rows, 'seed': seed, 'code': buildcache.module_version(synth.__file__)}
+    if os.path.exists(marker):
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f) == params:
+                return root
+    synth.generate(dataset_dir, rows, seed)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return root
+
+
+def reset_caches(root, stage=None):
+    """清除工作区的列式存储和产物指纹，每个阶段都从冷启动开始计时
+
+    数据立方体只在生成它的 cube 阶段之前清除，下游阶段读取上游物化的结果。
+    """
+    names = ['store', '.buildcache'] + (['cube'] if stage in (None, 'cube') else [])
+    for name in names:
+        shutil.rmtree(os.path.join(root, 'dataset', name), ignore_errors=True)
+
+
+def measure(script, cwd, log_path):
+    """在子进程中运行脚本，返回墙钟时间、CPU 时间和峰值常驻内存（子进程自身的 rusage）"""
+    with open(log_path, 'w', encoding='utf-8') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(DATA_DIR, script)], cwd=cwd,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # Linux 的 ru_maxrss 单位为 KB，macOS 为字节
+    max_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {
+        'wall_s': wall,
+        'user_s': usage.ru_utime,
+        'sys_s': usage.ru_stime,
+        'max_rss_mb': max_rss,
+        'returncode': process.returncode,
+    }
+
+
+def import_times(modules=ANALYSIS_MODULES, heavy=HEAVY_MODULES):
+    """每个模块在新的解释器中单独导入，返回导入耗时和导入时加载的重依赖"""
+    records = []
+    for module in modules:
+        probe = subprocess.run([sys.executable, '-c', _IMPORT_PROBE.format(module=module, heavy=tuple(heavy))],
+                               cwd=DATA_DIR, capture_output=True, text=True)
+        if probe.returncode != 0:
+            records.append({'module': module, 'import_s': None, 'heavy': None, 'error': probe.stderr.strip()})
+        else:
+            records.append(dict(module=module, error='', **json.loads(probe.stdout)))
+    return pd.DataFrame(records)
+
+
+def import_violations(imports, budget=IMPORT_BUDGET_S):
+    """导入失败、超过预算或在导入时加载了重依赖的模块"""
+    failed = imports['error'] != ''
+    slow = imports['import_s'].fillna(float('inf')) > budget
+    heavy = imports['heavy'].map(lambda names: bool(names))
+    return imports[failed | slow | heavy]
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DATA_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_benchmark(sizes=SIZES, stages=STAGES, repeat=1, seed=0, work_dir=WORK_DIR, verbose=True):
+    """按规模依次运行各阶段（串行，避免相互干扰），返回每次运行一行的结果表"""
+    run_info = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': _commit(),
+                'python': platform.python_version(), 'pandas': pd.__version__}
+    records = []
+    for rows in sizes:
+        root = workspace(rows, seed, work_dir)
+        for spec in stages:
+            for attempt in range(repeat):
+                reset_caches(root, spec['name'])
+                log_path = os.path.join(root, f"{spec['name']}.log")
+                result = measure(spec['script'], os.path.join(root, 'run'), log_path)
+                records.append(dict(run_info, rows=rows, stage=spec['name'], repeat=attempt, **result))
+                if verbose:
+                    status = '' if result['returncode'] == 0 else f"  失败，见 {log_path}"
+                    print(f"{rows:>11} {spec['name']:<14}{result['wall_s']:>8.2f}s {result['max_rss_mb']:>9.1f}MB{status}")
+    return pd.DataFrame(records)
+
+
+def save_results(results, path=RESULTS_PATH):
+    """追加到结果文件，保留历史以便比较"""
+    results.to_csv(path, mode='a', header=not os.path.exists(path), index=False, encoding='utf-8')
+
+
+def scaling(results):
+    """每个阶段相邻规模之间的耗时增长指数：log(耗时比) / log(行数比)，接近 1 为线性"""
+    wall = results.groupby(['stage', 'rows'])['wall_s'].median().unstack('rows')
+    sizes = wall.columns.to_numpy(dtype=float)
+    exponents = np.log(wall.to_numpy()[:, 1:] / wall.to_numpy()[:, :-1]) / np.log(sizes[1:] / sizes[:-1])
+    labels = [f'{small}→{large}' for small, large in zip(wall.columns[:-1], wall.columns[1:])]
+    return pd.DataFrame(exponents, index=wall.index, columns=labels)
+
+
+def regressions(results, history, ratio=REGRESSION_RATIO):
+    """与历史结果中同规模同阶段的上一次运行相比，耗时增长超过 ratio 倍的条目"""
+    if history is None or history.empty:
+        return pd.DataFrame()
+    previous = (history[history['returncode'] == 0].groupby(['stage', 'rows', 'timestamp'])['wall_s'].median()
+                .groupby(level=['stage', 'rows']).last())
+    current = results.groupby(['stage', 'rows'])['wall_s'].median()
+    compared = pd.DataFrame({'previous_s': previous, 'current_s': current}).dropna()
+    compared['ratio'] = compared['current_s'] / compared['previous_s']
+    return compared[compared['ratio'] > ratio]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='在不同规模的合成数据上测量各阶段的耗时和峰值内存')
+    parser.add_argument('--sizes', type=float, nargs='+', default=SIZES, help='每个数据源的行数，例如 1e3 1e5 1e7')
+    parser.add_argument('--stages', nargs='+', default=None, help='只测这些阶段（及其上游）')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--imports', action='store_true',
+                        help=f'只检查分析模块的导入：不加载重依赖且耗时不超过 {IMPORT_BUDGET_S} 秒，不满足时返回非零')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_S)
+    args = parser.parse_args()
+
+    if args.imports:
+        imports = import_times()
+        print(imports.to_string(index=False, columns=['module', 'import_s', 'heavy']))
+        violations = import_violations(imports, args.import_budget)
+        if not violations.empty:
+            print(f'\n导入检查未通过（预算 {args.import_budget} 秒，不得加载 {", ".join(HEAVY_MODULES)}）：')
+            print(violations.to_string(index=False))
+            sys.exit(1)
+        print('\n导入检查通过')
+        sys.exit(0)
+
+    stages = select(STAGES, args.stages) if args.stages else STAGES
+    history = pd.read_csv(args.output) if os.path.exists(args.output) else None
+
+    results = run_benchmark([int(size) for size in args.sizes], stages, args.repeat, args.seed)
+    save_results(results, args.output)
+
+    summary = results.groupby(['stage', 'rows']).agg(wall_s=('wall_s', 'median'), max_rss_mb=('max_rss_mb', 'max'))
+    print('\n耗时（秒，中位数）')
+    print(summary['wall_s'].unstack('rows').round(2).to_string())
+    print('\n峰值内存（MB）')
+    print(summary['max_rss_mb'].unstack('rows').round(1).to_string())
+    if results['rows'].nunique() > 1:
+        print('\n耗时增长指数（1 为线性）')
+        print(scaling(results).round(2).to_string())
+    slower = regressions(results, history)
+    if not slower.empty:
+        print(f'\n比上次慢 {REGRESSION_RATIO} 倍以上：')
+        print(slower.round(2).to_string())
+    print(f"\n结果已追加至 {args.output}")
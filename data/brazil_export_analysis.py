@@ -1,221 +1,232 @@
-import pandas as pd
+import os
+
 import numpy as np
-from scipy import stats
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
+import pandas as pd
 
-# 读取数据
-df = pd.read_csv('../dataset/braz.csv')
+import results_store
+from buildcache import fingerprint, is_fresh, module_version, record
+from charts import chart, draw_line_chart, render_all
+from cube import load_cube
+from impact import grouped_impact
+from instrument import instrumented, phase, write_report
+from loaders import load_comex
+from market_share import monthly_pivot, period_share, share_series
 
-# 创建日期列
-df['date'] = pd.to_datetime(df[['Year', 'Month']].assign(day=1))
+BRAZ_PATH = '../dataset/braz.csv'
+OUTPUT_DIR = '../dataset/'
+RESULT_FILES = [os.path.join(OUTPUT_DIR, 'brazil_global_export_impact.csv'),
+                os.path.join(OUTPUT_DIR, 'brazil_country_export_impact.csv')]
 
 # 关税实施时间点（根据之前的分析，关税时间是2025年4月9日）
-tariff_date = pd.to_datetime('2025-04-09')
-
-# 筛选2023-2025年的数据
-df_2023_2025 = df[(df['Year'] >= 2023) & (df['Year'] <= 2025)].copy()
-
-# 筛选2025年的数据
-df_2025 = df[df['Year'] == 2025].copy()
+TARIFF_DATE = pd.Timestamp('2025-04-09')
 
 # 划分关税前后阶段（按月划分）
-pre_tariff_months = [1, 2, 3]  # 关税前月份
-post_tariff_months = [4, 5, 6, 7, 8, 9, 10]  # 关税后月份
+PRE_TARIFF_MONTHS = [1, 2, 3]  # 关税前月份
+POST_TARIFF_MONTHS = [4, 5, 6, 7, 8, 9, 10]  # 关税后月份
+
+# 结果列名
+RESULT_COLUMNS = {
+    'pre_mean': 'Pre-Tariff Monthly Avg (USD)',
+    'post_mean': 'Post-Tariff Monthly Avg (USD)',
+    'pre_total': 'Pre-Tariff Total (USD)',
+    'post_total': 'Post-Tariff Total (USD)',
+    'change': 'Monthly Avg Change (USD)',
+    'change_percent': 'Change Percentage (%)',
+    'period_total_change': 'Monthly Total Change (USD)',
+    'p_value': 'p-value',
+    'perm_p_value': 'Permutation p-value',
+    'period_total_ci_low': 'Monthly Total Change 95% CI Low (USD)',
+    'period_total_ci_high': 'Monthly Total Change 95% CI High (USD)',
+}
+
+# 结果数据库中的统一指标名和单位
+STORE_METRIC = ('value', 'USD')
+
+
+def load(path=BRAZ_PATH):
+    """读取数据：汇总为 年 × 月 × 目的地（设置 COMEX_CHUNKSIZE 时分块读取），并生成日期列"""
+    with phase('load') as p:
+        df = p.count(load_comex(path))
+
+    # 创建日期列
+    with phase('decode', rows=len(df)):
+        df['date'] = pd.to_datetime(df[['Year', 'Month']].assign(day=1))
+    return df
 
-# 筛选关税前和关税后的数据
-pre_tariff_data = df_2025[df_2025['Month'].isin(pre_tariff_months)].copy()
-post_tariff_data = df_2025[df_2025['Month'].isin(post_tariff_months)].copy()
 
 # 定义分析函数
-def export_impact_analysis(pre_data, post_data, country_name=None):
-    """Analyze the impact of tariffs on Brazil soybean exports"""
-    # If country is specified, filter data for that country
-    if country_name:
-        pre_data = pre_data[pre_data['Country'] == country_name].copy()
-        post_data = post_data[post_data['Country'] == country_name].copy()
-    
-    # Check if data is empty
-    if pre_data.empty or post_data.empty:
-        return None
-    
-    # Calculate monthly averages
-    pre_mean = pre_data['US$ FOB'].mean()
-    post_mean = post_data['US$ FOB'].mean()
-    
-    # Calculate total export values
-    pre_total = pre_data['US$ FOB'].sum()
-    post_total = post_data['US$ FOB'].sum()
-    
-    # Calculate change and percentage change
-    change = post_mean - pre_mean
-    change_percent = (change / pre_mean) * 100 if pre_mean != 0 else 0
-    
-    # Monthly data for statistical test
-    pre_monthly_data = pre_data.groupby('Month')['US$ FOB'].sum().values
-    post_monthly_data = post_data.groupby('Month')['US$ FOB'].sum().values
-    
-    # Hypothesis test
-    try:
-        _, p_value = stats.ttest_ind(pre_monthly_data, post_monthly_data, equal_var=False)
-        significance = "Significant" if p_value < 0.05 else "Not Significant"
-    except:
-        p_value = None
-        significance = "Cannot Calculate"
-    
+@instrumented('test')
+def export_impact_table(pre_data, post_data, by_country=True):
+    """Analyze the impact of tariffs on Brazil soybean exports for every destination in one pass"""
+    result = grouped_impact(pre_data, post_data, 'US$ FOB', 'Month', 'Country' if by_country else None, resample=True)
+    result.insert(result.columns.get_loc('p_value') + 1, 'Significance',
+                  np.where(result['p_value'] < 0.05, 'Significant', 'Not Significant'))
+    result = result.rename(columns=RESULT_COLUMNS)
+    result.insert(0, 'Country', result.index if by_country else 'Global')
+    return result.reset_index(drop=True)
+
+
+def analyze(df, cube):
+    """全球和各目的地的关税影响、2025 年月度趋势、中国份额（月度汇总读取数据立方体 cube）
+
+    返回 {'global', 'countries', 'monthly_trends', 'monthly_pivot', 'china_share', 'fingerprint'}，
+    china_share 为 {'pre', 'post'}（百分比）。
+    """
+    # 筛选2025年的数据
+    df_2025 = df[df['Year'] == 2025].copy()
+
+    # 筛选关税前和关税后的数据
+    pre_tariff_data = df_2025[df_2025['Month'].isin(PRE_TARIFF_MONTHS)].copy()
+    post_tariff_data = df_2025[df_2025['Month'].isin(POST_TARIFF_MONTHS)].copy()
+
+    # 出口目的地（基于2025年数据排序）
+    destination_order = df_2025.groupby('Country', observed=True)['US$ FOB'].sum().sort_values(ascending=False).index
+    destination_rank = {country: rank for rank, country in enumerate(destination_order)}
+
+    global_df = export_impact_table(pre_tariff_data, post_tariff_data, by_country=False)
+    country_df = export_impact_table(pre_tariff_data, post_tariff_data)
+    country_df = country_df.sort_values('Country', key=lambda s: s.map(destination_rank), ignore_index=True)
+
+    with phase('aggregate'):
+        # Year × month × destination totals for 2023-2025 from the cube
+        monthly = cube.query('brazil', 'US$ FOB', by=('year', 'month', 'partner'), year=[2023, 2024, 2025])['sum']
+        monthly = monthly.rename_axis(['Year', 'Month', 'Country']).rename('US$ FOB').reset_index()
+
+        monthly_trends = cube.query('brazil', 'US$ FOB', by=('month', 'partner'), year=2025)['sum'].unstack().fillna(0)
+        monthly_trends = monthly_trends.rename_axis(index='Month', columns='Country')
+        monthly_trends['Total'] = monthly_trends.sum(axis=1)
+
+        # China's share of Brazil's total exports, from the month × destination pivot
+        monthly_pivot_all = monthly_pivot(monthly)
+    months_2025 = monthly_pivot_all.index[monthly_pivot_all.index.year == 2025]
+    china_share = {
+        'pre': period_share(monthly_pivot_all, months_2025[months_2025.month.isin(PRE_TARIFF_MONTHS)], ['China'])['China'],
+        'post': period_share(monthly_pivot_all, months_2025[months_2025.month.isin(POST_TARIFF_MONTHS)], ['China'])['China'],
+    }
+
     return {
-        "Country": country_name if country_name else "Global",
-        "Pre-Tariff Monthly Avg (USD)": pre_mean,
-        "Post-Tariff Monthly Avg (USD)": post_mean,
-        "Pre-Tariff Total (USD)": pre_total,
-        "Post-Tariff Total (USD)": post_total,
-        "Monthly Avg Change (USD)": change,
-        "Change Percentage (%)": change_percent,
-        "p-value": p_value,
-        "Significance": significance
+        'global': global_df,
+        'countries': country_df,
+        'monthly_trends': monthly_trends,
+        'monthly_pivot': monthly_pivot_all,
+        'china_share': china_share,
+        'fingerprint': fingerprint(df, TARIFF_DATE, PRE_TARIFF_MONTHS, POST_TARIFF_MONTHS,
+                                   module_version(__file__)),
     }
 
-# 获取主要出口目的地（基于2025年数据）
-top_countries = df_2025.groupby('Country')['US$ FOB'].sum().sort_values(ascending=False).head(10).index.tolist()
-
-# 1. Global overall analysis
-print("==================== Brazil Soybean Export Tariff Impact Analysis ====================")
-global_result = export_impact_analysis(pre_tariff_data, post_tariff_data)
-print(f"\n1. Global Overall Impact：")
-print(f"   Pre-Tariff Monthly Avg: ${global_result['Pre-Tariff Monthly Avg (USD)']:,.2f}")
-print(f"   Post-Tariff Monthly Avg: ${global_result['Post-Tariff Monthly Avg (USD)']:,.2f}")
-print(f"   Change: ${global_result['Monthly Avg Change (USD)']:,.2f}")
-print(f"   Change Percentage: {global_result['Change Percentage (%)']:.2f}%")
-print(f"   Significance: {global_result['Significance']}")
-
-# 2. Major countries analysis
-print(f"\n2. Major Export Countries/Regions Impact：")
-country_results = []
-for country in top_countries:
-    result = export_impact_analysis(pre_tariff_data, post_tariff_data, country)
-    if result:
-        country_results.append(result)
+
+def print_results(results):
+    # 1. Global overall analysis
+    print("==================== Brazil Soybean Export Tariff Impact Analysis ====================")
+    global_result = results['global'].iloc[0]
+    print(f"\n1. Global Overall Impact：")
+    print(f"   Pre-Tariff Monthly Avg: ${global_result['Pre-Tariff Monthly Avg (USD)']:,.2f}")
+    print(f"   Post-Tariff Monthly Avg: ${global_result['Post-Tariff Monthly Avg (USD)']:,.2f}")
+    print(f"   Change: ${global_result['Monthly Avg Change (USD)']:,.2f}")
+    print(f"   Change Percentage: {global_result['Change Percentage (%)']:.2f}%")
+    print(f"   Significance: {global_result['Significance']}")
+
+    # 2. All destination countries analysis
+    print(f"\n2. Export Countries/Regions Impact：")
+    for _, result in results['countries'].iterrows():
         trend = "increased" if result["Monthly Avg Change (USD)"] > 0 else "decreased"
-        print(f"   {country}: Post-tariff monthly avg exports {trend} by {abs(result['Change Percentage (%)']):.2f}%, impact is {result['Significance']}")
-
-# 3. Special focus on China market
-china_result = export_impact_analysis(pre_tariff_data, post_tariff_data, 'China')
-print(f"\n3. China Market Special Analysis：")
-print(f"   Pre-Tariff Monthly Avg: ${china_result['Pre-Tariff Monthly Avg (USD)']:,.2f}")
-print(f"   Post-Tariff Monthly Avg: ${china_result['Post-Tariff Monthly Avg (USD)']:,.2f}")
-print(f"   Change: ${china_result['Monthly Avg Change (USD)']:,.2f}")
-print(f"   Change Percentage: {china_result['Change Percentage (%)']:.2f}%")
-print(f"   Significance: {china_result['Significance']}")
-
-# 4. Monthly trend analysis
-print(f"\n4. 2025 Monthly Export Trends：")
-monthly_trends = df_2025.groupby(['Month', 'Country'])['US$ FOB'].sum().unstack().fillna(0)
-monthly_trends['Total'] = monthly_trends.sum(axis=1)
-print(monthly_trends[['China', 'Total']])
-
-# 5. China's share of Brazil's total exports
-print(f"\n5. China's Share of Brazil's Total Soybean Exports：")
-china_percentage_pre = pre_tariff_data[pre_tariff_data['Country'] == 'China']['US$ FOB'].sum() / pre_tariff_data['US$ FOB'].sum() * 100
-china_percentage_post = post_tariff_data[post_tariff_data['Country'] == 'China']['US$ FOB'].sum() / post_tariff_data['US$ FOB'].sum() * 100
-print(f"   Pre-Tariff: {china_percentage_pre:.2f}%")
-print(f"   Post-Tariff: {china_percentage_post:.2f}%")
-print(f"   Change: {(china_percentage_post - china_percentage_pre):.2f} percentage points")
-
-# 保存结果到CSV
-global_df = pd.DataFrame([global_result])
-country_df = pd.DataFrame(country_results)
-
-# Create result directory if it doesn't exist
-import os
-output_dir = '../dataset/'
-os.makedirs(output_dir, exist_ok=True)
-
-# Save results
-global_df.to_csv(os.path.join(output_dir, 'brazil_global_export_impact.csv'), index=False, encoding='utf-8-sig')
-country_df.to_csv(os.path.join(output_dir, 'brazil_country_export_impact.csv'), index=False, encoding='utf-8-sig')
-
-# Generate visualization charts
-
-# 1. Monthly export trend chart (2023-2025)
-plt.figure(figsize=(14, 7))
-# Prepare data for 2023-2025 monthly trends
-df_2023_2025['year_month'] = df_2023_2025['date'].dt.strftime('%Y-%m')
-monthly_data_all = df_2023_2025.groupby('year_month')['US$ FOB'].sum().reset_index()
-monthly_data_all['date'] = pd.to_datetime(monthly_data_all['year_month'])
-monthly_data_all = monthly_data_all.sort_values('date')
-
-# China data for 2023-2025
-china_data_all = df_2023_2025[df_2023_2025['Country'] == 'China'].groupby('year_month')['US$ FOB'].sum().reset_index()
-china_data_all['date'] = pd.to_datetime(china_data_all['year_month'])
-china_data_all = china_data_all.sort_values('date')
-
-# Plot the data
-plt.plot(monthly_data_all['date'], monthly_data_all['US$ FOB'], marker='o', linewidth=2, label='Global Export Value')
-plt.plot(china_data_all['date'], china_data_all['US$ FOB'], marker='s', linewidth=2, label='Export to China')
-
-# Add tariff implementation line
-plt.axvline(x=pd.to_datetime('2025-04-01'), color='r', linestyle='--', label='Tariff Implementation')
-
-# Set x-ticks for better readability
-plt.xticks(pd.date_range(start='2023-01-01', end='2025-10-01', freq='3M'), rotation=45)
-
-plt.title('Brazil Soybean Monthly Export Trend (2023-2025)')
-plt.xlabel('Date')
-plt.ylabel('Export Value (USD)')
-plt.legend()
-plt.grid(True)
-plt.ticklabel_format(style='plain', axis='y')
-plt.tight_layout()
-plt.savefig('../charts/brazil_export_trend.png', dpi=300)
-
-# 2. China market share trend chart (2023-2025)
-plt.figure(figsize=(14, 7))
-# Calculate China's share for each month from 2023-2025
-monthly_shares = []
-monthly_dates = []
-
-for year in range(2023, 2026):
-    for month in range(1, 13):
-        # Skip future months in 2025 if needed
-        if year == 2025 and month > 10:
-            break
-        
-        month_data = df[(df['Year'] == year) & (df['Month'] == month)]
-        total_value = month_data['US$ FOB'].sum()
-        china_value = month_data[month_data['Country'] == 'China']['US$ FOB'].sum()
-        
-        if total_value > 0:
-            share = (china_value / total_value) * 100
-        else:
-            share = 0
-        
-        monthly_shares.append(share)
-        monthly_dates.append(f"{year}-{month:02d}")
-
-# Convert to datetime for plotting
-monthly_dates_dt = pd.to_datetime(monthly_dates)
-
-# Plot the data
-plt.plot(monthly_dates_dt, monthly_shares, marker='o', linewidth=2, color='green')
-
-# Add tariff implementation line
-plt.axvline(x=pd.to_datetime('2025-04-01'), color='r', linestyle='--', label='Tariff Implementation')
-
-# Set x-ticks for better readability
-plt.xticks(pd.date_range(start='2023-01-01', end='2025-10-01', freq='3M'), rotation=45)
-
-plt.title('China\'s Monthly Share of Brazil\'s Soybean Exports (2023-2025)')
-plt.xlabel('Date')
-plt.ylabel('Share (%)')
-plt.legend()
-plt.grid(True)
-plt.tight_layout()
-plt.savefig('../charts/brazil_china_percentage.png', dpi=300)
-
-print(f"\n\nAnalysis results have been saved：")
-print(f"- brazil_global_export_impact.csv (Brazil Global Export Tariff Impact)")
-print(f"- brazil_country_export_impact.csv (Major Countries Export Tariff Impact)")
-print(f"\nCharts have been saved：")
-print(f"- brazil_export_trend.png (Monthly Export Trend 2023-2025)")
-print(f"- brazil_china_percentage.png (China Market Share Trend 2023-2025)")
\ No newline at end of file
+        print(f"   {result['Country']}: Post-tariff monthly avg exports {trend} by {abs(result['Change Percentage (%)']):.2f}%, impact is {result['Significance']}")
+
+    # 3. Special focus on China market
+    china_result = results['countries'].set_index('Country').loc['China']
+    print(f"\n3. China Market Special Analysis：")
+    print(f"   Pre-Tariff Monthly Avg: ${china_result['Pre-Tariff Monthly Avg (USD)']:,.2f}")
+    print(f"   Post-Tariff Monthly Avg: ${china_result['Post-Tariff Monthly Avg (USD)']:,.2f}")
+    print(f"   Change: ${china_result['Monthly Avg Change (USD)']:,.2f}")
+    print(f"   Change Percentage: {china_result['Change Percentage (%)']:.2f}%")
+    print(f"   Significance: {china_result['Significance']}")
+
+    # 4. Monthly trend analysis
+    print(f"\n4. 2025 Monthly Export Trends：")
+    print(results['monthly_trends'][['China', 'Total']])
+
+    # 5. China's share of Brazil's total exports
+    china_percentage_pre, china_percentage_post = results['china_share']['pre'], results['china_share']['post']
+    print(f"\n5. China's Share of Brazil's Total Soybean Exports：")
+    print(f"   Pre-Tariff: {china_percentage_pre:.2f}%")
+    print(f"   Post-Tariff: {china_percentage_post:.2f}%")
+    print(f"   Change: {(china_percentage_post - china_percentage_pre):.2f} percentage points")
+
+
+def store_records(results):
+    """Rows for the results database: (impact for Global and every destination, monthly value by destination)"""
+    columns = {label: name for name, label in RESULT_COLUMNS.items()}
+    impact = pd.concat([results['global'], results['countries']], ignore_index=True).rename(columns=columns)
+    impact = impact.rename(columns={'Country': 'subject'}).drop(columns='Significance').assign(
+        flow='export', metric=STORE_METRIC[0], unit=STORE_METRIC[1], test='Welch t-test')
+    pivot = results['monthly_pivot'].assign(Global=lambda df: df.sum(axis=1))
+    pivot.index = pivot.index.strftime('%Y-%m')
+    trends = pivot.rename_axis(index='period', columns='subject').stack().rename('value').reset_index().assign(
+        flow='export', metric=STORE_METRIC[0])
+    return impact, trends
+
+
+def save(results):
+    """Save results (skipped when the input data, tariff parameters and code are unchanged)"""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if not is_fresh(RESULT_FILES, results['fingerprint']):
+        with phase('save'):
+            results['global'].to_csv(RESULT_FILES[0], index=False, encoding='utf-8-sig')
+            results['countries'].to_csv(RESULT_FILES[1], index=False, encoding='utf-8-sig')
+            record(RESULT_FILES, results['fingerprint'])
+
+
+def chart_specs(monthly_pivot_all):
+    """Monthly export trend and China share charts"""
+    # Monthly totals and China series for 2023-2025 come from the month × destination pivot
+    monthly_data_all = monthly_pivot_all.sum(axis=1)
+    china_data_all = monthly_pivot_all['China']
+
+    # China's share for each month, from the same month × destination pivot
+    monthly_shares = share_series(monthly_pivot_all, ['China'])['China']
+
+    # Tariff implementation line and x-ticks for better readability
+    tariff_line = {'x': pd.to_datetime('2025-04-01'), 'label': 'Tariff Implementation'}
+    quarter_ticks = monthly_pivot_all.index[::3]
+
+    return [
+        # 1. Monthly export trend chart (2023-2025)
+        chart('brazil_export_trend', draw_line_chart,
+              series=[{'x': monthly_data_all.index, 'y': monthly_data_all.values, 'marker': 'o', 'label': 'Global Export Value'},
+                      {'x': china_data_all.index, 'y': china_data_all.values, 'marker': 's', 'label': 'Export to China'}],
+              vline=tariff_line, xticks=quarter_ticks, plain_y=True,
+              title='Brazil Soybean Monthly Export Trend (2023-2025)', xlabel='Date', ylabel='Export Value (USD)'),
+        # 2. China market share trend chart (2023-2025)
+        chart('brazil_china_percentage', draw_line_chart,
+              series=[{'x': monthly_shares.index, 'y': monthly_shares.values, 'marker': 'o', 'color': 'green'}],
+              vline=tariff_line, xticks=quarter_ticks,
+              title='China\'s Monthly Share of Brazil\'s Soybean Exports (2023-2025)', xlabel='Date', ylabel='Share (%)'),
+    ]
+
+
+def main():
+    results = analyze(load(), load_cube())
+    print_results(results)
+    save(results)
+    # Every run is appended to the results database
+    with phase('store'):
+        run_id = results_store.record_run('brazil', *store_records(results), fingerprint=results['fingerprint'],
+                                          params={'pre_months': PRE_TARIFF_MONTHS, 'post_months': POST_TARIFF_MONTHS})
+
+    specs = chart_specs(results['monthly_pivot'])
+    with phase('charts', rows=len(specs)):
+        render_all(specs)
+
+    print(f"\n\nAnalysis results have been saved：")
+    print(f"- brazil_global_export_impact.csv (Brazil Global Export Tariff Impact)")
+    print(f"- brazil_country_export_impact.csv (Major Countries Export Tariff Impact)")
+    print(f"Results database: {results_store.DB_PATH} (run_id={run_id})")
+    print(f"\nCharts have been saved：")
+    print(f"- brazil_export_trend.png (Monthly Export Trend 2023-2025)")
+    print(f"- brazil_china_percentage.png (China Market Share Trend 2023-2025)")
+
+    print(f"\nRun report: {write_report()}")
+
+
+if __name__ == '__main__':
+    main()
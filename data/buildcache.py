@@ -0,0 +1,121 @@
+import ast
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# 每个产物一个记录文件，多个脚本同时运行时互不覆盖
+CACHE_DIR = '../dataset/.buildcache/'
+
+# code_version 中的相对路径按 data/ 目录解析，脚本不在 data/ 下运行时也能找到同级模块
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _update(digest, obj):
+    """把对象内容写入摘要（DataFrame/Series 按内容哈希，函数按限定名）"""
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        digest.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            digest.update(repr(list(obj.columns)).encode())
+            digest.update(repr(list(obj.dtypes.astype(str))).encode())
+        else:
+            digest.update(str(obj.dtype).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index)).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        digest.update(f'{obj.dtype}{obj.shape}'.encode())
+        digest.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, dict):
+        digest.update(b'{')
+        for key in sorted(obj, key=repr):
+            _update(digest, key)
+            _update(digest, obj[key])
+        digest.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b'[')
+        for item in obj:
+            _update(digest, item)
+        digest.update(b']')
+    elif callable(obj):
+        digest.update(f'{obj.__module__}.{obj.__qualname__}'.encode())
+    else:
+        digest.update(repr(obj).encode())
+    digest.update(b';')
+
+
+def fingerprint(*parts):
+    """输入数据切片、分析参数和代码版本的组合指纹"""
+    digest = hashlib.sha256()
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+def code_version(*paths):
+    """若干源文件内容的指纹，paths 可以是文件路径或模块"""
+    digest = hashlib.sha256()
+    for path in paths:
+        path = os.path.join(SOURCE_DIR, getattr(path, '__file__', path))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def local_modules(path, source_dir=SOURCE_DIR):
+    """模块及其（递归）导入的 data/ 下同级模块的文件路径"""
+    pending, found = [os.path.join(source_dir, path)], []
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.append(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                module_path = os.path.join(source_dir, name.split('.')[0] + '.py')
+                if os.path.exists(module_path):
+                    pending.append(module_path)
+    return sorted(found)
+
+
+def module_version(path):
+    """模块及其递归导入的全部同级模块的 code_version，任一依赖变化时缓存失效"""
+    return code_version(*local_modules(path))
+
+
+def _record_path(artifact, cache_dir):
+    key = hashlib.sha256(os.path.normpath(os.path.abspath(artifact)).encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, f'{key}.json')
+
+
+def is_fresh(artifacts, fp, cache_dir=CACHE_DIR):
+    """产物都存在且记录的指纹与 fp 相同时返回 True"""
+    for artifact in artifacts:
+        if not os.path.exists(artifact):
+            return False
+        record_path = _record_path(artifact, cache_dir)
+        if not os.path.exists(record_path):
+            return False
+        with open(record_path, encoding='utf-8') as f:
+            if json.load(f).get('fingerprint') != fp:
+                return False
+    return True
+
+
+def record(artifacts, fp, cache_dir=CACHE_DIR):
+    """记录产物的指纹"""
+    os.makedirs(cache_dir, exist_ok=True)
+    for artifact in artifacts:
+        record_path = _record_path(artifact, cache_dir)
+        tmp_path = f'{record_path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'artifact': os.path.normpath(artifact), 'fingerprint': fp}, f, ensure_ascii=False)
+        os.replace(tmp_path, record_path)
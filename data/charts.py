@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import buildcache
+
+CHART_DIR = '../charts/'
+
+# 默认分辨率和输出格式，可用环境变量 CHART_DPI、CHART_FORMATS（逗号分隔）覆盖
+DEFAULT_DPI = int(os.environ.get('CHART_DPI', 300))
+DEFAULT_FORMATS = tuple(os.environ.get('CHART_FORMATS', 'png').split(','))
+
+
+def _pyplot():
+    """matplotlib 导入较慢，第一次绘图时才加载（只输出文件，不打开窗口）"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def chart(name, draw, figsize=(14, 7), savefig=None, **params):
+    """声明一张图
+
+    name 为输出文件名（不含扩展名），draw(fig, **params) 负责在 fig 上绘图，
+    savefig 为额外传给 fig.savefig 的参数（例如 bbox_inches）。
+    """
+    return {'name': name, 'draw': draw, 'figsize': figsize, 'savefig': savefig or {}, 'params': params}
+
+
+def render(spec, chart_dir=CHART_DIR, dpi=DEFAULT_DPI, formats=DEFAULT_FORMATS):
+    """绘制并保存一张图，保存后立即释放 figure，返回输出文件列表"""
+    plt = _pyplot()
+    fig = plt.figure(figsize=spec['figsize'])
+    try:
+        spec['draw'](fig, **spec['params'])
+        paths = chart_paths(spec, chart_dir, formats)
+        for path, fmt in zip(paths, formats):
+            fig.savefig(path, dpi=dpi, format=fmt, **spec['savefig'])
+        return paths
+    finally:
+        plt.close(fig)
+
+
+def _pool_context():
+    # 有 fork 时用 fork（子进程不必重新导入模块，启动更快）；其他平台用默认的 spawn/forkserver，
+    # 各分析脚本的入口都在 main() 中，子进程导入脚本时不会重新运行分析
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def chart_paths(spec, chart_dir=CHART_DIR, formats=DEFAULT_FORMATS):
+    """一张图的输出文件列表"""
+    return [os.path.join(chart_dir, f"{spec['name']}.{fmt}") for fmt in formats]
+
+
+def render_all(specs, chart_dir=CHART_DIR, dpi=DEFAULT_DPI, formats=DEFAULT_FORMATS, max_workers=None, cache=True):
+    """用进程池并行绘制一组图，返回 {name: [输出文件]}
+
+    cache 为 True 时，图的数据、参数和绘图代码都没有变化的图直接跳过。
+    """
+    os.makedirs(chart_dir, exist_ok=True)
+    fingerprints = {}
+    if cache:
+        version = buildcache.module_version(__file__)
+        fingerprints = {spec['name']: buildcache.fingerprint(spec, dpi, formats, version) for spec in specs}
+    pending = [spec for spec in specs
+               if not (cache and buildcache.is_fresh(chart_paths(spec, chart_dir, formats), fingerprints[spec['name']]))]
+    results = {spec['name']: chart_paths(spec, chart_dir, formats) for spec in specs}
+
+    workers = min(len(pending), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        rendered = {spec['name']: render(spec, chart_dir, dpi, formats) for spec in pending}
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+            futures = {spec['name']: pool.submit(render, spec, chart_dir, dpi, formats) for spec in pending}
+            rendered = {name: future.result() for name, future in futures.items()}
+
+    if cache:
+        for name, paths in rendered.items():
+            buildcache.record(paths, fingerprints[name])
+    results.update(rendered)
+    return results
+
+
+def _plot_series(ax, series):
+    for line in series:
+        ax.plot(line['x'], line['y'], marker=line.get('marker', 'o'), linewidth=line.get('linewidth', 2),
+                label=line.get('label'), color=line.get('color'))
+
+
+def _style_axes(ax, panel):
+    ax.set_title(panel.get('title', ''))
+    ax.set_xlabel(panel.get('xlabel', ''))
+    ax.set_ylabel(panel.get('ylabel', ''))
+    if panel.get('xticks') is not None:
+        ax.set_xticks(panel['xticks'])
+    rotation = panel.get('rotation', 45)
+    if panel.get('ha'):
+        _pyplot().setp(ax.get_xticklabels(), rotation=rotation, ha=panel['ha'])
+    else:
+        ax.tick_params(axis='x', rotation=rotation)
+    if panel.get('plain_y'):
+        ax.ticklabel_format(style='plain', axis='y')
+    if panel.get('legend', True):
+        ax.legend()
+    if panel.get('grid', True):
+        ax.grid(True, alpha=panel.get('grid_alpha'))
+
+
+def draw_line_panel(ax, series, vline=None, **panel):
+    """折线面板：series 为 [{'x', 'y', 'label', 'marker', 'color'}]，vline 为 {'x', 'label'}"""
+    _plot_series(ax, series)
+    if vline is not None:
+        ax.axvline(x=vline['x'], color=vline.get('color', 'r'), linestyle='--', label=vline.get('label'))
+    _style_axes(ax, panel)
+
+
+def draw_pie_panel(ax, values, labels, colors=None, title=''):
+    """饼图面板"""
+    ax.pie(values, labels=labels, autopct='%1.1f%%', colors=colors, startangle=90)
+    ax.set_title(title)
+
+
+def small_multiples(frame, x, metrics, series, facet=None, **panel):
+    """小多图：每个 facet 取值 × 每个指标一个折线面板，面板内 series 的每个取值一条线
+
+    frame 为长表，只按 [facet, series] 分组一次；metrics 为 [{'y': 列名, 'marker', 'scale', 'label', 'title',
+    'ylabel', ...}]，label 中的 {} 替换为 series 取值，title 中的 {facet} 替换为 facet 取值，其余键和 panel
+    作为面板参数。返回按行排列的面板列表（每行一个 facet 取值，每列一个指标），可以与其他面板一起传给 draw_panels。
+    """
+    keys = [series] if facet is None else [facet, series]
+    lines = {}
+    for key, group in frame.groupby(keys, observed=True):
+        facet_value, name = (None, key[0]) if facet is None else key
+        lines.setdefault(facet_value, []).append((name, group))
+
+    panels = []
+    for facet_value, groups in lines.items():
+        for metric in metrics:
+            options = {name: value for name, value in metric.items() if name not in ('y', 'marker', 'scale', 'label')}
+            if 'title' in options:
+                options['title'] = options['title'].format(facet=facet_value)
+            scale, label = metric.get('scale', 1), metric.get('label', '{}')
+            panels.append(dict(panel, **options, series=[
+                {'x': group[x], 'y': group[metric['y']] / scale, 'marker': metric.get('marker', 'o'),
+                 'label': label.format(name)} for name, group in groups]))
+    return panels
+
+
+def grid_shape(n, ncols):
+    """n 个面板按 ncols 列排列时的 (行数, 列数)"""
+    return -(-n // ncols), ncols
+
+
+PANEL_DRAWERS = {
+    'line': draw_line_panel,
+    'pie': draw_pie_panel,
+}
+
+
+def draw_line_chart(fig, series, vline=None, **panel):
+    """单面板折线图"""
+    ax = fig.add_subplot(1, 1, 1)
+    draw_line_panel(ax, series, vline, **panel)
+    fig.tight_layout()
+
+
+def draw_panels(fig, panels, ncols=2, suptitle=None):
+    """多面板图：panels 按行排列，每行 ncols 个，行数由面板数确定；每个面板为 {'kind': 'line' | 'pie', ...}"""
+    if suptitle:
+        fig.suptitle(suptitle, fontsize=16, fontweight='bold')
+    nrows, ncols = grid_shape(len(panels), ncols)
+    for position, panel in enumerate(panels, start=1):
+        ax = fig.add_subplot(nrows, ncols, position)
+        panel = dict(panel)
+        PANEL_DRAWERS[panel.pop('kind', 'line')](ax, **panel)
+    fig.tight_layout()
@@ -0,0 +1,198 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from buildcache import fingerprint, is_fresh, module_version, record
+from did import batched_ols
+from event_sweep import DATASET_DIR, analysis_matrices
+from instrument import phase, write_report
+from tariff_model import TARIFF_DATE
+
+# 拟合好的季节基线和已评分的月份，历史数据和代码不变时只给新增或修改过的月份评分
+CACHE_DIR = DATASET_DIR + 'counterfactual/'
+BASELINES_PATH = CACHE_DIR + 'baselines.parquet'
+SCORES_PATH = CACHE_DIR + 'scores.parquet'
+
+# 拟合季节基线的历史区间（关税前的完整年份）
+FIT_START = pd.Timestamp('2023-01-01')
+FIT_END = pd.Timestamp('2024-12-01')
+
+# 关税后的第一个月
+POST_START = TARIFF_DATE.to_period('M').to_timestamp()
+
+CONFIDENCE = 0.95
+
+# 历史区间内非零月份少于该数的序列（巴西的零星目的地）没有可靠的季节形态，基线记为无法估计
+MIN_NONZERO_MONTHS = 12
+
+# 基线合计不到实际值合计的该比例时，偏离百分比没有意义，记为 NaN
+BASELINE_FLOOR = 0.01
+
+SERIES_KEYS = ['source', 'series', 'metric']
+
+
+def seasonal_design(dates, years):
+    """年份固定效应 + 月份固定效应（去掉 1 月）的设计矩阵"""
+    dates = pd.DatetimeIndex(dates)
+    year_columns = (dates.year.to_numpy()[:, None] == np.asarray(years)).astype(float)
+    month_columns = (dates.month.to_numpy()[:, None] == np.arange(2, 13)).astype(float)
+    return np.column_stack([year_columns, month_columns])
+
+
+def fit_baselines(history, log=True):
+    """对全部序列一次拟合季节基线：y = 年份水平 + 月份季节项
+
+    log 为 True 时对 log(1 + y) 拟合。基线取最后一个历史年份的水平加各月季节项；
+    预测方差为系数的 HC1 稳健方差加残差方差。返回长表：序列 × 月份（1-12）一行，
+    列为 baseline、se、dof（变换后的尺度）。该月份在历史中没有观测、或非零月份少于 MIN_NONZERO_MONTHS
+    的序列为 NaN。
+    """
+    # scipy.stats 导入较慢，用到时再加载
+    from scipy import stats
+
+    values = history.to_numpy(dtype=float).T
+    if log:
+        with np.errstate(invalid='ignore'):
+            values = np.where(values >= 0, np.log1p(values), np.nan)
+    years = sorted(set(history.index.year))
+    X = seasonal_design(history.index, years)
+    mask = ~np.isnan(values)
+    beta, cov, estimable, n_obs, _, rank = batched_ols(X, values, mask)
+
+    resid = np.where(mask, values - beta @ X.T, 0)
+    dof = n_obs - rank
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = np.where(dof > 0, (resid ** 2).sum(axis=1) / dof, np.nan)
+
+    # 预测 12 个月：最后一个历史年份的水平 + 月份季节项
+    X0 = seasonal_design(pd.date_range(f'{years[-1]}-01-01', periods=12, freq='MS'), years)
+    baseline = beta @ X0.T
+    se = np.sqrt(np.einsum('mp,kpq,mq->km', X0, cov, X0) + sigma2[:, None])
+    known = estimable[:, [len(years) - 1]] & np.column_stack([np.ones(len(beta), dtype=bool),
+                                                               estimable[:, len(years):]])
+    known &= (history.to_numpy(dtype=float).T > 0).sum(axis=1)[:, None] >= MIN_NONZERO_MONTHS
+    result = pd.DataFrame(np.repeat(np.asarray(history.columns.tolist(), dtype=object), 12, axis=0),
+                          columns=SERIES_KEYS)
+    result['month'] = np.tile(np.arange(1, 13), len(beta))
+    result['baseline'] = np.where(known, baseline, np.nan).ravel()
+    result['se'] = np.where(known, se, np.nan).ravel()
+    result['dof'] = np.repeat(dof, 12)
+    result['log'] = log
+    result['t_crit'] = stats.t.ppf((1 + CONFIDENCE) / 2, result['dof'].where(result['dof'] > 0))
+    return result
+
+
+def _to_long(matrix):
+    """月份 × 序列 的矩阵 -> 长表（date + 序列键 + actual），去掉缺失值"""
+    long = matrix.stack(list(range(matrix.columns.nlevels)), future_stack=True).dropna()
+    long.index.names = ['date'] + SERIES_KEYS
+    return long.rename('actual').reset_index()
+
+
+def score(actual, baselines):
+    """实际值与基线的偏离：baseline、区间、deviation、deviation_percent、z_score（均还原为原始尺度）
+
+    还原后的基线和区间截断在 0 以上（贸易额、数量不会为负）。
+    """
+    scored = actual.assign(month=actual['date'].dt.month).merge(baselines, on=SERIES_KEYS + ['month'], how='left')
+    low_z = scored['baseline'] - scored['t_crit'] * scored['se']
+    high_z = scored['baseline'] + scored['t_crit'] * scored['se']
+    log = scored['log'].astype(bool)
+    restore = lambda z: np.maximum(np.where(log, np.expm1(z), z), 0)
+    observed = np.where(log, np.log1p(scored['actual'].where(scored['actual'] >= 0)), scored['actual'])
+    result = scored[['date'] + SERIES_KEYS + ['actual']].copy()
+    result['baseline'] = restore(scored['baseline'])
+    result['low'] = restore(low_z)
+    result['high'] = restore(high_z)
+    result['deviation'] = result['actual'] - result['baseline']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['deviation_percent'] = np.where(result['baseline'] > BASELINE_FLOOR * result['actual'].abs(),
+                                               result['deviation'] / result['baseline'] * 100, np.nan)
+        result['z_score'] = (observed - scored['baseline']) / scored['se']
+    result['outside'] = np.sign(result['z_score']).where(result['z_score'].abs() > scored['t_crit'], 0)
+    return result
+
+
+def refresh(matrix, log=True, cache_dir=CACHE_DIR, rebuild=False):
+    """对历史区间之后的月份评分，返回 (评分表, 本次评分的行数)
+
+    历史数据、参数和代码不变时读取缓存的基线，并沿用实际值未变的已评分月份。
+    """
+    baselines_path = os.path.join(cache_dir, os.path.basename(BASELINES_PATH))
+    scores_path = os.path.join(cache_dir, os.path.basename(SCORES_PATH))
+    history = matrix.loc[FIT_START:FIT_END]
+    fp = fingerprint(history, FIT_START, FIT_END, log, CONFIDENCE,
+                     module_version(__file__))
+    actual = _to_long(matrix.loc[FIT_END + pd.offsets.MonthBegin():])
+
+    if not rebuild and is_fresh([baselines_path], fp, cache_dir):
+        with phase('load_baselines'):
+            baselines = pd.read_parquet(baselines_path)
+        previous = pd.read_parquet(scores_path) if is_fresh([scores_path], fp, cache_dir) else None
+    else:
+        with phase('fit', rows=history.shape[1]):
+            baselines = fit_baselines(history, log)
+        os.makedirs(cache_dir, exist_ok=True)
+        baselines.to_parquet(baselines_path, index=False)
+        record([baselines_path], fp, cache_dir)
+        previous = None
+
+    with phase('score') as p:
+        if previous is not None:
+            # 已评分且实际值没有变化的月份直接沿用
+            kept = previous.merge(actual, on=['date'] + SERIES_KEYS + ['actual'])
+            pending = actual.merge(kept[['date'] + SERIES_KEYS], how='left', indicator=True)
+            pending = pending[pending['_merge'] == 'left_only'].drop(columns='_merge')
+        else:
+            kept, pending = None, actual
+        scored = p.count(score(pending, baselines))
+        scores = pd.concat([kept, scored], ignore_index=True) if kept is not None else scored
+        scores = scores.sort_values(SERIES_KEYS + ['date'], ignore_index=True)
+    scores.to_parquet(scores_path, index=False)
+    record([scores_path], fp, cache_dir)
+    return scores, len(pending)
+
+
+def summary(scores, post_start=POST_START):
+    """每条序列关税前、后的月份数、相对基线的偏离（%，各月合计）和高于、低于区间的月份数
+
+    基线合计不到实际值合计的 BASELINE_FLOOR 时偏离百分比为 NaN。
+    """
+    period = np.where(scores['date'] >= post_start, 'post', 'pre')
+    grouped = scores.assign(period=period, above=scores['outside'] > 0, below=scores['outside'] < 0).groupby(
+        SERIES_KEYS + ['period'])
+    table = grouped.agg(months=('actual', 'size'), deviation=('deviation', 'sum'), baseline=('baseline', 'sum'),
+                        actual=('actual', 'sum'), above=('above', 'sum'), below=('below', 'sum'))
+    baseline = table.pop('baseline')
+    baseline = baseline.where(baseline > BASELINE_FLOOR * table.pop('actual').abs())
+    table.insert(1, 'deviation_percent', table.pop('deviation') / baseline * 100)
+    return table.unstack('period').swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='季节反事实基线：关税后各月实际值与 2023-2024 年季节基线的偏离')
+    parser.add_argument('--levels', action='store_true', help='对原始值拟合（默认对 log(1 + y) 拟合）')
+    parser.add_argument('--rebuild', action='store_true', help='忽略缓存，重新拟合基线并为全部月份评分')
+    parser.add_argument('--output', help='另存全部评分结果的 CSV 路径')
+    args = parser.parse_args()
+
+    with phase('load') as p:
+        matrix = p.count(analysis_matrices())
+    scores, rescored = refresh(matrix, not args.levels, rebuild=args.rebuild)
+
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_rows', None)
+    print(f"季节基线：{FIT_START:%Y-%m} 至 {FIT_END:%Y-%m}，关税后自 {POST_START:%Y-%m} 起，"
+          f"区间置信水平 {CONFIDENCE:.0%}")
+    print(summary(scores).to_string(float_format=lambda value: f"{value:.2f}"))
+    print(f"\n共 {len(scores)} 个序列月份，本次评分 {rescored} 个，结果缓存于 {CACHE_DIR}")
+    if args.output:
+        scores.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"已保存至 {args.output}")
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import os
+
+import pandas as pd
+
+from buildcache import fingerprint, is_fresh, module_version, record
+from ingest import file_hash
+from instrument import phase, write_report
+from loaders import DATASET_DIR, load_comex, load_indec, load_merge
+
+# 物化的数据立方体：每个数据源每个汇总层级一个文件 <数据源>.<维度>.parquet
+CUBE_DIR = os.path.join(DATASET_DIR, 'cube')
+INPUT_FILES = [os.path.join(DATASET_DIR, name) for name in ('merge.csv', 'braz.csv', 'agen.csv')]
+
+DIMENSIONS = ('year', 'month', 'partner', 'product')
+MEASURES = ['sum', 'count', 'sumsq']
+
+# 数据源中没有的维度记为 ALL
+ALL = 'All'
+
+# 每个数据源的指标列：china 为 merge.csv（中国海关），brazil 为 braz.csv 按 年 × 月 × 目的地 汇总后的金额，
+# argentina 为 agen.csv（INDEC）
+METRICS = {
+    'china': ['price', 'amount', 'CNY'],
+    'brazil': ['US$ FOB'],
+    'argentina': ['PESO_NETO_KILOS', 'MONTO_FOB_DOLAR', 'PRECIO_PROMEDIO'],
+}
+
+# 物化的汇总层级（第一个为明细层级），查询时选用包含所需维度的最小层级
+LEVELS = [
+    ('year', 'month', 'partner', 'product'),
+    ('year', 'month', 'partner'),
+    ('year', 'month', 'product'),
+    ('year', 'month'),
+    ('year', 'partner'),
+    ('year',),
+    ('partner',),
+    ('product',),
+]
+
+
+def _constant(n):
+    return pd.Categorical([ALL] * n)
+
+
+def china_facts(merge):
+    """merge.csv（已还原贸易伙伴和商品类型）的维度和指标列"""
+    return pd.DataFrame({
+        'year': merge['date'].dt.year.astype('int16'),
+        'month': merge['date'].dt.month.astype('int8'),
+        'partner': merge['trade_partner'],
+        'product': merge['product_type'],
+        **{metric: merge[metric] for metric in METRICS['china']},
+    })
+
+
+def brazil_facts(braz):
+    """Comex Stat 汇总（loaders.load_comex）的维度和指标列"""
+    return pd.DataFrame({
+        'year': braz['Year'],
+        'month': braz['Month'],
+        'partner': braz['Country'],
+        'product': _constant(len(braz)),
+        'US$ FOB': braz['US$ FOB'],
+    })
+
+
+def argentina_facts(agen):
+    """INDEC 出口数据的维度和指标列（没有目的地）"""
+    return pd.DataFrame({
+        'year': agen['FECHA_'].dt.year.astype('int16'),
+        'month': agen['FECHA_'].dt.month.astype('int8'),
+        'partner': _constant(len(agen)),
+        'product': agen['POS_NCM'],
+        **{metric: agen[metric] for metric in METRICS['argentina']},
+    })
+
+
+def aggregate(facts, metrics, dims=DIMENSIONS):
+    """按 dims 汇总每个指标的合计、个数和平方和，返回长表：dims + metric + sum/count/sumsq"""
+    values = facts[metrics].astype('float64')
+    keys = [facts[name] for name in dims]
+    measures = {
+        'sum': values.groupby(keys, observed=True).sum(),
+        'count': values.groupby(keys, observed=True).count(),
+        'sumsq': (values ** 2).groupby(keys, observed=True).sum(),
+    }
+    table = pd.concat({name: frame.stack() for name, frame in measures.items()}, axis=1)
+    table.index.names = list(dims) + ['metric']
+    return table.reset_index()
+
+
+def roll_up(table, dims):
+    """由更细的层级汇总到 dims（合计、个数、平方和都可以直接相加）"""
+    return table.groupby(list(dims) + ['metric'], observed=True)[MEASURES].sum().reset_index()
+
+
+def with_moments(table):
+    """补充均值和样本方差列（个数不足 2 时方差为 NaN）"""
+    count = table['count'].where(table['count'] > 0)
+    table = table.assign(mean=table['sum'] / count)
+    table['var'] = ((table['sumsq'] - table['sum'] ** 2 / count) / (count - 1)).where(count > 1)
+    # 平方和相减的舍入误差可能使方差略小于 0
+    table['var'] = table['var'].clip(lower=0)
+    return table
+
+
+class Cube:
+    """各数据源按 年 × 月 × 伙伴 × 商品 汇总的数据立方体及其物化的汇总层级"""
+
+    def __init__(self, levels):
+        # {数据源: {维度元组: 长表}}
+        self.levels = levels
+
+    def level(self, source, dims):
+        """包含 dims 的最小物化层级"""
+        candidates = [level for level in self.levels[source] if set(dims) <= set(level)]
+        if not candidates:
+            raise KeyError(f"没有包含 {', '.join(dims)} 的汇总层级")
+        return min(candidates, key=lambda level: len(self.levels[source][level]))
+
+    def _rows(self, source, metrics, by, filters):
+        table = self.levels[source][self.level(source, list(by) + list(filters))]
+        rows = table[table['metric'].isin(metrics)]
+        for name, value in filters.items():
+            rows = rows[rows[name].isin(value) if isinstance(value, (list, tuple, set)) else rows[name] == value]
+        return rows
+
+    def query(self, source, metric, by=(), **filters):
+        """某一指标按 by 分组的合计、个数、平方和、均值和方差
+
+        filters 为维度取值（列表表示取其中任一值），例如 query('china', 'CNY', by=('year', 'month'),
+        partner='USA')。by 为空时返回一行总计。
+        """
+        by = list(by)
+        rows = self._rows(source, [metric], by, filters)
+        if by:
+            result = rows.groupby(by, observed=True)[MEASURES].sum()
+        else:
+            result = rows[MEASURES].sum().to_frame().T
+        return with_moments(result)
+
+    def frame(self, source, measures, by, **filters):
+        """多个指标按 by 分组的宽表（一次分组），measures 为 {指标: 'sum' | 'count' | 'mean' | 'var' ...}"""
+        by = list(by)
+        rows = self._rows(source, list(measures), by, filters)
+        wide = with_moments(rows.groupby(by + ['metric'], observed=True)[MEASURES].sum()).unstack('metric')
+        return pd.DataFrame({metric: wide[(measure, metric)] for metric, measure in measures.items()})
+
+
+def build_cube(merge, braz, agen, levels=LEVELS):
+    """由三个数据集生成数据立方体（merge 需已还原名称，braz 为 load_comex 的汇总）"""
+    facts = {'china': china_facts(merge), 'brazil': brazil_facts(braz), 'argentina': argentina_facts(agen)}
+    cube = {}
+    for source, frame in facts.items():
+        base = aggregate(frame, METRICS[source], levels[0])
+        cube[source] = {levels[0]: base}
+        for dims in levels[1:]:
+            cube[source][dims] = roll_up(base, dims)
+    return Cube(cube)
+
+
+def level_path(source, dims, cube_dir=CUBE_DIR):
+    return os.path.join(cube_dir, f"{source}.{'-'.join(dims)}.parquet")
+
+
+def cube_files(cube_dir=CUBE_DIR):
+    """物化后的全部文件"""
+    return [level_path(source, dims, cube_dir) for source in METRICS for dims in LEVELS]
+
+
+def cube_fingerprint(input_files=INPUT_FILES):
+    """输入文件内容和生成代码的指纹"""
+    return fingerprint([file_hash(path) for path in input_files],
+                       module_version(__file__), LEVELS)
+
+
+def save_cube(cube, cube_dir=CUBE_DIR):
+    os.makedirs(cube_dir, exist_ok=True)
+    for source, levels in cube.levels.items():
+        for dims, table in levels.items():
+            path = level_path(source, dims, cube_dir)
+            # 先写临时文件再替换，多个脚本同时生成时读到的总是完整文件
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            table.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+
+def read_cube(cube_dir=CUBE_DIR):
+    return Cube({source: {dims: pd.read_parquet(level_path(source, dims, cube_dir)) for dims in LEVELS}
+                 for source in METRICS})
+
+
+def load_cube(cube_dir=CUBE_DIR, rebuild=False):
+    """读取物化的数据立方体，输入文件或代码有变化时重新生成"""
+    fp = cube_fingerprint()
+    files = cube_files(cube_dir)
+    # 指纹记录在立方体目录下，清除其他产物的指纹时立方体仍然有效
+    cache_dir = os.path.join(cube_dir, '.buildcache')
+    if not rebuild and is_fresh(files, fp, cache_dir):
+        with phase('load_cube'):
+            return read_cube(cube_dir)
+
+    with phase('build_cube'):
+        cube = build_cube(load_merge(INPUT_FILES[0]), load_comex(INPUT_FILES[1]), load_indec(INPUT_FILES[2]))
+    save_cube(cube, cube_dir)
+    record(files, fp, cache_dir)
+    return cube
+
+
+if __name__ == '__main__':
+    cube = load_cube()
+    for source, levels in cube.levels.items():
+        print(source, ', '.join(f"{'×'.join(dims)}: {len(table)}" for dims, table in levels.items()))
+    print(f"运行报告：{write_report()}")
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+except ImportError:  # 没有 pyarrow 时退回 pandas 解析
+    pa = None
+
+# 中国海关导出文件编码
+ENCODING = 'gbk'
+
+# 种用大豆，不参与分析
+EXCLUDED_PRODUCTS = (12011000,)
+
+# 读取的列及其类型（末尾的空列不读取）
+COLUMN_TYPES = {
+    '数据年月': 'int32',
+    '贸易伙伴编码': 'int32',
+    '贸易伙伴名称': 'category',
+    '商品编码': 'int64',
+    '商品名称': 'category',
+    '第一数量': 'int64',
+    '第一计量单位': 'category',
+    '第二数量': 'int64',
+    '第二计量单位': 'category',
+    '人民币': 'int64',
+}
+
+# 带千分位逗号的数值列
+THOUSANDS_COLUMNS = ('人民币',)
+
+
+def month_to_datetime(values):
+    """YYYYMM 整数数组 -> datetime64[ns]（每月 1 日）"""
+    values = np.asarray(values, dtype=np.int64)
+    months = (values // 100 - 1970) * 12 + values % 100 - 1
+    return months.astype('datetime64[M]').astype('datetime64[ns]')
+
+
+def _arrow_type(dtype):
+    if dtype == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _read_arrow(path, columns, exclude):
+    column_types = {}
+    for name in columns:
+        # 千分位数值先按字符串读入，在 Arrow 内去逗号后再转整数
+        column_types[name] = pa.string() if name in THOUSANDS_COLUMNS else _arrow_type(COLUMN_TYPES[name])
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(encoding=ENCODING),
+        convert_options=pa_csv.ConvertOptions(include_columns=list(columns), column_types=column_types),
+    )
+
+    if exclude and '商品编码' in table.column_names:
+        mask = pc.invert(pc.is_in(table['商品编码'], value_set=pa.array(exclude, pa.int64())))
+        table = table.filter(mask)
+
+    for name in THOUSANDS_COLUMNS:
+        if name in table.column_names:
+            values = pc.replace_substring(table[name], ',', '').cast(pa.int64())
+            table = table.set_column(table.column_names.index(name), name, values)
+
+    return table.to_pandas()
+
+
+def _read_pandas(path, columns, exclude):
+    dtype = {name: COLUMN_TYPES[name] for name in columns if name not in THOUSANDS_COLUMNS}
+    df = pd.read_csv(path, encoding=ENCODING, usecols=list(columns), dtype=dtype, thousands=',')
+    if exclude and '商品编码' in df.columns:
+        df = df[~df['商品编码'].isin(exclude)].reset_index(drop=True)
+    return df
+
+
+def read_customs(path, columns=None, exclude=EXCLUDED_PRODUCTS):
+    """读取中国海关导出的 GBK 数据文件
+
+    数值列直接解析为 int64，人民币去掉千分位逗号，数据年月另外生成 date 列；
+    末尾空列不读取，exclude 中的商品编码在解析阶段过滤。
+    """
+    columns = list(COLUMN_TYPES) if columns is None else list(columns)
+    if pa is not None:
+        df = _read_arrow(path, columns, exclude)
+    else:
+        df = _read_pandas(path, columns, exclude)
+
+    df = df.astype({name: COLUMN_TYPES[name] for name in columns})
+    if '数据年月' in df.columns:
+        df['date'] = month_to_datetime(df['数据年月'].to_numpy())
+    return df
@@ -1,27 +1,58 @@
 import pandas as pd
 
-df1 = pd.read_csv('../dataset/2024in.csv', encoding='gbk')
-df2 = pd.read_csv('../dataset/2025in.csv', encoding='gbk')
-df3 = pd.read_csv('../dataset/2024out.csv', encoding='gbk')
-df4 = pd.read_csv('../dataset/2025out.csv', encoding='gbk')
-df5 = pd.read_csv('../dataset/2023.csv', encoding='gbk')
-
-df = pd.concat([df5, df1, df2, df3, df4])
-del df1, df2, df3, df4, df5
-
-df = df.replace(12011000, pd.NA)
-df.drop(df.columns[-1], axis=1, inplace=True)
-df.dropna(inplace=True)
-
-df['date'] = pd.to_datetime(df['数据年月'], format='%Y%m')
-df = pd.get_dummies(df, columns=['贸易伙伴编码', '商品编码'], drop_first=True, dtype=int, prefix='', prefix_sep='')
-df['amount'] = df['第一数量']
-df['CNY'] = df['人民币'].str.replace(',', '').astype(int)
-df['price'] = (df['CNY'] / df['amount']).round(2)
-
-df.drop(
-    columns=['商品名称', '贸易伙伴名称', '第一计量单位', '第二数量', '第二计量单位', '第一数量', '人民币', '数据年月'],
-    inplace=True)
-df.to_csv('../dataset/merge.csv', index=False, encoding='utf-8')
-
-print(df)
+from buildcache import fingerprint, is_fresh, module_version, record
+from ingest import ingest, load_manifest, load_store
+from instrument import phase, write_report
+from schema import PARTNERS, PRODUCTS, lookup_table
+
+OUTPUT_FILES = ['../dataset/merge.csv', '../dataset/partners.csv', '../dataset/products.csv']
+
+
+def build_tables(store):
+    """由列式存储中的海关数据生成 (事实表, 贸易伙伴维度表, 商品维度表)"""
+    # 维度表：贸易伙伴、商品
+    partners = lookup_table(store['贸易伙伴编码'], store['贸易伙伴名称'], PARTNERS)
+    products = lookup_table(store['商品编码'], store['商品名称'], PRODUCTS)
+
+    # 事实表：贸易伙伴和商品只保存整数编码
+    df = pd.DataFrame({
+        'date': store['date'],
+        'partner': store['贸易伙伴编码'],
+        'product': store['商品编码'],
+        'amount': store['第一数量'],
+        'CNY': store['人民币'],
+    })
+    df['price'] = (df['CNY'] / df['amount']).round(2)
+    return df, partners, products
+
+
+def main():
+    # 增量导入：只解析新增或变化的海关月度文件，其余直接读列式存储
+    with phase('ingest'):
+        report = ingest()
+    print(f"新增/更新: {report['ingested']}，未变化: {len(report['skipped'])} 个文件")
+
+    store_fingerprint = fingerprint(load_manifest()['sources'], module_version(__file__))
+
+    if is_fresh(OUTPUT_FILES, store_fingerprint):
+        print("海关数据和代码均未变化，merge.csv 保持不变")
+    else:
+        with phase('load') as p:
+            store = p.count(load_store())
+
+        with phase('aggregate', rows=len(store)):
+            df, partners, products = build_tables(store)
+
+        with phase('save', rows=len(df)):
+            df.to_csv(OUTPUT_FILES[0], index=False, encoding='utf-8')
+            partners.to_csv(OUTPUT_FILES[1], index=False, encoding='utf-8')
+            products.to_csv(OUTPUT_FILES[2], index=False, encoding='utf-8')
+            record(OUTPUT_FILES, store_fingerprint)
+
+        print(df)
+
+    print(f"运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from cube import load_cube
+from instrument import phase, write_report
+from tariff_model import TARIFF_DATE
+
+# 处理组（加征关税的贸易伙伴）与对照组
+TREATED = ['USA']
+CONTROLS = ['Brazil', 'Argentina']
+
+# merge.csv 的指标，每个 处理组伙伴 × 商品 × 指标 一次回归
+METRICS = ['price', 'amount', 'CNY']
+
+# 聚类标准误的分组方式，none 为每个观测单独一类（HC1 异方差稳健标准误）。
+# 伙伴只有几个时按伙伴聚类的自由度太小，默认按月份聚类
+CLUSTERS = ('month', 'partner', 'none')
+
+CONFIDENCE = 0.95
+
+
+def series_panel(cube, metrics=METRICS):
+    """中国海关的月度序列：月份 × (指标, 商品, 伙伴) 的宽表，缺失的月份为 NaN"""
+    frame = cube.frame('china', {metric: 'mean' for metric in metrics}, by=('year', 'month', 'partner', 'product'))
+    frame = frame.reset_index()
+    frame['date'] = pd.to_datetime(frame[['year', 'month']].assign(day=1))
+    panel = frame.set_index(['date', 'product', 'partner'])[metrics].unstack(['product', 'partner'])
+    months = pd.date_range(panel.index.min(), panel.index.max(), freq='MS', name='date')
+    return panel.reindex(months).rename_axis(columns=['metric', 'product', 'partner'])
+
+
+def stack_series(panel, treated=TREATED, controls=CONTROLS):
+    """每次回归的观测堆叠为 (回归数 K, 月份数 T, 伙伴数 N) 的数组，第 0 个伙伴为处理组
+
+    返回 (keys, values)，keys 为每次回归的 (处理组伙伴, 商品, 指标)。没有数据的伙伴或月份为 NaN。
+    """
+    metrics = panel.columns.get_level_values('metric').unique()
+    products = panel.columns.get_level_values('product').unique()
+    keys, blocks = [], []
+    for partner in treated:
+        units = [partner] + [control for control in controls if control != partner]
+        columns = pd.MultiIndex.from_product([metrics, products, units])
+        values = panel.reindex(columns=columns).to_numpy(dtype=float)
+        # (T, 指标 × 商品 × 伙伴) -> (指标 × 商品, T, 伙伴)
+        blocks.append(values.reshape(len(panel), -1, len(units)).transpose(1, 0, 2))
+        keys += [(partner, product, metric) for metric in metrics for product in products]
+    return keys, np.concatenate(blocks)
+
+
+def design(dates, n_units, tariff_date=TARIFF_DATE):
+    """月份 × 伙伴 网格（按月份优先展开）的设计矩阵：伙伴固定效应、月份固定效应（去掉第一个月）、处理组 × 关税后"""
+    n_months = len(dates)
+    units = np.tile(np.eye(n_units), (n_months, 1))
+    months = np.repeat(np.eye(n_months)[:, 1:], n_units, axis=0)
+    treated_post = np.outer(np.asarray(dates >= tariff_date), np.arange(n_units) == 0).ravel()
+    return np.column_stack([units, months, treated_post.astype(float)])
+
+
+def _pinv(xtx):
+    """对称半正定矩阵组的伪逆和秩（一次特征分解）"""
+    eigenvalues, vectors = np.linalg.eigh(xtx)
+    tolerance = eigenvalues.max(axis=1, keepdims=True) * xtx.shape[-1] * np.finfo(float).eps
+    kept = eigenvalues > tolerance
+    inverse = np.where(kept, 1 / np.where(kept, eigenvalues, 1), 0)
+    return (vectors * inverse[:, None, :]) @ vectors.transpose(0, 2, 1), kept.sum(axis=1)
+
+
+def batched_ols(X, y, mask, groups=None):
+    """同一设计矩阵 X (n, p) 下 K 组观测的最小二乘，一次完成全部回归
+
+    y、mask 形状 (K, n)，mask 为 False 的观测不参与；groups (n,) 为聚类编号，None 时每个观测单独一类。
+    缺失的伙伴或月份会使部分固定效应没有观测，用伪逆取最小范数解，estimable 标出可以识别的系数。
+    返回 (系数 (K, p), 聚类稳健协方差 (K, p, p), estimable (K, p), 观测数, 聚类数, 秩)，协方差含 CR1 小样本修正。
+    """
+    mask = np.asarray(mask, dtype=bool)
+    y = np.where(mask, y, 0.0)
+    Xm = mask[:, :, None] * X
+    xtx = Xm.transpose(0, 2, 1) @ X
+    bread, rank = _pinv(xtx)
+    beta = np.einsum('kpq,kq->kp', bread, np.einsum('knq,kn->kq', Xm, y))
+    resid = (y - beta @ X.T) * mask
+    # 系数 j 可识别当且仅当 e_j 在 X'X 的行空间中，即投影矩阵 pinv(X'X)·X'X 的第 j 个对角元为 1
+    estimable = np.isclose(np.einsum('kpq,kqp->kp', bread, xtx), 1, atol=1e-6)
+
+    # 每个聚类的得分之和：按聚类排序后分段求和
+    groups = np.arange(X.shape[0]) if groups is None else np.asarray(groups)
+    order = np.argsort(groups, kind='stable')
+    starts = np.flatnonzero(np.r_[True, groups[order][1:] != groups[order][:-1]])
+    scores = np.add.reduceat(X[order][None] * resid[:, order, None], starts, axis=1)
+    meat = scores.transpose(0, 2, 1) @ scores
+
+    n_obs = mask.sum(axis=1)
+    n_clusters = (np.add.reduceat(mask[:, order], starts, axis=1) > 0).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = n_clusters / (n_clusters - 1) * (n_obs - 1) / (n_obs - rank)
+        cov = bread @ meat @ bread * correction[:, None, None]
+    return beta, cov, estimable, n_obs, n_clusters, rank
+
+
+def estimate(panel, treated=TREATED, controls=CONTROLS, tariff_date=TARIFF_DATE, cluster='month', log=True):
+    """所有 处理组伙伴 × 商品 × 指标 序列的双重差分估计
+
+    每次回归为 y = 伙伴固定效应 + 月份固定效应 + β·处理组×关税后，对照组为同一商品同一指标的其他伙伴。
+    log 为 True 时对取对数后的指标回归，effect_percent 为 β 对应的百分比变化。
+    没有对照组或关税前后缺少观测时 β 无法识别，结果为 NaN。
+    """
+    # scipy.stats 导入较慢，用到时再加载
+    from scipy import stats
+
+    if cluster not in CLUSTERS:
+        raise ValueError(f"聚类方式应为 {', '.join(CLUSTERS)}：{cluster}")
+    keys, values = stack_series(panel, treated, controls)
+    n_fits, n_months, n_units = values.shape
+    if log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(values > 0, np.log(values), np.nan)
+
+    X = design(panel.index, n_units, tariff_date)
+    y = values.reshape(n_fits, -1)
+    mask = ~np.isnan(y)
+    groups = {'month': np.repeat(np.arange(n_months), n_units), 'partner': np.tile(np.arange(n_units), n_months),
+              'none': None}[cluster]
+    beta, cov, estimable, n_obs, n_clusters, rank = batched_ols(X, y, mask, groups)
+
+    identified = estimable[:, -1]
+    coef = np.where(identified, beta[:, -1], np.nan)
+    with np.errstate(invalid='ignore'):
+        se = np.sqrt(np.where(identified, cov[:, -1, -1], np.nan))
+        dof = n_clusters - 1 if cluster != 'none' else n_obs - rank
+        t_stat = coef / se
+        p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+        margin = stats.t.ppf((1 + CONFIDENCE) / 2, dof) * se
+
+    result = pd.DataFrame(keys, columns=['treated', 'product', 'metric'])
+    result['n_obs'] = n_obs
+    result['n_controls'] = (~np.isnan(values[:, :, 1:])).any(axis=1).sum(axis=1)
+    result['n_clusters'] = n_clusters
+    result['coef'] = coef
+    result['se'] = se
+    result['t_stat'] = t_stat
+    result['p_value'] = p_value
+    result['ci_low'] = coef - margin
+    result['ci_high'] = coef + margin
+    if log:
+        result['effect_percent'] = np.expm1(coef) * 100
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双重差分：所有 处理组伙伴 × 商品 × 指标 序列一次估计')
+    parser.add_argument('--treated', nargs='+', default=TREATED)
+    parser.add_argument('--controls', nargs='+', default=CONTROLS)
+    parser.add_argument('--tariff-date', type=pd.Timestamp, default=TARIFF_DATE)
+    parser.add_argument('--cluster', choices=CLUSTERS, default='month', help='聚类稳健标准误的分组方式')
+    parser.add_argument('--levels', action='store_true', help='对原始水平值回归（默认取对数）')
+    parser.add_argument('--output', help='另存全部估计结果的 CSV 路径')
+    args = parser.parse_args()
+
+    cube = load_cube()
+    with phase('panel') as p:
+        panel = p.count(series_panel(cube))
+    with phase('estimate'):
+        result = estimate(panel, args.treated, args.controls, args.tariff_date, args.cluster, not args.levels)
+
+    pd.set_option('display.width', 200)
+    estimated = result.dropna(subset=['coef'])
+    print(f"双重差分估计（关税日期 {args.tariff_date.date()}，对照组 {', '.join(args.controls)}，按 {args.cluster} 聚类）")
+    print(estimated.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
+    skipped = result[result['coef'].isna()]
+    if not skipped.empty:
+        print(f"\n无法识别（没有对照组或关税前后缺少观测）：{len(skipped)} 个序列")
+        for (partner, product), metrics in skipped.groupby(['treated', 'product'], sort=False)['metric']:
+            print(f"- {partner} / {product}：{', '.join(metrics)}")
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"\n已保存至 {args.output}")
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
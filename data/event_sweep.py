@@ -0,0 +1,134 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from impact import welch_ttest
+from loaders import load_comex, load_indec, load_merge
+from market_share import month_index
+
+DATASET_DIR = '../dataset/'
+
+# 每个窗口至少 2 个月才能计算方差
+MIN_WINDOW = 2
+
+
+def monthly_matrix(df, date, value, series=None, agg='sum', fill_value=None):
+    """月份 × 序列 的矩阵，行覆盖数据中的完整月份区间
+
+    series 为分组列（为空时只有一条序列），缺失月份填 fill_value（默认 NaN，不参与计算）。
+    """
+    keys = [date] + ([series] if isinstance(series, str) else list(series or []))
+    grouped = df.groupby(keys, observed=True)[value].agg(agg)
+    matrix = grouped.unstack(keys[1:], fill_value=fill_value) if len(keys) > 1 else grouped.to_frame(value)
+    months = pd.date_range(matrix.index.min(), matrix.index.max(), freq='MS', name='date')
+    return matrix.reindex(months, fill_value=fill_value)
+
+
+def _prefix(values):
+    """有效观测数、合计、平方和的前缀和（首行补 0），NaN 不计入"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((1, values.shape[1]))
+    return (np.concatenate([zeros, np.cumsum(valid, axis=0)]),
+            np.concatenate([zeros, np.cumsum(filled, axis=0)]),
+            np.concatenate([zeros, np.cumsum(filled ** 2, axis=0)]))
+
+
+def _window_stats(prefix, start, end):
+    """[start, end) 窗口的样本数、均值、方差，start/end 为候选窗口数组，结果形状 (候选数, 序列数)"""
+    count, total, squares = (p[end] - p[start] for p in prefix)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        var = (squares - total * mean) / (count - 1)
+    return count, mean, np.maximum(var, 0)
+
+
+def candidate_windows(n_months, min_window=MIN_WINDOW, max_window=None):
+    """全部 (断点, 关税前窗口, 关税后窗口) 组合，断点为关税后第一个月的下标"""
+    max_window = max_window or n_months
+    breaks, pre_windows, post_windows = np.meshgrid(
+        np.arange(n_months + 1), np.arange(min_window, max_window + 1), np.arange(min_window, max_window + 1),
+        indexing='ij')
+    valid = (breaks - pre_windows >= 0) & (breaks + post_windows <= n_months)
+    return breaks[valid], pre_windows[valid], post_windows[valid]
+
+
+def sweep(matrix, min_window=MIN_WINDOW, max_window=None):
+    """对每个候选断点和每种前后窗口长度计算关税前后对比
+
+    前缀和与平方和的前缀和使每个候选的计算量为 O(1)，全部候选 × 全部序列一次完成。
+    返回长表：break、pre_window、post_window、series、各项统计量。
+    """
+    values = matrix.to_numpy(dtype=float)
+    prefix = _prefix(values)
+    breaks, pre_windows, post_windows = candidate_windows(len(matrix), min_window, max_window)
+
+    pre_n, pre_mean, pre_var = _window_stats(prefix, breaks - pre_windows, breaks)
+    post_n, post_mean, post_var = _window_stats(prefix, breaks, breaks + post_windows)
+    t_stat, p_value = welch_ttest(post_mean, post_var, post_n, pre_mean, pre_var, pre_n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_percent = np.where(pre_mean != 0, (post_mean - pre_mean) / pre_mean * 100, 0)
+
+    n_series = values.shape[1]
+    series = matrix.columns.to_flat_index()
+    result = pd.DataFrame({
+        'break': np.repeat(matrix.index[breaks], n_series),
+        'pre_window': np.repeat(pre_windows, n_series),
+        'post_window': np.repeat(post_windows, n_series),
+        'series': np.tile(np.asarray(series, dtype=object), len(breaks)),
+        'pre_n': pre_n.ravel(),
+        'post_n': post_n.ravel(),
+        'pre_mean': pre_mean.ravel(),
+        'post_mean': post_mean.ravel(),
+        'change_percent': change_percent.ravel(),
+        't_stat': t_stat.ravel(),
+        'p_value': p_value.ravel(),
+    })
+    return result[(result['pre_n'] >= min_window) & (result['post_n'] >= min_window)].reset_index(drop=True)
+
+
+def analysis_matrices(dataset_dir=DATASET_DIR):
+    """三个分析脚本使用的月度序列，列为 (来源, 序列, 指标)"""
+    matrices = []
+
+    merge = load_merge(dataset_dir + 'merge.csv')
+    merge['series'] = merge['trade_partner'].astype(str) + ' / ' + merge['product_type'].astype(str)
+    for metric, agg in (('amount', 'sum'), ('CNY', 'sum'), ('price', 'mean')):
+        matrix = monthly_matrix(merge, 'date', metric, 'series', agg)
+        matrix.columns = pd.MultiIndex.from_tuples([('china', name, metric) for name in matrix.columns])
+        matrices.append(matrix)
+
+    brazil = load_comex(dataset_dir + 'braz.csv')
+    brazil['date'] = month_index(brazil)
+    matrix = monthly_matrix(brazil, 'date', 'US$ FOB', 'Country', fill_value=0)
+    matrix.columns = pd.MultiIndex.from_tuples([('brazil', name, 'US$ FOB') for name in matrix.columns])
+    matrices.append(matrix)
+
+    argentina = load_indec(dataset_dir + 'agen.csv')
+    argentina['date'] = argentina['FECHA_'].dt.to_period('M').dt.to_timestamp()
+    for metric, agg in (('PESO_NETO_KILOS', 'sum'), ('MONTO_FOB_DOLAR', 'sum'), ('PRECIO_PROMEDIO', 'mean')):
+        matrix = monthly_matrix(argentina, 'date', metric, agg=agg)
+        matrix.columns = pd.MultiIndex.from_tuples([('argentina', 'Argentina', metric)])
+        matrices.append(matrix)
+
+    return pd.concat(matrices, axis=1).sort_index()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='关税断点扫描：所有候选断点 × 前后窗口长度 × 全部序列')
+    parser.add_argument('--min-window', type=int, default=MIN_WINDOW)
+    parser.add_argument('--max-window', type=int, default=12)
+    parser.add_argument('--output', default=DATASET_DIR + 'tariff_break_sweep.csv')
+    args = parser.parse_args()
+
+    result = sweep(analysis_matrices(), args.min_window, args.max_window)
+    result[['source', 'series', 'metric']] = pd.DataFrame(result.pop('series').tolist(), index=result.index)
+    result.to_csv(args.output, index=False, encoding='utf-8-sig')
+
+    # 每条序列 |t| 最大的断点
+    tested = result.dropna(subset=['t_stat'])
+    strongest = tested.loc[tested['t_stat'].abs().groupby([tested['source'], tested['series'], tested['metric']]).idxmax()]
+    print(strongest[['source', 'series', 'metric', 'break', 'pre_window', 'post_window', 'change_percent', 'p_value']]
+          .to_string(index=False))
+    print(f"\n共 {len(result)} 行，已保存至 {args.output}")
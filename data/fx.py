@@ -0,0 +1,186 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from buildcache import fingerprint, is_fresh, module_version, record
+from cube import ALL
+from ingest import file_hash
+from instrument import phase, write_report
+from loaders import DATASET_DIR, load_comex, load_indec, load_merge
+
+# 汇率表（需自行提供）：date、currency、rate 三列，rate 为 1 美元兑换的本币数量，
+# 可以是日度或月度数据，行序不限
+FX_PATH = os.path.join(DATASET_DIR, 'fx_rates.csv')
+
+# 换算为美元、吨后的各数据源，每个数据源一个文件 <数据源>.parquet，输入文件和汇率不变时直接读取
+NORMALIZED_DIR = os.path.join(DATASET_DIR, 'normalized')
+
+# 数据源 -> (输入文件, 金额的币种)。Comex Stat 和 INDEC 都以美元 FOB 报告
+SOURCES = {
+    'china': ('merge.csv', 'CNY'),
+    'brazil': ('braz.csv', 'USD'),
+    'argentina': ('agen.csv', 'USD'),
+}
+
+# 取交易日期当天或之前最近的汇率，早于交易日期超过该天数时视为缺失
+FX_TOLERANCE = pd.Timedelta(days=31)
+
+KG_PER_TONNE = 1000
+
+COLUMNS = ['date', 'partner', 'product', 'quantity_t', 'value_usd', 'price_usd_per_t', 'currency', 'fx_rate',
+           'fx_date']
+
+
+def load_fx(path=FX_PATH):
+    """读取汇率表，按日期排序（as-of 连接的要求），同一币种同一日期重复时保留最后一行"""
+    fx = pd.read_csv(path, usecols=['date', 'currency', 'rate'], dtype={'currency': 'str', 'rate': 'float64'},
+                     parse_dates=['date'])
+    fx['currency'] = fx['currency'].str.strip().str.upper()
+    invalid = fx[~(fx['rate'] > 0)]
+    if not invalid.empty:
+        raise ValueError(f"汇率应为正数：{path} 第 {', '.join(str(i + 2) for i in invalid.index[:5])} 行")
+    fx = fx.drop_duplicates(['currency', 'date'], keep='last')
+    return fx.sort_values('date', kind='stable', ignore_index=True)
+
+
+def attach_rates(dates, currencies, fx, tolerance=FX_TOLERANCE):
+    """每行交易的汇率：(rate, fx_date)，美元为 1，fx 只在有非美元行时用到
+
+    只对不同的 (日期, 币种) 做一次有序的 as-of 连接再映射回各行，汇率表很长（日度历史）时
+    开销主要是一次排序。缺少汇率时报错，不静默留空。
+    """
+    rows = pd.DataFrame({'date': pd.to_datetime(dates), 'currency': np.asarray(currencies, dtype=str)})
+    usd = (rows['currency'] == 'USD').to_numpy()
+    if usd.all():
+        return np.ones(len(rows)), rows['date'].to_numpy()
+    keys = rows[~usd].drop_duplicates().sort_values('date', kind='stable')
+    matched = pd.merge_asof(keys, fx.rename(columns={'date': 'fx_date'}), left_on='date', right_on='fx_date',
+                            by='currency', direction='backward', tolerance=tolerance)
+    missing = matched[matched['rate'].isna()]
+    if not missing.empty:
+        first = missing.iloc[0]
+        raise ValueError(f"汇率表缺少 {first['currency']} 在 {first['date']:%Y-%m-%d} 及之前 {tolerance.days} 天内的汇率"
+                         f"（共 {len(missing)} 个日期）")
+    rows = rows.merge(matched, on=['date', 'currency'], how='left')
+    return rows['rate'].mask(usd, 1.0).to_numpy(), rows['fx_date'].mask(usd, rows['date']).to_numpy()
+
+
+def _frame(date, partner, product, quantity_kg, value, currency, fx):
+    """统一的列：数量（吨）、金额（美元）、单位价值（美元/吨）及所用汇率"""
+    n = len(date)
+    rate, fx_date = attach_rates(date, np.full(n, currency, dtype=object), fx)
+    quantity = np.asarray(quantity_kg, dtype=float) / KG_PER_TONNE
+    value = np.asarray(value, dtype=float) / rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price = np.where(quantity > 0, value / quantity, np.nan)
+    return pd.DataFrame({
+        'date': pd.to_datetime(date).to_numpy(),
+        'partner': pd.Categorical(np.asarray(partner, dtype=str)),
+        'product': pd.Categorical(np.asarray(product, dtype=str)),
+        'quantity_t': quantity, 'value_usd': value, 'price_usd_per_t': price,
+        'currency': pd.Categorical([currency] * n), 'fx_rate': rate, 'fx_date': fx_date,
+    }, columns=COLUMNS)
+
+
+def normalize(source, data, fx):
+    """一个数据源换算为美元和吨。braz.csv 没有数量，数量和单位价值为 NaN"""
+    currency = SOURCES[source][1]
+    if source == 'china':
+        return _frame(data['date'], data['trade_partner'], data['product_type'], data['amount'], data['CNY'],
+                      currency, fx)
+    if source == 'brazil':
+        date = pd.to_datetime(pd.DataFrame({'year': data['Year'], 'month': data['Month'], 'day': 1}))
+        return _frame(date, data['Country'], [ALL] * len(data), np.full(len(data), np.nan), data['US$ FOB'],
+                      currency, fx)
+    return _frame(data['FECHA_'], [ALL] * len(data), data['POS_NCM'], data['PESO_NETO_KILOS'],
+                  data['MONTO_FOB_DOLAR'], currency, fx)
+
+
+def _load(source, path):
+    if source == 'china':
+        return load_merge(path)
+    if source == 'brazil':
+        return load_comex(path)
+    return load_indec(path)
+
+
+def normalized_path(source, normalized_dir=NORMALIZED_DIR):
+    return os.path.join(normalized_dir, f'{source}.parquet')
+
+
+def load_normalized(sources=tuple(SOURCES), fx_path=FX_PATH, normalized_dir=NORMALIZED_DIR, rebuild=False):
+    """各数据源换算后的表（source 列区分数据源），输入文件、汇率表（非美元数据源）和代码不变时读取缓存"""
+    cache_dir = os.path.join(normalized_dir, '.buildcache')
+    version = module_version(__file__)
+    fx = None
+    frames = []
+    for source in sources:
+        name, currency = SOURCES[source]
+        input_path = os.path.join(DATASET_DIR, name)
+        if currency != 'USD' and not os.path.exists(fx_path):
+            raise FileNotFoundError(f"{source} 的金额为 {currency}，需要汇率表 {fx_path}（date、currency、rate 三列）")
+        # 美元数据源不依赖汇率表，汇率更新时不需要重新换算
+        fp = fingerprint(file_hash(input_path), file_hash(fx_path) if currency != 'USD' else None,
+                         FX_TOLERANCE, version)
+        path = normalized_path(source, normalized_dir)
+        if not rebuild and is_fresh([path], fp, cache_dir):
+            with phase(f'load_{source}'):
+                frame = pd.read_parquet(path)
+        else:
+            if fx is None and currency != 'USD':
+                with phase('load_fx') as p:
+                    fx = p.count(load_fx(fx_path))
+            with phase(f'normalize_{source}') as p:
+                frame = p.count(normalize(source, _load(source, input_path), fx))
+            os.makedirs(normalized_dir, exist_ok=True)
+            # 先写临时文件再替换，多个脚本同时生成时读到的总是完整文件
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            frame.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            record([path], fp, cache_dir)
+        frames.append(frame.assign(source=source))
+    result = pd.concat(frames, ignore_index=True)
+    return result[['source'] + COLUMNS].astype({'source': 'category', 'partner': 'category', 'product': 'category'})
+
+
+def price_table(normalized):
+    """月份 × 序列（数据源 / 伙伴 / 商品）的单位价值（美元/吨），为各期金额合计 / 数量合计；没有数量的序列不列出"""
+    frame = normalized.dropna(subset=['quantity_t'])
+    frame = frame.assign(period=frame['date'].dt.to_period('M').dt.to_timestamp(),
+                         series=frame['source'].astype(str) + ' / ' + frame['partner'].astype(str) + ' / '
+                         + frame['product'].astype(str))
+    totals = frame.groupby(['period', 'series'], observed=True)[['value_usd', 'quantity_t']].sum()
+    price = totals['value_usd'] / totals['quantity_t'].where(lambda quantity: quantity > 0)
+    return price.unstack('series').rename_axis(index='date', columns=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='汇率换算：各数据源统一为美元和吨，比较中国进口价格与南美出口 FOB 价格')
+    parser.add_argument('--fx', default=FX_PATH, help='汇率表（date、currency、rate，rate 为 1 美元兑换的本币）')
+    parser.add_argument('--product', default='GM Yellow Soybean', help='中国海关数据中比较的商品（all 为全部）')
+    parser.add_argument('--rebuild', action='store_true', help='忽略缓存，重新换算')
+    parser.add_argument('--output', help='另存全部换算结果的 CSV 路径')
+    args = parser.parse_args()
+
+    normalized = load_normalized(fx_path=args.fx, rebuild=args.rebuild)
+    compared = normalized
+    if args.product != 'all':
+        compared = normalized[(normalized['source'] != 'china') | (normalized['product'] == args.product)]
+    with phase('compare'):
+        prices = price_table(compared)
+
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_rows', None)
+    print('单位价值（美元/吨，金额合计 / 数量合计）')
+    print(prices.to_string(float_format=lambda value: f"{value:.1f}"))
+    print('\nbrazil（braz.csv）只有金额没有数量，不列出单位价值')
+    if args.output:
+        normalized.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"已保存至 {args.output}")
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
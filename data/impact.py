@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+from resampling import resampling_table
+
+
+def welch_ttest(pre_mean, pre_var, pre_n, post_mean, post_var, post_n):
+    """向量化的 Welch t 检验（与 stats.ttest_ind(equal_var=False) 相同），返回 (t, p)"""
+    # scipy.stats 导入较慢，用到时再加载
+    from scipy import stats
+
+    pre_mean, pre_var, pre_n, post_mean, post_var, post_n = (
+        np.asarray(x, dtype=float) for x in (pre_mean, pre_var, pre_n, post_mean, post_var, post_n))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pre_se = pre_var / pre_n
+        post_se = post_var / post_n
+        se = pre_se + post_se
+        t = (pre_mean - post_mean) / np.sqrt(se)
+        dof = se ** 2 / (pre_se ** 2 / (pre_n - 1) + post_se ** 2 / (post_n - 1))
+        p = 2 * stats.t.sf(np.abs(t), dof)
+    return t, p
+
+
+def _period_sums(data, keys, value, period):
+    """每个分组每期（月）的合计"""
+    return data.groupby(keys + [period], observed=True, sort=False)[value].sum()
+
+
+def _period_stats(data, keys, value, period, periodic):
+    """按分组计算逐行均值/合计，以及按期合计后的样本数、均值、方差"""
+    rows = data.groupby(keys, observed=True, sort=False)[value].agg(mean='mean', total='sum')
+    periodic = periodic.groupby(level=list(range(len(keys))), observed=True, sort=False).agg(
+        n='count', period_mean='mean', period_var='var')
+    return rows.join(periodic)
+
+
+def _period_samples(periodic, groups):
+    """每个分组的按期合计数组，顺序与 groups 一致"""
+    samples = {group: values.to_numpy() for group, values in periodic.groupby(level=0, observed=True, sort=False)}
+    return [samples.get(group, np.empty(0)) for group in groups]
+
+
+def grouped_impact(pre_data, post_data, value, period, group=None, resample=False):
+    """一次性计算所有分组的关税前后对比
+
+    均值、合计和 change 按行计算；检验先把每个分组按 period 合计，再做 Welch t 检验。
+    period_total_change 为按期合计的均值之差（检验所比较的量），与按行的 change 在每期多行时不同。
+    只保留关税前后都有数据的分组。group 为 None 时把全部数据当作一组。
+    resample 为 True 时另外给出置换检验 p 值和 period_total_change 的 bootstrap 置信区间
+    （period_total_ci_low、period_total_ci_high）。
+    """
+    if group is None:
+        pre_data = pre_data.assign(_group='Global')
+        post_data = post_data.assign(_group='Global')
+        group = '_group'
+    keys = [group]
+
+    pre_periodic = _period_sums(pre_data, keys, value, period)
+    post_periodic = _period_sums(post_data, keys, value, period)
+    pre = _period_stats(pre_data, keys, value, period, pre_periodic)
+    post = _period_stats(post_data, keys, value, period, post_periodic)
+    joined = pre.join(post, how='inner', lsuffix='_pre', rsuffix='_post')
+
+    _, p_value = welch_ttest(
+        joined['period_mean_pre'], joined['period_var_pre'], joined['n_pre'],
+        joined['period_mean_post'], joined['period_var_post'], joined['n_post'])
+
+    result = pd.DataFrame({
+        'pre_mean': joined['mean_pre'],
+        'post_mean': joined['mean_post'],
+        'pre_total': joined['total_pre'],
+        'post_total': joined['total_post'],
+    }, index=joined.index)
+    result['change'] = result['post_mean'] - result['pre_mean']
+    pre_mean = result['pre_mean'].replace(0, np.nan)
+    result['change_percent'] = (result['change'] / pre_mean * 100).fillna(0)
+    result['period_total_change'] = joined['period_mean_post'] - joined['period_mean_pre']
+    result['p_value'] = p_value
+    if resample:
+        resampled = resampling_table(_period_samples(pre_periodic, joined.index),
+                                     _period_samples(post_periodic, joined.index), index=joined.index)
+        result['perm_p_value'] = resampled['perm_p_value']
+        result['period_total_ci_low'] = resampled['ci_low']
+        result['period_total_ci_high'] = resampled['ci_high']
+    result.index.name = None if group == '_group' else group
+    return result
@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from buildcache import module_version
+from customs import COLUMN_TYPES, read_customs
+
+# 海关原始数据目录与列式存储目录
+DATASET_DIR = '../dataset/'
+STORE_DIR = os.path.join(DATASET_DIR, 'store')
+MANIFEST_NAME = 'manifest.json'
+
+# 存储格式版本，格式变化时递增；格式版本或读取代码（ingest 及其导入的模块）变化时，旧存储会被整体重建
+STORE_VERSION = 2
+
+# 海关月度导出文件（2023.csv、2024in.csv、2025out.csv ...）
+SOURCE_PATTERN = '20*.csv'
+
+PARTITION_COLUMN = '数据年月'
+
+# 存储中的列及其类型（date 由数据年月生成）
+STORE_TYPES = dict(COLUMN_TYPES, date='datetime64[ns]')
+
+
+def file_hash(path, block_size=1 << 20):
+    """计算文件的 sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_source(path):
+    """读取一份海关原始数据（GBK），种用大豆在解析阶段过滤"""
+    return read_customs(path)
+
+
+def load_manifest(store_dir=STORE_DIR):
+    """读取存储清单，不存在或版本、读取代码不符时返回空清单"""
+    empty = {'version': STORE_VERSION, 'code': module_version(__file__), 'sources': {}}
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return empty
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != empty['version'] or manifest.get('code') != empty['code']:
+        return empty
+    return manifest
+
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def partition_path(store_dir, month, source_name):
+    """分区文件路径：store/数据年月=YYYYMM/<源文件名>.parquet"""
+    stem = os.path.splitext(source_name)[0]
+    return os.path.join(store_dir, f'{PARTITION_COLUMN}={month}', f'{stem}.parquet')
+
+
+def remove_source(store_dir, source_name, entry):
+    """删除某个源文件写入的全部分区文件"""
+    for month in entry['months']:
+        path = partition_path(store_dir, month, source_name)
+        if os.path.exists(path):
+            os.remove(path)
+        month_dir = os.path.dirname(path)
+        if os.path.isdir(month_dir) and not os.listdir(month_dir):
+            os.rmdir(month_dir)
+
+
+def write_source(store_dir, source_name, df):
+    """按数据年月把一份源文件写入分区，返回写入的月份列表"""
+    months = []
+    for month, part in df.groupby(PARTITION_COLUMN, sort=True):
+        path = partition_path(store_dir, month, source_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part.drop(columns=PARTITION_COLUMN).to_parquet(path, index=False)
+        months.append(int(month))
+    return months
+
+
+def ingest(dataset_dir=DATASET_DIR, store_dir=STORE_DIR, pattern=SOURCE_PATTERN):
+    """增量导入：只解析新增或内容变化的源文件
+
+    返回 {'ingested': [...], 'skipped': [...], 'removed': [...]}
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_manifest(store_dir)
+    if not manifest['sources'] and os.listdir(store_dir):
+        # 清单缺失或版本、读取代码变化：清空旧分区后重建
+        for name in os.listdir(store_dir):
+            path = os.path.join(store_dir, name)
+            if os.path.isdir(path) and name.startswith(PARTITION_COLUMN + '='):
+                shutil.rmtree(path)
+
+    sources = manifest['sources']
+    paths = sorted(glob.glob(os.path.join(dataset_dir, pattern)))
+    current = {os.path.basename(path): path for path in paths}
+    report = {'ingested': [], 'skipped': [], 'removed': []}
+
+    # 源文件已被删除，对应分区一并删除
+    for source_name in sorted(set(sources) - set(current)):
+        remove_source(store_dir, source_name, sources.pop(source_name))
+        report['removed'].append(source_name)
+
+    for source_name, path in current.items():
+        digest = file_hash(path)
+        entry = sources.get(source_name)
+        if entry is not None and entry['sha256'] == digest:
+            report['skipped'].append(source_name)
+            continue
+        if entry is not None:
+            remove_source(store_dir, source_name, entry)
+        months = write_source(store_dir, source_name, read_source(path))
+        sources[source_name] = {'sha256': digest, 'months': months}
+        # 每个文件写完即更新清单，中途失败时已完成的部分无需重做
+        save_manifest(manifest, store_dir)
+        report['ingested'].append(source_name)
+
+    save_manifest(manifest, store_dir)
+    return report
+
+
+def load_store(store_dir=STORE_DIR, months=None):
+    """从列式存储读取海关数据，可用 months 只读取部分月份"""
+    manifest = load_manifest(store_dir)
+    frames = []
+    for source_name, entry in sorted(manifest['sources'].items()):
+        for month in entry['months']:
+            if months is not None and month not in months:
+                continue
+            part = pd.read_parquet(partition_path(store_dir, month, source_name))
+            part.insert(0, PARTITION_COLUMN, month)
+            frames.append(part)
+    if not frames:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in STORE_TYPES.items()})
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.astype(STORE_TYPES)
+    df = df.sort_values([PARTITION_COLUMN, '贸易伙伴编码', '商品编码'], kind='stable', ignore_index=True)
+    return df
+
+
+if __name__ == '__main__':
+    result = ingest()
+    print(f"新增/更新: {result['ingested']}")
+    print(f"未变化: {result['skipped']}")
+    print(f"已删除: {result['removed']}")
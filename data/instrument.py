@@ -0,0 +1,123 @@
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不记录内存
+    resource = None
+
+# 运行报告目录，可用环境变量 RUN_REPORT_DIR 覆盖
+REPORT_DIR = os.environ.get('RUN_REPORT_DIR', '../dataset/reports/')
+
+# 设置环境变量 PROFILE_PHASES=1 时，每个阶段另存一份 cProfile 结果（可用 snakeviz、pstats 查看）
+PROFILE = os.environ.get('PROFILE_PHASES', '') not in ('', '0')
+
+# 本进程已记录的阶段，按开始顺序排列
+PHASES = []
+_stack = []
+_started = (datetime.now(), time.perf_counter(), time.process_time())
+
+
+def max_rss_mb():
+    """本进程到目前为止的峰值常驻内存（MB），不支持时返回 None"""
+    if resource is None:
+        return None
+    # Linux 的 ru_maxrss 单位为 KB，macOS 为字节
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _profile_path(name):
+    script = os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+    return os.path.join(REPORT_DIR, f"{script}.{name.replace('/', '.')}.prof")
+
+
+class Phase:
+    """一个阶段的计时记录，rows 可在阶段内设置为处理的行数"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = None
+
+    def count(self, data):
+        """记录行数并原样返回 data，便于写成 df = p.count(pd.read_csv(...))"""
+        self.rows = len(data)
+        return data
+
+
+@contextmanager
+def phase(name, rows=None):
+    """记录一段代码的墙钟时间、CPU 时间、峰值内存和行数
+
+    嵌套使用时记录的名字为 "外层/内层"。
+    """
+    current = Phase('/'.join([p.name for p in _stack] + [name]))
+    current.rows = rows
+    record = {'phase': current.name}
+    PHASES.append(record)
+    _stack.append(current)
+
+    profiler = cProfile.Profile() if PROFILE else None
+    rss_before = max_rss_mb()
+    wall, cpu = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield current
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['wall_s'] = time.perf_counter() - wall
+        record['cpu_s'] = time.process_time() - cpu
+        record['max_rss_mb'] = max_rss_mb()
+        record['rss_growth_mb'] = None if rss_before is None else record['max_rss_mb'] - rss_before
+        record['rows'] = current.rows
+        _stack.pop()
+        if profiler is not None:
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            record['profile'] = _profile_path(current.name)
+            profiler.dump_stats(record['profile'])
+
+
+def instrumented(name=None):
+    """装饰器版本的 phase，返回值有长度时记为行数"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name or func.__name__) as current:
+                result = func(*args, **kwargs)
+                if current.rows is None and hasattr(result, '__len__'):
+                    current.rows = len(result)
+                return result
+        return wrapper
+    return decorate
+
+
+def run_report():
+    """本次运行的汇总：脚本、起止时间、总耗时、峰值内存和各阶段记录"""
+    started, wall, cpu = _started
+    return {
+        'script': os.path.basename(sys.argv[0]),
+        'started': started.isoformat(timespec='seconds'),
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'max_rss_mb': max_rss_mb(),
+        'phases': PHASES,
+    }
+
+
+def write_report(report_dir=REPORT_DIR):
+    """把本次运行的报告写成 JSON：<脚本名>-<开始时间>.json，返回文件路径"""
+    report = run_report()
+    os.makedirs(report_dir, exist_ok=True)
+    script = os.path.splitext(report['script'] or 'python')[0]
+    path = os.path.join(report_dir, f"{script}-{_started[0]:%Y%m%d-%H%M%S}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
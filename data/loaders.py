@@ -0,0 +1,118 @@
+import os
+
+import pandas as pd
+
+from schema import decode
+
+DATASET_DIR = '../dataset/'
+
+# merge.csv：编码列用小整数，数量和金额超过 int32 范围
+MERGE_TYPES = {
+    'partner': 'int16',
+    'product': 'int32',
+    'amount': 'int64',
+    'CNY': 'int64',
+    'price': 'float64',
+}
+
+# Comex Stat 导出：分析只需要 年 × 月 × 目的地 的金额合计
+COMEX_KEYS = ['Year', 'Month', 'Country']
+COMEX_VALUE = 'US$ FOB'
+COMEX_TYPES = {'Year': 'int16', 'Month': 'int8', 'Country': 'str'}
+
+# 分块读取的行数，可用环境变量 COMEX_CHUNKSIZE 设置（为空时整表读入内存）
+COMEX_CHUNKSIZE = int(os.environ['COMEX_CHUNKSIZE']) if os.environ.get('COMEX_CHUNKSIZE') else None
+
+# INDEC 出口数据（agen.csv）：整数列读取后再缩小到能容纳取值的最小类型
+INDEC_TYPES = {
+    'POS_NCM': 'category',
+    'UN': 'int64',
+    'PESO_NETO_KILOS': 'float64',
+    'MONTO_FOB_DOLAR': 'float64',
+    'CANT_DECLARACIONES': 'int64',
+    'CANT_UNIDAD_ESTADISTICA': 'float64',
+    'PRECIO_MAX': 'float64',
+    'PRECIO_MIN': 'float64',
+    'PRECIO_PROMEDIO': 'float64',
+}
+INDEC_DOWNCAST = ('UN', 'CANT_DECLARACIONES', 'PESO_NETO_KILOS', 'CANT_UNIDAD_ESTADISTICA')
+
+
+def downcast_integers(df, columns):
+    """整数列（以及取值全为整数的浮点列）转换为能容纳取值的最小整数类型"""
+    for name in columns:
+        values = df[name]
+        if values.dtype.kind == 'f' and not (values.notna().all() and (values % 1 == 0).all()):
+            continue
+        df[name] = pd.to_numeric(values.astype('int64'), downcast='integer')
+    return df
+
+
+def load_merge(path=DATASET_DIR + 'merge.csv', decoded=True):
+    """读取 merge.csv：date 解析为日期，编码列为小整数
+
+    decoded 为 True 时另外生成 trade_partner、product_type 两个分类列。
+    """
+    df = pd.read_csv(path, dtype=MERGE_TYPES, parse_dates=['date'])
+    if decoded:
+        decode(df)
+    return df
+
+
+def _fold(df, keys, value):
+    # 分组按首次出现的顺序排列，分块读取时也与原文件中的行序一致
+    return df.groupby(keys, sort=False)[value].sum().reset_index()
+
+
+def load_comex(path, chunksize=COMEX_CHUNKSIZE, keys=COMEX_KEYS, value=COMEX_VALUE):
+    """读取 Comex Stat 导出并汇总为 年 × 月 × 目的地 的金额合计
+
+    原始文件可以是 NCM × 州 × 港口 × 月 等更细的粒度，多余的列不读取。
+    chunksize 不为空时分块读取，每块汇总后并入累计结果，内存只与分组数有关；
+    金额为整数（Comex Stat 的美元 FOB 值）时与整表读入的结果完全相同。
+    汇总后目的地为分类列。
+    """
+    columns = list(keys) + [value]
+    dtype = {name: COMEX_TYPES[name] for name in keys if name in COMEX_TYPES}
+    if chunksize is None:
+        folded = _fold(pd.read_csv(path, usecols=columns, dtype=dtype), keys, value)
+    else:
+        folded = None
+        for chunk in pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize):
+            chunk = _fold(chunk, keys, value)
+            folded = chunk if folded is None else _fold(pd.concat([folded, chunk], ignore_index=True), keys, value)
+        if folded is None:
+            folded = pd.DataFrame({name: pd.Series(dtype=dtype.get(name)) for name in columns})
+    return folded.astype({name: 'category' for name in keys if dtype.get(name) == 'str'})
+
+
+def load_indec(path=DATASET_DIR + 'agen.csv'):
+    """读取 INDEC 出口数据（agen.csv）
+
+    表头末尾补了几百个空格，读取前先去掉，FECHA_ 解析为日期，POS_NCM 为分类列，
+    整数列缩小类型（取值有小数的数量列保持 float64）。
+    """
+    with open(path, encoding='utf-8') as f:
+        names = [name.strip() for name in f.readline().split(',')]
+    df = pd.read_csv(path, header=0, names=names, dtype={name: INDEC_TYPES[name] for name in names
+                                                          if name in INDEC_TYPES}, parse_dates=['FECHA_'])
+    return downcast_integers(df, [name for name in INDEC_DOWNCAST if name in df.columns])
+
+
+if __name__ == '__main__':
+    # 默认类型与紧凑类型的内存对比
+    untyped = {
+        'merge.csv': pd.read_csv(DATASET_DIR + 'merge.csv'),
+        'braz.csv': pd.read_csv(DATASET_DIR + 'braz.csv'),
+        'agen.csv': pd.read_csv(DATASET_DIR + 'agen.csv'),
+    }
+    typed = {
+        'merge.csv': load_merge(decoded=False),
+        'braz.csv': load_comex(DATASET_DIR + 'braz.csv'),
+        'agen.csv': load_indec(),
+    }
+    for name in untyped:
+        before = untyped[name].memory_usage(deep=True).sum()
+        after = typed[name].memory_usage(deep=True).sum()
+        print(f"{name:<10}{before / 1024:>10.1f} KB -> {after / 1024:>8.1f} KB  ({before / after:.1f}x)")
+        print(typed[name].dtypes.to_string(), '\n')
@@ -0,0 +1,41 @@
+import pandas as pd
+
+
+def month_index(df, year='Year', month='Month'):
+    """由年、月两列生成每月 1 日的日期"""
+    return pd.to_datetime(pd.DataFrame({'year': df[year], 'month': df[month], 'day': 1}))
+
+
+def monthly_pivot(df, value='US$ FOB', column='Country', start=None, end=None):
+    """构建 月份 × 目的地 的金额透视表
+
+    行是从 start 到 end 的每个月（默认取数据中的最早、最晚月份），缺失月份补 0。
+    """
+    dates = df['date'] if 'date' in df.columns else month_index(df)
+    pivot = df.pivot_table(index=dates, columns=column, values=value, aggfunc='sum', fill_value=0, observed=True)
+    pivot.index.name = 'date'
+    pivot.columns.name = column
+
+    start = pd.Timestamp(start) if start is not None else dates.min()
+    end = pd.Timestamp(end) if end is not None else dates.max()
+    return pivot.reindex(pd.date_range(start, end, freq='MS', name='date'), fill_value=0)
+
+
+def share_series(pivot, destinations=None):
+    """每个目的地每月占总额的百分比，当月总额为 0 时记为 0"""
+    total = pivot.sum(axis=1)
+    shares = pivot.div(total.where(total > 0), axis=0).mul(100).fillna(0)
+    if destinations is not None:
+        shares = shares.reindex(columns=list(destinations), fill_value=0)
+    return shares
+
+
+def period_share(pivot, dates=None, destinations=None):
+    """若干月份合计后各目的地占总额的百分比，dates 为空时使用全部月份"""
+    window = pivot if dates is None else pivot.loc[dates]
+    totals = window.sum(axis=0)
+    grand_total = totals.sum()
+    shares = totals / grand_total * 100 if grand_total > 0 else totals * 0
+    if destinations is not None:
+        shares = shares.reindex(list(destinations), fill_value=0)
+    return shares
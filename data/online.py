@@ -0,0 +1,337 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import argentina_export_analysis as argentina
+import brazil_export_analysis as brazil
+import results_store
+import tariff_model
+from cube import ALL, METRICS, argentina_facts, brazil_facts, china_facts
+from impact import welch_ttest
+from ingest import file_hash
+from instrument import phase, write_report
+from loaders import DATASET_DIR, load_comex, load_indec, load_merge
+from maps import EXPORT_PRODUCTS
+
+# 每条序列的运行状态，每批新数据只读写受影响的行
+STATE_PATH = os.path.join(DATASET_DIR, 'online.sqlite')
+
+# 数据源 -> (读取函数, 事实表), 与数据立方体相同
+SOURCES = {
+    'china': (load_merge, china_facts),
+    'brazil': (load_comex, brazil_facts),
+    'argentina': (load_indec, argentina_facts),
+}
+INPUT_FILES = {'china': 'merge.csv', 'brazil': 'braz.csv', 'argentina': 'agen.csv'}
+
+# brazil、argentina 的分析比较 2025 年的关税前后月份
+ANALYSIS_YEAR = 2025
+
+# 全部伙伴的合计；没有伙伴维度的数据源（argentina）直接记为 Global
+GLOBAL = 'Global'
+
+# 结果数据库中的统一指标名和单位：事实表的指标列 -> (指标名, 单位)，沿用各分析脚本的映射
+_ARGENTINA_UNITS = dict(argentina.STORE_METRICS.values())
+STORE_METRICS = {
+    **tariff_model.STORE_METRICS,
+    'US$ FOB': brazil.STORE_METRIC,
+    **{column: (metric, _ARGENTINA_UNITS[metric]) for column, metric in argentina.STORE_TRENDS.items()},
+}
+
+KEYS = ['source', 'subject', 'product', 'metric']
+MONTH_KEYS = KEYS + ['year', 'month']
+WINDOW_KEYS = KEYS + ['window']
+MOMENTS = ['n', 'mean', 'm2', 'total']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS months (
+    source TEXT, subject TEXT, product TEXT, metric TEXT, year INTEGER, month INTEGER,
+    n INTEGER, mean REAL, m2 REAL, total REAL,
+    PRIMARY KEY (source, subject, product, metric, year, month)
+);
+CREATE TABLE IF NOT EXISTS windows (
+    source TEXT, subject TEXT, product TEXT, metric TEXT, window TEXT,
+    n INTEGER, mean REAL, m2 REAL, total REAL,
+    months_n INTEGER, months_mean REAL, months_m2 REAL, months_total REAL,
+    PRIMARY KEY (source, subject, product, metric, window)
+);
+CREATE TABLE IF NOT EXISTS batches (
+    file_hash TEXT PRIMARY KEY, source TEXT, path TEXT, rows INTEGER, ingested TEXT
+);
+"""
+
+
+def connect(path=STATE_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, timeout=60)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def batch_rows(source, facts):
+    """事实表 -> 长表：KEYS + year、month、value。有伙伴维度的数据源另加全部伙伴合计的 Global 序列"""
+    rows = facts.melt(id_vars=['year', 'month', 'partner', 'product'], value_vars=METRICS[source],
+                      var_name='metric').dropna(subset=['value'])
+    rows = pd.DataFrame({
+        'source': source, 'subject': rows['partner'].astype(str), 'product': rows['product'].astype(str),
+        'metric': rows['metric'], 'year': rows['year'].astype(int), 'month': rows['month'].astype(int),
+        'value': rows['value'].astype(float),
+    })
+    partnered = rows['subject'] != ALL
+    rows.loc[~partnered, 'subject'] = GLOBAL
+    return pd.concat([rows, rows[partnered].assign(subject=GLOBAL)], ignore_index=True)
+
+
+def window(source, year, month):
+    """关税前后的划分，与各分析脚本相同：'pre'、'post'，不参与比较的月份为 None"""
+    year, month = np.asarray(year), np.asarray(month)
+    if source == 'china':
+        # tariff_model：按日期（每月 1 日）是否早于关税实施日
+        dates = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': 1}))
+        pre = (dates < tariff_model.TARIFF_DATE).to_numpy()
+        post = ~pre
+    else:
+        pre = (year == ANALYSIS_YEAR) & np.isin(month, brazil.PRE_TARIFF_MONTHS)
+        post = (year == ANALYSIS_YEAR) & np.isin(month, brazil.POST_TARIFF_MONTHS)
+    return np.select([pre, post], ['pre', 'post'], default=None)
+
+
+def moments(frame, keys, value='value'):
+    """每组的个数、均值、离差平方和（m2）和合计"""
+    grouped = frame.groupby(keys, sort=False)[value]
+    stats = grouped.agg(n='count', mean='mean', total='sum')
+    stats['m2'] = grouped.var(ddof=0).fillna(0) * stats['n']
+    return stats.reset_index()
+
+
+def combine(a, b, sign=1):
+    """合并（sign=1）或移除（sign=-1，b 须是 a 的一部分）两组统计量 n、mean、m2、total
+
+    Chan 等人的并行 Welford 公式：m2 = m2_a + m2_b + delta² · n_a · n_b / n，移除时反向求解。
+    a、b 为索引对齐、列为 MOMENTS 的 DataFrame，缺失的组记为空。
+    """
+    a = a[MOMENTS].astype(float).fillna(0)
+    b = b[MOMENTS].reindex(a.index).astype(float).fillna(0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if sign > 0:
+            n = a['n'] + b['n']
+            delta = b['mean'] - a['mean']
+            mean = a['mean'] + delta * b['n'] / n
+            m2 = a['m2'] + b['m2'] + delta ** 2 * a['n'] * b['n'] / n
+        else:
+            n = a['n'] - b['n']
+            mean = (a['n'] * a['mean'] - b['n'] * b['mean']) / n
+            delta = b['mean'] - mean
+            m2 = a['m2'] - b['m2'] - delta ** 2 * n * b['n'] / a['n']
+    empty = n <= 0
+    return pd.DataFrame({
+        'n': n.where(~empty, 0).astype(int),
+        'mean': mean.where(~empty, 0),
+        # 舍入误差可能使 m2 略小于 0
+        'm2': m2.where(~empty, 0).clip(lower=0),
+        'total': (a['total'] + sign * b['total']).where(~empty, 0),
+    })
+
+
+def _read(connection, table, keys, frame):
+    """读取状态表中与 frame 的 keys 相同的行（通过临时表连接，只读取受影响的行）"""
+    columns = ', '.join(keys)
+    connection.execute('DROP TABLE IF EXISTS temp.touched')
+    connection.execute(f'CREATE TEMP TABLE touched ({columns})')
+    connection.executemany(f"INSERT INTO temp.touched VALUES ({', '.join('?' * len(keys))})",
+                           frame[keys].drop_duplicates().itertuples(index=False, name=None))
+    existing = pd.read_sql_query(f'SELECT t.* FROM {table} t JOIN temp.touched USING ({columns})', connection)
+    return existing.set_index(keys)
+
+
+def _write(connection, table, frame):
+    columns = list(frame.columns)
+    connection.executemany(
+        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        [tuple(value.item() if hasattr(value, 'item') else value for value in row)
+         for row in frame.itertuples(index=False, name=None)])
+
+
+def update(connection, source, facts):
+    """把一批新数据并入运行状态，读写量只与这批数据涉及的序列和月份有关，返回更新的月份行数
+
+    每月的状态为行级的个数、均值、m2 和合计；关税前后窗口另有行级状态和按月合计的状态（检验用）。
+    某月已有数据时，该月合计先从窗口中移除再加入新的合计。同一月份分多批到达时，月合计和检验仍然精确，
+    行级统计量把每批当作不同的行（braz.csv 按 年 × 月 × 目的地 合计后才是一行）。
+    """
+    rows = batch_rows(source, facts)
+    batch = moments(rows, MONTH_KEYS).set_index(MONTH_KEYS)
+    old = _read(connection, 'months', MONTH_KEYS, batch.reset_index()).reindex(batch.index)
+    new = combine(old, batch)
+
+    # 行级的窗口状态
+    rows['window'] = window(source, rows['year'], rows['month'])
+    row_batch = moments(rows.dropna(subset=['window']), WINDOW_KEYS).set_index(WINDOW_KEYS)
+
+    # 按月合计的窗口状态：移除受影响月份原来的合计，加入新的合计
+    months = pd.DataFrame({'old': old['total'], 'new': new['total'], 'had': old['n'].fillna(0) > 0}).reset_index()
+    months['window'] = window(source, months['year'], months['month'])
+    months = months.dropna(subset=['window'])
+    removed = moments(months[months['had']], WINDOW_KEYS, 'old').set_index(WINDOW_KEYS)
+    added = moments(months, WINDOW_KEYS, 'new').set_index(WINDOW_KEYS)
+
+    index = row_batch.index.union(added.index)
+    windows = _read(connection, 'windows', WINDOW_KEYS, index.to_frame(index=False)).reindex(index)
+    monthly_columns = {f'months_{name}': name for name in MOMENTS}
+    month_state = combine(combine(windows[list(monthly_columns)].rename(columns=monthly_columns), removed, -1), added)
+    windows = combine(windows, row_batch).join(month_state.rename(columns={v: k for k, v in monthly_columns.items()}))
+
+    with connection:
+        _write(connection, 'months', new.reset_index())
+        _write(connection, 'windows', windows.reset_index())
+    return len(new)
+
+
+def ingest(connection, source, path):
+    """读取一个数据文件（只含新的月份，格式与 dataset 中的文件相同）并入状态；同一文件只并入一次"""
+    digest = file_hash(path)
+    if connection.execute('SELECT 1 FROM batches WHERE file_hash = ?', (digest,)).fetchone():
+        return None
+    load, facts = SOURCES[source]
+    with phase(f'load_{source}') as p:
+        data = p.count(load(path))
+    with phase(f'update_{source}', rows=len(data)):
+        updated = update(connection, source, facts(data))
+    with connection:
+        connection.execute('INSERT INTO batches VALUES (?, ?, ?, ?, ?)',
+                           (digest, source, os.path.normpath(path), len(data),
+                            datetime.now().isoformat(timespec='seconds')))
+    return updated
+
+
+def monthly_tests(connection, source='china'):
+    """按 tariff_model 的方法检验每条序列的月度值（Shapiro-Wilk 后选择 t-test 或 Mann-Whitney U），
+    索引为 KEYS，列为 test、p_value
+
+    merge.csv 每个伙伴、商品每月一行，月度值就是 tariff_model 检验的行；需要全部月份的值，
+    每条序列只有几十个月，直接由每月状态读取。
+    """
+    state = pd.read_sql_query('SELECT * FROM months WHERE source = ? AND n > 0', connection, params=(source,))
+    is_price = state['metric'].map(lambda metric: STORE_METRICS[metric][0] == 'price')
+    state['value'] = state['total'].where(~is_price, state['mean'])
+    state['window'] = window(source, state['year'], state['month'])
+    tests = []
+    for key, series in state.dropna(subset=['window']).groupby(KEYS, sort=False):
+        pre = series.loc[series['window'] == 'pre', 'value']
+        post = series.loc[series['window'] == 'post', 'value']
+        if len(pre) and len(post):
+            test_name, p_value = tariff_model.select_test(pre, post)
+            tests.append(key + (tariff_model.STORE_TESTS[test_name], p_value))
+    return pd.DataFrame(tests, columns=KEYS + ['test', 'p_value']).set_index(KEYS)
+
+
+def impact_table(connection):
+    """由窗口状态生成关税影响表（结果数据库的统一列）
+
+    china 的检验与 tariff_model 相同（monthly_tests），其他数据源为按月合计的 Welch t 检验。
+    """
+    state = pd.read_sql_query('SELECT * FROM windows', connection)
+    pre = state[state['window'] == 'pre'].set_index(KEYS)
+    post = state[state['window'] == 'post'].set_index(KEYS)
+    joined = pre.join(post, how='inner', lsuffix='_pre', rsuffix='_post')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = {side: joined[f'm2_{side}'] / (joined[f'n_{side}'] - 1) for side in ('pre', 'post')}
+        month_variance = {side: joined[f'months_m2_{side}'] / (joined[f'months_n_{side}'] - 1)
+                          for side in ('pre', 'post')}
+    _, p_value = welch_ttest(joined['months_mean_pre'], month_variance['pre'], joined['months_n_pre'],
+                             joined['months_mean_post'], month_variance['post'], joined['months_n_post'])
+
+    result = pd.DataFrame({
+        'pre_mean': joined['mean_pre'], 'post_mean': joined['mean_post'],
+        'pre_std': np.sqrt(variance['pre']), 'post_std': np.sqrt(variance['post']),
+        'pre_total': joined['total_pre'], 'post_total': joined['total_post'],
+    }, index=joined.index)
+    result['change'] = result['post_mean'] - result['pre_mean']
+    result['change_percent'] = (result['change'] / result['pre_mean'].replace(0, np.nan) * 100).fillna(0)
+    result['test'] = 'Welch t-test'
+    result['p_value'] = p_value
+    china = result.index.get_level_values('source') == 'china'
+    if china.any():
+        result.loc[china, ['test', 'p_value']] = monthly_tests(connection).reindex(result.index[china])
+    return result.reset_index()
+
+
+def trend_table(connection, source=None):
+    """每条序列每月的合计（金额、数量）或均值（单价）"""
+    where, values = ('WHERE source = ?', (source,)) if source else ('', ())
+    state = pd.read_sql_query(f'SELECT * FROM months {where} ORDER BY {", ".join(MONTH_KEYS)}', connection,
+                              params=values)
+    is_price = state['metric'].map(lambda metric: STORE_METRICS[metric][0] == 'price')
+    state['value'] = state['total'].where(~is_price, state['mean'])
+    state['period'] = [f'{year:04d}-{month:02d}' for year, month in zip(state['year'], state['month'])]
+    return state[KEYS + ['period', 'value']]
+
+
+def store_records(impact, trends):
+    """结果数据库的统一格式：subject 为 伙伴 / 商品（商品只有一种时省略），flow 由商品和数据源确定"""
+    def subjects(frame):
+        single = frame['product'].isin([ALL]) | (frame['source'] == 'argentina')
+        return frame['subject'].where(single, frame['subject'] + ' / ' + frame['product'])
+
+    def flows(frame):
+        imported = (frame['source'] == 'china') & ~frame['product'].isin(EXPORT_PRODUCTS)
+        return np.where(imported, 'import', 'export')
+
+    impact = impact.assign(subject=subjects(impact), flow=flows(impact),
+                           unit=impact['metric'].map(lambda metric: STORE_METRICS[metric][1]),
+                           metric=impact['metric'].map(lambda metric: STORE_METRICS[metric][0]))
+    trends = trends.assign(subject=subjects(trends), flow=flows(trends),
+                           metric=trends['metric'].map(lambda metric: STORE_METRICS[metric][0]))
+    return impact, trends
+
+
+def main():
+    parser = argparse.ArgumentParser(description='增量更新：每条序列保存运行状态，新月份到达时只处理新数据')
+    parser.add_argument('--state', default=STATE_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('init', help='由 dataset 中的完整数据建立状态（只需一次）')
+    update_parser = commands.add_parser('update', help='并入只含新月份的数据文件')
+    for source, name in INPUT_FILES.items():
+        update_parser.add_argument(f'--{source}', metavar=name.upper().replace('.', '_'),
+                                   help=f'格式与 {name} 相同的新数据')
+    commands.add_parser('report', help='由当前状态输出关税影响表')
+    args = parser.parse_args()
+
+    connection = connect(args.state)
+    try:
+        if args.command == 'init':
+            paths = {source: os.path.join(DATASET_DIR, name) for source, name in INPUT_FILES.items()}
+        elif args.command == 'update':
+            paths = {source: getattr(args, source) for source in SOURCES if getattr(args, source)}
+        else:
+            paths = {}
+        ingested = {}
+        for source, path in paths.items():
+            updated = ingest(connection, source, path)
+            if updated is not None:
+                ingested[source] = path
+            print(f"{source}：{path} 已并入过，跳过" if updated is None else f"{source}：{path}，更新 {updated} 个序列月份")
+
+        with phase('refresh'):
+            impact, trends = store_records(impact_table(connection), trend_table(connection))
+        pd.set_option('display.width', 200)
+        pd.set_option('display.max_rows', None)
+        print(impact[['source', 'subject', 'flow', 'metric', 'pre_mean', 'post_mean', 'change_percent', 'p_value']]
+              .to_string(index=False, float_format=lambda value: f"{value:.4g}"))
+        if ingested:
+            with phase('store'):
+                run_id = results_store.record_run('online', impact.drop(columns=['source', 'product']),
+                                                  trends.drop(columns=['source', 'product']),
+                                                  params={'state': args.state, 'batches': ingested})
+            print(f"\n结果数据库：{results_store.DB_PATH}（run_id={run_id}）")
+    finally:
+        connection.close()
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
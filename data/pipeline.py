@@ -0,0 +1,188 @@
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import buildcache
+from charts import CHART_DIR, DEFAULT_FORMATS
+from cube import cube_files
+
+# 各脚本使用相对 data/ 的路径，子进程都在这个目录下运行
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = '../dataset/'
+
+# 流水线自己的阶段指纹，与脚本内部记录的产物指纹分开保存
+PIPELINE_CACHE_DIR = os.path.join(buildcache.CACHE_DIR, 'pipeline')
+
+
+def stage(name, script, inputs, outputs, after=()):
+    """声明一个阶段
+
+    inputs、outputs 为相对 data/ 的文件路径（inputs 可以是通配符），
+    after 为必须先完成的阶段。
+    """
+    return {'name': name, 'script': script, 'inputs': list(inputs), 'outputs': list(outputs), 'after': list(after)}
+
+
+def _dataset(*names):
+    return [DATASET_DIR + name for name in names]
+
+
+def _charts(*names):
+    return [f'{CHART_DIR}{name}.{fmt}' for name in names for fmt in DEFAULT_FORMATS]
+
+
+STAGES = [
+    stage('dataformat', 'dataformat.py',
+          inputs=_dataset('20*.csv'),
+          outputs=_dataset('merge.csv', 'partners.csv', 'products.csv')),
+    stage('tariff_model', 'tariff_model.py',
+          inputs=_dataset('merge.csv'),
+          outputs=_dataset('china_import_usa_tariff_impact.csv', 'china_export_usa_tariff_impact.csv'),
+          after=['dataformat']),
+    stage('cube', 'cube.py',
+          inputs=_dataset('merge.csv', 'braz.csv', 'agen.csv'),
+          outputs=cube_files(),
+          after=['dataformat']),
+    stage('maps', 'maps.py',
+          inputs=cube_files(),
+          outputs=_charts('soybean_import_analysis', 'soybean_export_analysis', 'soybean_price_comparison'),
+          after=['cube']),
+    stage('argentina', 'argentina_export_analysis.py',
+          inputs=_dataset('agen.csv') + cube_files(),
+          outputs=_dataset('argentina_export_tariff_impact.csv', 'argentina_monthly_trends.csv')
+          + _charts('argentina_volume_trend', 'argentina_value_trend', 'argentina_price_trend'),
+          after=['cube']),
+    stage('brazil', 'brazil_export_analysis.py',
+          inputs=_dataset('braz.csv') + cube_files(),
+          outputs=_dataset('brazil_global_export_impact.csv', 'brazil_country_export_impact.csv')
+          + _charts('brazil_export_trend', 'brazil_china_percentage'),
+          after=['cube']),
+]
+
+
+def _path(path):
+    return os.path.normpath(os.path.join(DATA_DIR, path))
+
+
+def input_files(spec):
+    """阶段输入通配符展开后的文件列表"""
+    return sorted(path for pattern in spec['inputs'] for path in glob.glob(_path(pattern)))
+
+
+def stage_fingerprint(spec):
+    """输入文件内容和脚本（含导入的同级模块）源码的指纹"""
+    inputs = input_files(spec)
+    return buildcache.fingerprint(
+        [os.path.relpath(path, DATA_DIR) for path in inputs],
+        buildcache.code_version(*inputs),
+        buildcache.module_version(spec['script']),
+    )
+
+
+def _cache_dir():
+    return _path(PIPELINE_CACHE_DIR)
+
+
+def is_stage_fresh(spec, fp):
+    return buildcache.is_fresh([_path(output) for output in spec['outputs']], fp, _cache_dir())
+
+
+def run_stage(spec):
+    """在子进程中运行一个阶段，返回 (返回码, 输出, 耗时秒数)"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, spec['script']], cwd=DATA_DIR, capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONUNBUFFERED='1'))
+    return completed.returncode, completed.stdout + completed.stderr, time.perf_counter() - start
+
+
+def select(stages, names):
+    """指定阶段及其全部上游阶段，保持声明顺序"""
+    by_name = {spec['name']: spec for spec in stages}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的阶段: {', '.join(unknown)}")
+    selected, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name]['after'])
+    return [spec for spec in stages if spec['name'] in selected]
+
+
+def run_pipeline(stages=STAGES, force=False, max_workers=None, verbose=True):
+    """按依赖关系运行各阶段，没有依赖关系的阶段并行运行
+
+    一个阶段的上游全部完成后才计算它的指纹，指纹和产物都没变化时跳过。
+    返回 {阶段名: {'status', 'seconds'}}，status 为 ran / skipped / failed / blocked。
+    """
+    names = {spec['name'] for spec in stages}
+    waiting = {spec['name']: spec for spec in stages}
+    report = {}
+
+    def ready():
+        return [spec for spec in waiting.values()
+                if all(dep in report or dep not in names for dep in spec['after'])]
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1) as pool:
+        running = {}
+        while waiting or running:
+            runnable = ready()
+            if not runnable and not running:
+                raise ValueError(f"阶段依赖存在环: {', '.join(waiting)}")
+            for spec in runnable:
+                del waiting[spec['name']]
+                if any(report.get(dep, {}).get('status') in ('failed', 'blocked') for dep in spec['after']):
+                    report[spec['name']] = {'status': 'blocked', 'seconds': 0.0}
+                    continue
+                fp = stage_fingerprint(spec)
+                if not force and is_stage_fresh(spec, fp):
+                    report[spec['name']] = {'status': 'skipped', 'seconds': 0.0}
+                    if verbose:
+                        print(f"[{spec['name']}] 输入和代码均未变化，跳过")
+                    continue
+                if verbose:
+                    print(f"[{spec['name']}] 开始运行 {spec['script']}")
+                running[pool.submit(run_stage, spec)] = (spec, fp)
+
+            if not running:
+                # 本轮只有跳过/阻塞的阶段，继续检查是否有新就绪的阶段
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                spec, fp = running.pop(future)
+                returncode, output, seconds = future.result()
+                status = 'ran' if returncode == 0 else 'failed'
+                if status == 'ran':
+                    buildcache.record([_path(output) for output in spec['outputs']
+                                       if os.path.exists(_path(output))], fp, _cache_dir())
+                report[spec['name']] = {'status': status, 'seconds': seconds}
+                if verbose:
+                    print(f"[{spec['name']}] {'完成' if status == 'ran' else '失败'}，用时 {seconds:.2f}s")
+                    if status == 'failed' or verbose > 1:
+                        print(output)
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按依赖关系运行全部分析脚本，只重跑输入或代码变化的阶段')
+    parser.add_argument('stages', nargs='*', help='只运行这些阶段（及其上游），默认全部')
+    parser.add_argument('--force', action='store_true', help='忽略指纹，全部重跑')
+    parser.add_argument('--jobs', type=int, default=None, help='最多同时运行的阶段数')
+    parser.add_argument('--show-output', action='store_true', help='打印每个阶段的输出')
+    args = parser.parse_args()
+
+    stages = select(STAGES, args.stages) if args.stages else STAGES
+    start = time.perf_counter()
+    report = run_pipeline(stages, force=args.force, max_workers=args.jobs, verbose=2 if args.show_output else 1)
+    total = time.perf_counter() - start
+
+    print(f"\n{'阶段':<16}{'状态':<10}{'用时(s)':>10}")
+    for name, result in report.items():
+        print(f"{name:<16}{result['status']:<10}{result['seconds']:>10.2f}")
+    print(f"{'合计':<16}{'':<10}{total:>10.2f}")
+    sys.exit(1 if any(result['status'] in ('failed', 'blocked') for result in report.values()) else 0)
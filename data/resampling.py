@@ -0,0 +1,146 @@
+from itertools import combinations, islice
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+# 默认重抽样次数；组合总数不超过该值时改用精确置换检验
+DEFAULT_RESAMPLES = 9999
+DEFAULT_SEED = 0
+
+# 重抽样逐块处理，每块的中间数组（序列数 × 次数 × 样本量）不超过该元素个数
+CHUNK_ELEMENTS = 1 << 22
+
+# 比较 |差值| 时的相对容差，避免浮点误差把观测值本身排除在外
+_TOLERANCE = 1e-12
+
+
+def _clean(samples):
+    return [np.asarray(sample, dtype=float)[~np.isnan(np.asarray(sample, dtype=float))] for sample in samples]
+
+
+def _buckets(pre_samples, post_samples):
+    """按 (关税前样本量, 关税后样本量) 分桶，同一桶内的序列可以堆叠成矩阵一起计算"""
+    buckets = {}
+    for position, (pre, post) in enumerate(zip(pre_samples, post_samples)):
+        buckets.setdefault((len(pre), len(post)), []).append(position)
+    return buckets
+
+
+def _rng(seed, n_pre, n_post):
+    """每个桶独立的随机数流：由种子和样本量确定，同一序列无论和哪些序列一起计算，结果都相同"""
+    return np.random.default_rng(None if seed is None else [seed, n_pre, n_post])
+
+
+def _chunk_size(n_series, n):
+    """每块重抽样的次数：(序列数, 次数, 样本量) 的中间数组不超过 CHUNK_ELEMENTS 个元素"""
+    return max(1, CHUNK_ELEMENTS // max(1, n_series * n))
+
+
+def _split_masks(n_pre, n_post, n_resamples, rng, chunk):
+    """逐块生成关税前组的成员矩阵 (块内分组方式数, n)，组合数不多时枚举全部组合
+
+    返回 (生成器, 分组方式总数, 是否精确)。随机分组的各块依次从 rng 抽取，与一次抽取全部的结果相同。
+    """
+    n = n_pre + n_post
+    total = comb(n, n_pre)
+    if total <= n_resamples:
+        def exact():
+            members = combinations(range(n), n_pre)
+            while True:
+                rows = list(islice(members, chunk))
+                if not rows:
+                    return
+                masks = np.zeros((len(rows), n), dtype=bool)
+                np.put_along_axis(masks, np.array(rows, dtype=np.intp).reshape(len(rows), n_pre), True, axis=1)
+                yield masks
+        return exact(), total, True
+
+    def sampled():
+        for start in range(0, n_resamples, chunk):
+            order = rng.random((min(chunk, n_resamples - start), n)).argsort(axis=1)
+            masks = np.zeros(order.shape, dtype=bool)
+            np.put_along_axis(masks, order[:, :n_pre], True, axis=1)
+            yield masks
+    return sampled(), n_resamples, False
+
+
+def permutation_test(pre_samples, post_samples, n_resamples=DEFAULT_RESAMPLES, seed=DEFAULT_SEED):
+    """批量的两样本均值差置换检验（双侧）
+
+    pre_samples、post_samples 为等长的样本列表，每个元素是一条序列的观测值。
+    返回 (p 值数组, 是否精确检验数组)。分组方式逐块处理，内存只与块大小有关。
+    """
+    pre_samples, post_samples = _clean(pre_samples), _clean(post_samples)
+    p_values = np.full(len(pre_samples), np.nan)
+    exact = np.zeros(len(pre_samples), dtype=bool)
+
+    for (n_pre, n_post), positions in _buckets(pre_samples, post_samples).items():
+        if n_pre == 0 or n_post == 0:
+            continue
+        pooled = np.stack([np.concatenate([pre_samples[i], post_samples[i]]) for i in positions])
+        totals = pooled.sum(axis=1, keepdims=True)
+        observed = np.abs(pooled[:, n_pre:].mean(axis=1) - pooled[:, :n_pre].mean(axis=1))
+        threshold = observed[:, None] * (1 - _TOLERANCE) - _TOLERANCE
+
+        chunk = _chunk_size(len(positions), n_pre + n_post)
+        chunks, total, is_exact = _split_masks(n_pre, n_post, n_resamples, _rng(seed, n_pre, n_post), chunk)
+        extreme = np.zeros(len(positions), dtype=np.int64)
+        for masks in chunks:
+            # (序列数, n) @ (n, 块内分组方式数)：一次矩阵乘法得到块内所有分组方式下的关税前合计
+            pre_sums = pooled @ masks.T.astype(float)
+            differences = np.abs((totals - pre_sums) / n_post - pre_sums / n_pre)
+            extreme += (differences >= threshold).sum(axis=1)
+
+        if is_exact:
+            p_values[positions] = extreme / total
+        else:
+            p_values[positions] = (extreme + 1) / (total + 1)
+        exact[positions] = is_exact
+    return p_values, exact
+
+
+def _resampled_means(samples, n_resamples, rng, chunk):
+    """(序列数, 次数) 的 bootstrap 均值，所有序列共用同一组重抽样下标，逐块抽取"""
+    n = samples.shape[1]
+    means = np.empty((len(samples), n_resamples))
+    for start in range(0, n_resamples, chunk):
+        stop = min(start + chunk, n_resamples)
+        means[:, start:stop] = samples[:, rng.integers(0, n, (stop - start, n))].mean(axis=2)
+    return means
+
+
+def bootstrap_ci(pre_samples, post_samples, n_resamples=DEFAULT_RESAMPLES, confidence=0.95, seed=DEFAULT_SEED):
+    """批量的均值差（关税后 - 关税前）百分位 bootstrap 置信区间，返回 (下限数组, 上限数组)
+
+    重抽样逐块进行，内存为 序列数 × 次数 的均值加上一块的中间数组。
+    """
+    pre_samples, post_samples = _clean(pre_samples), _clean(post_samples)
+    low = np.full(len(pre_samples), np.nan)
+    high = np.full(len(pre_samples), np.nan)
+    tail = (1 - confidence) / 2 * 100
+
+    for (n_pre, n_post), positions in _buckets(pre_samples, post_samples).items():
+        if n_pre == 0 or n_post == 0:
+            continue
+        pre = np.stack([pre_samples[i] for i in positions])
+        post = np.stack([post_samples[i] for i in positions])
+        rng = _rng(seed, n_pre, n_post)
+        pre_means = _resampled_means(pre, n_resamples, rng, _chunk_size(len(positions), n_pre))
+        post_means = _resampled_means(post, n_resamples, rng, _chunk_size(len(positions), n_post))
+        low[positions], high[positions] = np.percentile(post_means - pre_means, [tail, 100 - tail], axis=1)
+    return low, high
+
+
+def resampling_table(pre_samples, post_samples, index=None, n_resamples=DEFAULT_RESAMPLES,
+                     confidence=0.95, seed=DEFAULT_SEED):
+    """置换检验 p 值和 bootstrap 置信区间汇总表，每行一条序列"""
+    p_values, exact = permutation_test(pre_samples, post_samples, n_resamples, seed)
+    low, high = bootstrap_ci(pre_samples, post_samples, n_resamples, confidence, seed)
+    return pd.DataFrame({
+        'perm_p_value': p_values,
+        'exact': exact,
+        'ci_low': low,
+        'ci_high': high,
+    }, index=index)
+
@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+# 所有分析的结果按运行追加到同一个 SQLite 数据库，可用环境变量 RESULTS_DB 修改路径
+DB_PATH = os.environ.get('RESULTS_DB', '../dataset/results.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    analysis    TEXT NOT NULL,
+    started     TEXT NOT NULL,
+    git_commit  TEXT,
+    fingerprint TEXT,
+    params      TEXT
+);
+CREATE TABLE IF NOT EXISTS impact (
+    run_id         INTEGER NOT NULL REFERENCES runs(run_id),
+    analysis       TEXT NOT NULL,
+    subject        TEXT NOT NULL,
+    flow           TEXT NOT NULL,
+    metric         TEXT NOT NULL,
+    unit           TEXT,
+    pre_mean       REAL,
+    post_mean      REAL,
+    pre_std        REAL,
+    post_std       REAL,
+    pre_total      REAL,
+    post_total     REAL,
+    change         REAL,
+    change_percent REAL,
+    test           TEXT,
+    p_value        REAL,
+    perm_p_value   REAL,
+    ci_low         REAL,
+    ci_high        REAL,
+    significant    INTEGER,
+    period_total_change  REAL,
+    period_total_ci_low  REAL,
+    period_total_ci_high REAL
+);
+CREATE TABLE IF NOT EXISTS trends (
+    run_id   INTEGER NOT NULL REFERENCES runs(run_id),
+    analysis TEXT NOT NULL,
+    subject  TEXT NOT NULL,
+    flow     TEXT NOT NULL,
+    metric   TEXT NOT NULL,
+    period   TEXT NOT NULL,
+    value    REAL
+);
+CREATE INDEX IF NOT EXISTS impact_lookup ON impact (analysis, subject, flow, metric, run_id);
+CREATE INDEX IF NOT EXISTS trends_lookup ON trends (analysis, subject, flow, metric, period, run_id);
+CREATE INDEX IF NOT EXISTS runs_analysis ON runs (analysis, started);
+"""
+
+# 统一的列：subject 为贸易伙伴或目的地（全部为 Global），flow 为 import / export（报告国视角），
+# 指标名为 price / quantity / value。ci_low、ci_high 是 change（按行均值之差）的置信区间；
+# 检验按月合计时，按月合计均值之差及其置信区间记在 period_total_* 列
+IMPACT_COLUMNS = ['analysis', 'subject', 'flow', 'metric', 'unit', 'pre_mean', 'post_mean', 'pre_std', 'post_std',
+                  'pre_total', 'post_total', 'change', 'change_percent', 'test', 'p_value', 'perm_p_value',
+                  'ci_low', 'ci_high', 'significant', 'period_total_change', 'period_total_ci_low',
+                  'period_total_ci_high']
+TREND_COLUMNS = ['analysis', 'subject', 'flow', 'metric', 'period', 'value']
+
+SIGNIFICANCE_LEVEL = 0.05
+
+
+def connect(path=DB_PATH):
+    """打开结果数据库（不存在时创建表和索引）"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # 流水线中的几个分析可能同时写入，等待锁而不是立即报错
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    # 旧版数据库缺少后来加入的列
+    existing = {row[1] for row in connection.execute('PRAGMA table_info(impact)')}
+    for column in IMPACT_COLUMNS:
+        if column not in existing:
+            connection.execute(f'ALTER TABLE impact ADD COLUMN {column} REAL')
+    return connection
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _records(rows, columns):
+    """DataFrame 或字典列表 -> 按 columns 排列的元组，缺少的列和 NaN 记为 NULL"""
+    frame = pd.DataFrame(rows).reindex(columns=columns).astype(object)
+    frame = frame.where(frame.notna(), None)
+    return [tuple(value.item() if hasattr(value, 'item') else value for value in row)
+            for row in frame.itertuples(index=False)]
+
+
+def record_run(analysis, impact, trends=None, fingerprint=None, params=None, path=DB_PATH):
+    """追加一次运行的结果，返回 run_id
+
+    impact、trends 为 DataFrame 或字典列表，列见 IMPACT_COLUMNS、TREND_COLUMNS（不含 analysis）；
+    impact 没有 significant 列时按 p_value < 0.05 判断。
+    """
+    impact = pd.DataFrame(impact).assign(analysis=analysis)
+    if 'significant' not in impact.columns:
+        p_value = pd.to_numeric(impact['p_value'], errors='coerce')
+        impact['significant'] = (p_value < SIGNIFICANCE_LEVEL).where(p_value.notna())
+    trends = pd.DataFrame([] if trends is None else trends, columns=TREND_COLUMNS[1:]).assign(analysis=analysis)
+
+    connection = connect(path)
+    try:
+        with connection:
+            run_id = connection.execute(
+                'INSERT INTO runs (analysis, started, git_commit, fingerprint, params) VALUES (?, ?, ?, ?, ?)',
+                (analysis, datetime.now().isoformat(timespec='seconds'), git_commit(), fingerprint,
+                 json.dumps(params, ensure_ascii=False, default=str) if params is not None else None)).lastrowid
+            connection.executemany(
+                f"INSERT INTO impact (run_id, {', '.join(IMPACT_COLUMNS)}) VALUES ({', '.join('?' * (len(IMPACT_COLUMNS) + 1))})",
+                [(run_id,) + row for row in _records(impact, IMPACT_COLUMNS)])
+            connection.executemany(
+                f"INSERT INTO trends (run_id, {', '.join(TREND_COLUMNS)}) VALUES ({', '.join('?' * (len(TREND_COLUMNS) + 1))})",
+                [(run_id,) + row for row in _records(trends, TREND_COLUMNS)])
+    finally:
+        connection.close()
+    return run_id
+
+
+def _read(query, params, path):
+    connection = connect(path)
+    try:
+        return pd.read_sql_query(query, connection, params=params)
+    finally:
+        connection.close()
+
+
+def _where(filters):
+    clauses, values = [], []
+    for name, value in filters.items():
+        if value is not None:
+            clauses.append(f'{name} = ?')
+            values.append(value)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), values
+
+
+def runs(analysis=None, path=DB_PATH):
+    """全部运行记录，按时间排列"""
+    where, values = _where({'analysis': analysis})
+    return _read(f'SELECT * FROM runs{where} ORDER BY run_id', values, path)
+
+
+def impact_history(analysis=None, subject=None, metric=None, flow=None, path=DB_PATH):
+    """关税影响结果的历史，每次运行一行（附运行时间和代码版本）"""
+    where, values = _where({'i.analysis': analysis, 'subject': subject, 'flow': flow, 'metric': metric})
+    query = f"""
+        SELECT r.started, r.git_commit, i.*
+        FROM impact i JOIN runs r USING (run_id){where}
+        ORDER BY i.analysis, subject, flow, metric, r.run_id
+    """
+    return _read(query, values, path)
+
+
+def trend_history(analysis=None, subject=None, metric=None, flow=None, run_id=None, path=DB_PATH):
+    """月度趋势；run_id 为空时取每个分析最近一次运行的结果"""
+    filters = {'analysis': analysis, 'subject': subject, 'flow': flow, 'metric': metric, 'run_id': run_id}
+    where, values = _where(filters)
+    if run_id is None:
+        where += (' AND ' if where else ' WHERE ') + 'run_id IN (SELECT MAX(run_id) FROM trends GROUP BY analysis)'
+    return _read(f'SELECT * FROM trends{where} ORDER BY analysis, subject, flow, metric, period', values, path)
+
+
+def compare_runs(old_run, new_run, columns=('change_percent', 'p_value'), path=DB_PATH):
+    """两次运行的关税影响结果对比：每个 (analysis, subject, flow, metric) 一行，列为 <列>_old、<列>_new、<列>_diff"""
+    keys = ['analysis', 'subject', 'flow', 'metric']
+    table = _read('SELECT * FROM impact WHERE run_id IN (?, ?)', (old_run, new_run), path)
+    old = table[table['run_id'] == old_run].set_index(keys)[list(columns)]
+    new = table[table['run_id'] == new_run].set_index(keys)[list(columns)]
+    compared = old.join(new, how='outer', lsuffix='_old', rsuffix='_new')
+    for column in columns:
+        compared[f'{column}_diff'] = compared[f'{column}_new'] - compared[f'{column}_old']
+    return compared
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='查询结果数据库中的历史运行')
+    parser.add_argument('--db', default=DB_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('runs').add_argument('--analysis')
+    history = commands.add_parser('history')
+    history.add_argument('--analysis')
+    history.add_argument('--subject')
+    history.add_argument('--metric')
+    history.add_argument('--flow', choices=['import', 'export'])
+    compare = commands.add_parser('compare')
+    compare.add_argument('old_run', type=int)
+    compare.add_argument('new_run', type=int)
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 200)
+    if args.command == 'runs':
+        print(runs(args.analysis, args.db).to_string(index=False))
+    elif args.command == 'history':
+        history = impact_history(args.analysis, args.subject, args.metric, args.flow, args.db)
+        print(history[['run_id', 'started', 'analysis', 'subject', 'flow', 'metric', 'pre_mean', 'post_mean',
+                       'change_percent', 'p_value', 'significant']].to_string(index=False))
+    else:
+        print(compare_runs(args.old_run, args.new_run, path=args.db).to_string())
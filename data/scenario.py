@@ -0,0 +1,234 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from did import batched_ols
+from instrument import phase, write_report
+from loaders import load_merge
+from tariff_model import IMPORT_PRODUCT, MERGE_PATH
+
+# 中国进口 GM 黄大豆的来源
+PARTNERS = ['USA', 'Brazil', 'Argentina']
+
+# 默认抽样次数和模拟的月数
+DRAWS = 200_000
+HORIZON = 12
+DEFAULT_SEED = 0
+
+QUANTILES = (0.05, 0.5, 0.95)
+
+# 汇总中的合计行
+TOTAL = 'Total'
+
+
+def import_panel(merge, product=IMPORT_PRODUCT, partners=PARTNERS):
+    """月份 × 伙伴 的进口数量、金额和单价，没有进口的月份为 NaN"""
+    rows = merge[(merge['product'] == product) & merge['trade_partner'].isin(partners)]
+    panel = rows.pivot_table(index='date', columns='trade_partner', values=['amount', 'CNY'], aggfunc='sum',
+                             observed=True)
+    months = pd.date_range(panel.index.min(), panel.index.max(), freq='MS', name='date')
+    panel = panel.reindex(months).reindex(columns=partners, level=1)
+    return {'amount': panel['amount'][partners], 'CNY': panel['CNY'][partners],
+            'price': panel['CNY'][partners] / panel['amount'][partners]}
+
+
+def estimate_elasticities(panel):
+    """由月度数据估计 CES（Armington）进口需求的两个弹性，返回 estimate、se、n_obs
+
+    sigma：伙伴之间的替代弹性，log 数量 = 伙伴固定效应 + 月份固定效应 − sigma·log 单价（按月份聚类）；
+    eta：进口总量对平均单价的弹性，log 总量 = 日历月份固定效应 + eta·log 平均单价（HC1）。
+    """
+    amount = panel['amount'].to_numpy(dtype=float)
+    n_months, n_partners = amount.shape
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_amount = np.log(amount).ravel()
+        log_price = np.log(panel['price'].to_numpy(dtype=float)).ravel()
+    mask = ~np.isnan(log_amount) & ~np.isnan(log_price)
+    X = np.column_stack([np.tile(np.eye(n_partners), (n_months, 1)),
+                         np.repeat(np.eye(n_months)[:, 1:], n_partners, axis=0),
+                         np.where(mask, log_price, 0)])
+    beta, cov, _, n_obs, _, _ = batched_ols(X, log_amount[None], mask[None], np.repeat(np.arange(n_months),
+                                                                                        n_partners))
+    sigma = (-beta[0, -1], np.sqrt(cov[0, -1, -1]), n_obs[0])
+
+    total = panel['amount'].sum(axis=1)
+    unit_value = panel['CNY'].sum(axis=1) / total
+    calendar = (total.index.month.to_numpy()[:, None] == np.arange(1, 13)).astype(float)
+    X = np.column_stack([calendar, np.log(unit_value.to_numpy())])
+    beta, cov, _, n_obs, _, _ = batched_ols(X, np.log(total.to_numpy())[None], np.ones((1, len(total)), dtype=bool))
+    eta = (beta[0, -1], np.sqrt(cov[0, -1, -1]), n_obs[0])
+
+    return pd.DataFrame([sigma, eta], index=pd.Index(['sigma', 'eta'], name='parameter'),
+                        columns=['estimate', 'se', 'n_obs'])
+
+
+def seasonal_baseline(panel):
+    """每个伙伴每个日历月份的平均进口数量和金额（没有进口的月份记为 0），行为 1-12 月"""
+    calendar = panel['amount'].index.month
+    return {name: panel[name].fillna(0).groupby(calendar).mean().rename_axis('month') for name in ('amount', 'CNY')}
+
+
+def draw_parameters(elasticities, n=DRAWS, pass_through=(1.0, 1.0), seed=DEFAULT_SEED):
+    """按估计值和标准误抽取弹性（正态分布，sigma 截断在 0 以上、eta 截断在 0 以下），
+    关税转嫁比例在 pass_through 区间内均匀抽取"""
+    rng = np.random.default_rng(seed)
+    sigma, eta = (elasticities.loc[name, 'estimate'] + elasticities.loc[name, 'se'] * rng.standard_normal(n)
+                  for name in ('sigma', 'eta'))
+    return {'sigma': np.maximum(sigma, 0), 'eta': np.minimum(eta, 0),
+            'pass_through': rng.uniform(pass_through[0], pass_through[1], n)}
+
+
+def tariff_schedule(tariffs, months, start=None):
+    """月份 × 伙伴 的关税提高幅度（百分点），start（默认第一个月）起对 tariffs 中的伙伴生效"""
+    schedule = pd.DataFrame(0.0, index=months, columns=PARTNERS)
+    start = months[0] if start is None else pd.Timestamp(start)
+    for partner, points in tariffs.items():
+        schedule.loc[schedule.index >= start, partner] = points
+    return schedule
+
+
+def _respond(draws, shares, points):
+    """一个月内全部抽样的响应，返回 (数量比, 海关单价比, 到岸价比)，形状 (伙伴数, 抽样数)
+
+    到岸价比 r = 1 + 转嫁比例 × 关税提高幅度；CES 价格指数 P = (Σ s·r^(1−sigma))^(1/(1−sigma))，
+    数量比 = r^(−sigma) · P^(sigma + eta)。没转嫁的部分由出口方承担，海关单价比为 r / (1 + 关税提高幅度)。
+    关税不变的伙伴 r = 1，只需计算一次 P^(sigma + eta)。
+    """
+    n = len(draws['sigma'])
+    taxed = points != 0
+    tariff = points[taxed, None] / 100
+    landed = np.ones((len(points), n))
+    landed[taxed] = 1 + tariff * draws['pass_through']
+    log_landed = np.log(landed[taxed])
+    sigma = draws['sigma']
+    exponent = 1 - sigma
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ces = np.log(shares[~taxed].sum() + shares[taxed] @ np.exp(exponent * log_landed)) / exponent
+    # sigma = 1 时价格指数为几何平均
+    log_index = np.where(np.abs(exponent) < 1e-9, shares[taxed] @ log_landed, ces)
+    quantity = np.tile(np.exp((sigma + draws['eta']) * log_index), (len(points), 1))
+    quantity[taxed] *= np.exp(-sigma * log_landed)
+    customs = landed.copy()
+    customs[taxed] /= 1 + tariff
+    return quantity, customs, landed
+
+
+def _summarize(values, baseline, quantiles):
+    """(伙伴数, 抽样数) -> 每个伙伴的 baseline、mean、各分位数"""
+    table = pd.DataFrame({'baseline': baseline, 'mean': values.mean(axis=1)})
+    for q, column in zip(quantiles, np.quantile(values, quantiles, axis=1)):
+        table[f'q{round(q * 100):02d}'] = column
+    return table
+
+
+def _metrics(amount, value, landed_value, base_amount, base_value, partners, quantiles):
+    """数量、金额的合计 -> 四个指标的汇总；基线的到岸价等于海关单价（关税按提高的部分计算）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base_price = base_value / base_amount
+        tables = {
+            'amount': _summarize(amount, base_amount, quantiles),
+            'CNY': _summarize(value, base_value, quantiles),
+            'price': _summarize(value / amount, base_price, quantiles),
+            'landed_price': _summarize(landed_value / amount, base_price, quantiles),
+        }
+    table = pd.concat(tables, names=['metric', 'partner']).reset_index()
+    table['partner'] = np.tile(partners, len(tables))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['change_percent'] = (table['mean'] / table['baseline'] - 1) * 100
+    return table[['partner', 'metric'] + list(table.columns[2:])]
+
+
+def simulate(baseline, draws, schedule, quantiles=QUANTILES, monthly=True):
+    """对一个关税方案模拟全部抽样，返回 (每月汇总, 整个期间汇总)
+
+    汇总为长表：month（整个期间汇总没有）、partner（含合计 Total）、metric（amount、CNY、price、landed_price）、
+    baseline、mean、各分位数、change_percent（均值相对基线）。分位数要对每个月的全部抽样排序，
+    monthly 为 False 时只给出整个期间的汇总（每月汇总为 None），抽样很多时快得多。
+    """
+    partners = list(schedule.columns) + [TOTAL]
+    # 每月和整个期间的 数量、海关金额、到岸金额，最后一行为合计
+    flows = np.empty((3, len(partners), len(draws['sigma'])))
+    totals = np.zeros_like(flows)
+    base_totals = np.zeros((2, len(partners)))
+    tables = []
+    for month, points in schedule.iterrows():
+        base_amount = baseline['amount'].loc[month.month, schedule.columns].to_numpy(dtype=float)
+        base_value = baseline['CNY'].loc[month.month, schedule.columns].to_numpy(dtype=float)
+        base_price = np.divide(base_value, base_amount, out=np.zeros_like(base_value), where=base_amount > 0)
+        quantity, customs, landed = _respond(draws, base_value / base_value.sum(), points.to_numpy(dtype=float))
+
+        np.multiply(quantity, base_amount[:, None], out=flows[0, :-1])
+        np.multiply(flows[0, :-1], customs * base_price[:, None], out=flows[1, :-1])
+        np.multiply(flows[0, :-1], landed * base_price[:, None], out=flows[2, :-1])
+        flows[:, -1] = flows[:, :-1].sum(axis=1)
+        totals += flows
+        base = np.stack([np.append(base_amount, base_amount.sum()), np.append(base_value, base_value.sum())])
+        base_totals += base
+        if monthly:
+            tables.append(_metrics(*flows, *base, partners, quantiles).assign(month=month))
+
+    horizon = _metrics(*totals, *base_totals, partners, quantiles)
+    if not monthly:
+        return None, horizon
+    tables = pd.concat(tables, ignore_index=True)
+    return tables[['month'] + list(tables.columns[:-1])], horizon
+
+
+def _tariffs(text):
+    """USA=25,Brazil=5 -> {'USA': 25.0, 'Brazil': 5.0}"""
+    tariffs = {}
+    for item in text.split(','):
+        partner, _, points = item.partition('=')
+        if partner.strip() not in PARTNERS:
+            raise argparse.ArgumentTypeError(f"贸易伙伴应为 {', '.join(PARTNERS)}：{partner}")
+        tariffs[partner.strip()] = float(points)
+    return tariffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关税情景的蒙特卡洛模拟：中国自各伙伴进口 GM 黄大豆的数量、单价和金额')
+    parser.add_argument('--tariff', type=_tariffs, action='append',
+                        help='关税提高的百分点，如 USA=25 或 USA=25,Brazil=5；可重复，每个为一个情景（默认 USA 10/25/50）')
+    parser.add_argument('--draws', type=int, default=DRAWS)
+    parser.add_argument('--horizon', type=int, default=HORIZON, help='模拟的月数，自数据最后一个月的下一个月起')
+    parser.add_argument('--start', help='关税生效的月份（默认第一个模拟月份）')
+    parser.add_argument('--pass-through', type=float, nargs=2, default=(1.0, 1.0), metavar=('LOW', 'HIGH'),
+                        help='关税转嫁给进口方的比例区间，均匀抽取')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--output', help='另存每月汇总的 CSV 路径')
+    args = parser.parse_args()
+    scenarios = args.tariff or [{'USA': points} for points in (10, 25, 50)]
+
+    with phase('load') as p:
+        panel = import_panel(p.count(load_merge(MERGE_PATH)))
+    with phase('estimate'):
+        elasticities = estimate_elasticities(panel)
+        baseline = seasonal_baseline(panel)
+    draws = draw_parameters(elasticities, args.draws, args.pass_through, args.seed)
+    months = pd.date_range(panel['amount'].index.max() + pd.offsets.MonthBegin(), periods=args.horizon, freq='MS')
+
+    pd.set_option('display.width', 200)
+    print("弹性估计（merge.csv）：")
+    print(elasticities.to_string(float_format=lambda value: f"{value:.4f}"))
+    results = []
+    for tariffs in scenarios:
+        name = ','.join(f"{partner}+{points:g}" for partner, points in tariffs.items())
+        start = time.perf_counter()
+        with phase('simulate', rows=args.draws):
+            monthly, horizon = simulate(baseline, draws, tariff_schedule(tariffs, months, args.start),
+                                        monthly=bool(args.output))
+        print(f"\n==================== 情景 {name}（{months[0]:%Y-%m} 至 {months[-1]:%Y-%m}，"
+              f"{args.draws} 次抽样，{time.perf_counter() - start:.2f}s） ====================")
+        print(horizon.to_string(index=False, float_format=lambda value: f"{value:,.4g}"))
+        if monthly is not None:
+            results.append(monthly.assign(scenario=name))
+    if args.output:
+        pd.concat(results, ignore_index=True).to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"\n每月汇总已保存至 {args.output}")
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+# 贸易伙伴编码 -> 名称
+PARTNERS = {
+    402: 'Argentina',
+    410: 'Brazil',
+    502: 'USA',
+}
+
+# 商品编码（HS-8）-> 名称
+PRODUCTS = {
+    12011000: 'Seed Soybean',
+    12019011: 'Non-GM Yellow Soybean',
+    12019019: 'GM Yellow Soybean',
+    12019020: 'Black Soybean',
+}
+
+# 旧版 merge.csv 的 0/1 编码列由 get_dummies(drop_first=True) 生成，全为 0 的行
+# 对应被去掉的编码
+PARTNER_BASELINE = 402
+PRODUCT_BASELINE = 12019011
+
+UNKNOWN = 'Unknown'
+
+# 事实表中的维度编码列
+PARTNER_COLUMN = 'partner'
+PRODUCT_COLUMN = 'product'
+
+# 编码长度：贸易伙伴 3 位，商品 8 位
+PARTNER_CODE_LENGTH = 3
+PRODUCT_CODE_LENGTH = 8
+
+
+def _dummy_codes(columns, length):
+    """找出由 get_dummies 生成的编码列（列名为指定位数的数字）"""
+    return [col for col in columns if str(col).isdigit() and len(str(col)) == length]
+
+
+def _labels(lookup, codes):
+    """编码 -> 名称，未登记的编码以编码本身作为名称"""
+    return [lookup.get(code, str(code)) for code in codes]
+
+
+def _decode_dummies(df, lookup, length, baseline):
+    """把一组 0/1 编码列还原为分类变量，全为 0 的行记为 baseline"""
+    columns = _dummy_codes(df.columns, length)
+    codes = np.array([int(col) for col in columns], dtype=np.int64)
+
+    all_codes = sorted(set(lookup) | set(codes.tolist()) | ({baseline} - {None}))
+    categories = _labels(lookup, all_codes) + [UNKNOWN]
+    unknown = len(categories) - 1
+    baseline_position = all_codes.index(baseline) if baseline is not None else unknown
+
+    matrix = df[columns].to_numpy(dtype=bool).reshape(len(df), len(columns))
+    hits = matrix.sum(axis=1)
+    if columns:
+        result = np.searchsorted(all_codes, codes)[matrix.argmax(axis=1)]
+    else:
+        result = np.full(len(df), unknown)
+
+    # 全 0 行为基准编码，多于一个 1 的行无法判定
+    result = np.where(hits == 0, baseline_position, result)
+    result = np.where(hits > 1, unknown, result)
+    return pd.Categorical.from_codes(result, categories=categories)
+
+
+def _decode_codes(codes, lookup):
+    """把整数编码列转换为分类变量"""
+    categorical = pd.Categorical(codes, categories=sorted(set(lookup) | set(pd.unique(codes))))
+    return categorical.rename_categories(_labels(lookup, categorical.categories))
+
+
+def decode_trade_partner(df, baseline=PARTNER_BASELINE):
+    """根据贸易伙伴编码（partner 列，或旧版 410、502 ... 列）确定贸易伙伴"""
+    if PARTNER_COLUMN in df.columns:
+        return _decode_codes(df[PARTNER_COLUMN], PARTNERS)
+    return _decode_dummies(df, PARTNERS, PARTNER_CODE_LENGTH, baseline)
+
+
+def decode_product_type(df, baseline=PRODUCT_BASELINE):
+    """根据商品编码（product 列，或旧版 12019019、12019020 ... 列）确定商品类型"""
+    if PRODUCT_COLUMN in df.columns:
+        return _decode_codes(df[PRODUCT_COLUMN], PRODUCTS)
+    return _decode_dummies(df, PRODUCTS, PRODUCT_CODE_LENGTH, baseline)
+
+
+def decode(df):
+    """添加 trade_partner 和 product_type 两个分类列"""
+    df['trade_partner'] = decode_trade_partner(df)
+    df['product_type'] = decode_product_type(df)
+    return df
+
+
+def lookup_table(codes, names, lookup):
+    """生成维度表：code, name, name_cn"""
+    table = pd.DataFrame({'code': codes, 'name_cn': names}).drop_duplicates('code')
+    table = table.sort_values('code', ignore_index=True)
+    table.insert(1, 'name', _labels(lookup, table['code']))
+    return table
+
+
+def one_hot(df, columns=(PARTNER_COLUMN, PRODUCT_COLUMN), drop_first=False, sparse=True):
+    """由事实表生成 0/1 编码视图，默认使用稀疏列，列名为编码本身"""
+    frames = []
+    for column in columns:
+        dummies = pd.get_dummies(df[column], prefix='', prefix_sep='', drop_first=drop_first,
+                                 sparse=sparse, dtype='int8')
+        dummies.columns = dummies.columns.astype(str)
+        frames.append(dummies)
+    return pd.concat(frames, axis=1)
@@ -0,0 +1,267 @@
+import argparse
+import functools
+import json
+import math
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import argentina_export_analysis as argentina
+import brazil_export_analysis as brazil
+import tariff_model
+from cube import build_cube
+from impact import grouped_impact
+from instrument import phase
+from loaders import load_comex, load_indec, load_merge
+from market_share import monthly_pivot, period_share
+from schema import PARTNERS
+
+# 只监听本机
+HOST = '127.0.0.1'
+PORT = 8765
+
+# 缓存的查询结果个数
+CACHE_SIZE = 256
+
+# 中国视角的进出口方向对应的商品编码
+DIRECTIONS = {'import': tariff_model.IMPORT_PRODUCT, 'export': tariff_model.EXPORT_PRODUCT}
+
+# 中国海关数据中的贸易伙伴（schema 还原后的名称）
+CHINA_PARTNERS = list(PARTNERS.values())
+
+# 阿根廷的指标名与 INDEC 列名
+ARGENTINA_METRICS = {'volume': 'PESO_NETO_KILOS', 'value': 'MONTO_FOB_DOLAR', 'price': 'PRECIO_PROMEDIO'}
+
+
+def load_datasets():
+    """读取三个数据集（只在启动时读取一次），并预先生成数据立方体和不随参数变化的月度汇总"""
+    data = {}
+    with phase('load_merge') as p:
+        data['merge'] = p.count(load_merge(tariff_model.MERGE_PATH))
+    with phase('load_braz') as p:
+        braz = p.count(load_comex(brazil.BRAZ_PATH))
+        braz['date'] = pd.to_datetime(braz[['Year', 'Month']].assign(day=1))
+        data['braz'] = braz
+    with phase('load_agen') as p:
+        data['agen'] = p.count(load_indec(argentina.AGEN_PATH))
+    with phase('aggregate'):
+        data['cube'] = build_cube(data['merge'], braz, data['agen'])
+        data['braz_pivot'] = monthly_pivot(braz)
+        data['agen_trends'] = argentina.trend_tables(data['cube'])[0]
+    return data
+
+
+# 参数解析：非法取值抛出 ValueError，返回 400
+def months(text):
+    values = tuple(sorted({int(month) for month in text.split(',') if month.strip()}))
+    if not values or not all(1 <= month <= 12 for month in values):
+        raise ValueError(f"月份应为 1-12，逗号分隔：{text}")
+    return values
+
+
+def date(text):
+    return pd.Timestamp(text)
+
+
+def choice(options):
+    def parse(text):
+        if text not in options:
+            raise ValueError(f"可选值为 {', '.join(options)}：{text}")
+        return text
+    return parse
+
+
+def _partner_rows(data, partner, direction):
+    """中国与某一贸易伙伴某一方向的月度数据，按日期排序"""
+    df = data['merge']
+    rows = df[(df['trade_partner'] == partner) & (df['product'] == DIRECTIONS[direction])].sort_values('date')
+    if rows.empty:
+        raise LookupError(f"没有中国与 {partner} 的{'进口' if direction == 'import' else '出口'}数据")
+    return rows
+
+
+def china_us_impact(data, partner='USA', direction='import', metric=None, tariff_date=tariff_model.TARIFF_DATE):
+    """中国与某一贸易伙伴之间的关税影响（tariff_model.tariff_impact_analysis），metric 为空时返回全部指标"""
+    rows = _partner_rows(data, partner, direction)
+    metrics = [m for m in tariff_model.SALES_METRICS if metric in (None, m['name'])]
+    pre, post = tariff_model.split_tariff_period(rows, tariff_date)
+    return {'partner': partner, 'direction': direction, 'tariff_date': tariff_date,
+            'pre_months': len(pre), 'post_months': len(post),
+            'results': tariff_model.impact_results(pre, post, metrics)}
+
+
+def china_us_trends(data, partner='USA', direction='import'):
+    """中国与某一贸易伙伴每月的单价、数量和金额"""
+    rows = _partner_rows(data, partner, direction)
+    return rows[['date', 'price', 'amount', 'CNY']]
+
+
+def brazil_impact(data, country=None, year=2025, pre=tuple(brazil.PRE_TARIFF_MONTHS),
+                  post=tuple(brazil.POST_TARIFF_MONTHS)):
+    """巴西对某一目的地（为空时为全球）的出口关税影响，口径与 brazil_export_analysis 相同"""
+    df = data['braz']
+    df = df[df['Year'] == year]
+    if country is not None:
+        df = df[df['Country'] == country]
+    result = grouped_impact(df[df['Month'].isin(pre)], df[df['Month'].isin(post)], 'US$ FOB', 'Month',
+                            'Country' if country is not None else None, resample=True)
+    if result.empty:
+        raise LookupError(f"{year} 年没有 {country or '全球'} 关税前后的出口数据")
+    result['significant'] = result['p_value'] < 0.05
+    return dict(result.iloc[0], country=country or 'Global', year=year, pre=pre, post=post)
+
+
+def brazil_share(data, country='China', year=2025, pre=tuple(brazil.PRE_TARIFF_MONTHS),
+                 post=tuple(brazil.POST_TARIFF_MONTHS)):
+    """某一目的地在巴西出口总额中的份额（%），关税前后各月合计"""
+    pivot = data['braz_pivot']
+    if country not in pivot.columns:
+        raise LookupError(f"没有对 {country} 的出口数据")
+    in_year = pivot.index[pivot.index.year == year]
+    periods = {name: in_year[in_year.month.isin(window)] for name, window in (('pre', pre), ('post', post))}
+    if any(period.empty for period in periods.values()):
+        raise LookupError(f"{year} 年关税前或关税后没有数据")
+    shares = {name: period_share(pivot, period, [country])[country] for name, period in periods.items()}
+    return dict(shares, change=shares['post'] - shares['pre'], country=country, year=year)
+
+
+def brazil_trends(data, country=None, start=None, end=None):
+    """巴西每月出口总额，country 不为空时另给出该目的地的金额和份额"""
+    pivot = data['braz_pivot'].loc[start:end]
+    trends = pd.DataFrame({'total': pivot.sum(axis=1)})
+    if country is not None:
+        if country not in pivot.columns:
+            raise LookupError(f"没有对 {country} 的出口数据")
+        trends[country] = pivot[country]
+        trends['share'] = (trends[country] / trends['total'].where(trends['total'] > 0) * 100).fillna(0)
+    return trends.reset_index()
+
+
+def argentina_impact(data, metric=None, year=2025, pre=tuple(argentina.PRE_TARIFF_MONTHS),
+                     post=tuple(argentina.POST_TARIFF_MONTHS)):
+    """阿根廷出口的关税影响（argentina_export_analysis.export_impact_analysis），metric 为空时返回全部指标"""
+    df = data['agen']
+    df = df[df['FECHA_'].dt.year == year]
+    result = argentina.export_impact_analysis(df[df['FECHA_'].dt.month.isin(pre)], df[df['FECHA_'].dt.month.isin(post)])
+    if result is None:
+        raise LookupError(f"{year} 年关税前或关税后没有数据")
+    return result if metric is None else {metric: result[metric]}
+
+
+def argentina_trends(data, year=None):
+    """阿根廷每月的出口量、出口额和平均价格"""
+    trends = data['agen_trends']
+    if year is not None:
+        trends = trends[trends.index.str.startswith(f"{year}-")]
+    trends = trends.rename(columns={column: name for name, column in ARGENTINA_METRICS.items()})
+    return trends.rename_axis('month')
+
+
+# 路径 -> (处理函数, {参数名: 解析函数})
+ROUTES = {
+    '/china-us/impact': (china_us_impact, {'partner': choice(CHINA_PARTNERS), 'direction': choice(DIRECTIONS),
+                                           'metric': choice([m['name'] for m in tariff_model.SALES_METRICS]),
+                                           'tariff_date': date}),
+    '/china-us/trends': (china_us_trends, {'partner': choice(CHINA_PARTNERS), 'direction': choice(DIRECTIONS)}),
+    '/brazil/impact': (brazil_impact, {'country': str, 'year': int, 'pre': months, 'post': months}),
+    '/brazil/share': (brazil_share, {'country': str, 'year': int, 'pre': months, 'post': months}),
+    '/brazil/trends': (brazil_trends, {'country': str, 'start': date, 'end': date}),
+    '/argentina/impact': (argentina_impact, {'metric': choice(ARGENTINA_METRICS), 'year': int,
+                                             'pre': months, 'post': months}),
+    '/argentina/trends': (argentina_trends, {'year': int}),
+}
+
+
+def parse_params(route, query):
+    """把查询字符串解析为处理函数的关键字参数，返回排好序的 (名字, 值) 元组，可作为缓存键"""
+    _, spec = ROUTES[route]
+    params = {}
+    for name, text in parse_qsl(query):
+        if name not in spec:
+            raise ValueError(f"未知参数 {name}，可用参数：{', '.join(spec)}")
+        params[name] = spec[name](text)
+    return tuple(sorted(params.items()))
+
+
+def to_json(value):
+    """分析结果转换为可序列化为 JSON 的对象，NaN 记为 null"""
+    if isinstance(value, pd.DataFrame):
+        return [to_json(row) for row in value.reset_index(drop=value.index.name is None).to_dict('records')]
+    if isinstance(value, pd.Series):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json(item) for item in value]
+    if isinstance(value, pd.Timestamp):
+        return value.date().isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def make_server(data, port=PORT, cache_size=CACHE_SIZE):
+    """绑定本机端口的多线程 HTTP 服务，同一查询的结果保存在 LRU 缓存中"""
+
+    @functools.lru_cache(maxsize=cache_size)
+    def answer(route, params):
+        handler, _ = ROUTES[route]
+        return json.dumps(to_json(handler(data, **dict(params))), ensure_ascii=False).encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == '/':
+                info = answer.cache_info()
+                self.reply(200, json.dumps({'routes': {route: list(spec) for route, (_, spec) in ROUTES.items()},
+                                            'cache': {'hits': info.hits, 'misses': info.misses,
+                                                      'size': info.currsize, 'maxsize': info.maxsize}}).encode())
+                return
+            if url.path not in ROUTES:
+                self.reply(404, json.dumps({'error': f"未知路径 {url.path}"}, ensure_ascii=False).encode('utf-8'))
+                return
+            try:
+                body = answer(url.path, parse_params(url.path, url.query))
+            except (ValueError, LookupError) as error:
+                self.reply(400, json.dumps({'error': str(error)}, ensure_ascii=False).encode('utf-8'))
+                return
+            self.reply(200, body)
+
+        def reply(self, status, body):
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((HOST, port), Handler)
+    server.answer = answer
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='本机分析服务：数据集只读取一次，各分析以 JSON 接口提供')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE, help='缓存的查询结果个数')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    datasets = load_datasets()
+    # 检验用到的 scipy.stats 也在启动时加载，第一次查询不用等待导入
+    import scipy.stats
+    server = make_server(datasets, args.port, args.cache_size)
+    print(f"数据已加载（{time.perf_counter() - start:.2f}s），监听 http://{HOST}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,164 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from customs import ENCODING, read_customs
+
+# 模板数据：合成数据从这些文件中按行重抽样，数值乘以随机扰动
+DATASET_DIR = '../dataset/'
+CUSTOMS_FILES = ('2023.csv', '2024in.csv', '2024out.csv', '2025in.csv', '2025out.csv')
+BRAZIL_FILE = 'braz.csv'
+ARGENTINA_FILE = 'agen.csv'
+
+# 每次写入的行数，生成 10^8 行时内存占用也只与该值有关
+CHUNK_ROWS = 1_000_000
+
+# 数值扰动：对数正态分布的标准差
+NOISE_SIGMA = 0.3
+
+
+def _chunks(rows, chunk_rows):
+    for start in range(0, rows, chunk_rows):
+        yield start, min(start + chunk_rows, rows)
+
+
+def _month_positions(start, stop, rows, n_months):
+    """按行号把行均匀分配到各月份，输出文件按月份有序"""
+    return np.arange(start, stop, dtype=np.int64) * n_months // rows
+
+
+def _noise(rng, size):
+    return rng.lognormal(0.0, NOISE_SIGMA, size)
+
+
+def _months(first, last):
+    return pd.date_range(first, last, freq='MS')
+
+
+def split_rows(rows, weights):
+    """按权重把总行数分给各文件，每个文件至少 1 行"""
+    weights = np.asarray(weights, dtype=float)
+    counts = np.maximum(np.floor(rows * weights / weights.sum()).astype(np.int64), 1)
+    counts[np.argmax(weights)] += rows - counts.sum()
+    return counts
+
+
+def write_customs(path, template, rows, rng, chunk_rows=CHUNK_ROWS):
+    """GBK 编码的海关导出文件：全部字段加引号，行尾带一个空列，人民币带千分位逗号"""
+    months = _months(*pd.to_datetime(template['数据年月'].astype(str), format='%Y%m').agg(['min', 'max']))
+    months = months.year * 100 + months.month
+    unit_price = template['人民币'].to_numpy() / np.maximum(template['第一数量'].to_numpy(), 1)
+    columns = [name for name in template.columns if name != 'date']
+
+    with open(path, 'w', encoding=ENCODING, newline='') as f:
+        f.write(','.join(f'"{name}"' for name in columns) + ',\n')
+        for start, stop in _chunks(rows, chunk_rows):
+            picks = rng.integers(0, len(template), stop - start)
+            chunk = template.iloc[picks][columns].reset_index(drop=True)
+            chunk['数据年月'] = months[_month_positions(start, stop, rows, len(months))]
+            amount = np.maximum(np.rint(chunk['第一数量'].to_numpy() * _noise(rng, len(chunk))), 1).astype(np.int64)
+            chunk['第一数量'] = amount
+            chunk['人民币'] = pd.Series(np.rint(amount * unit_price[picks] * _noise(rng, len(chunk))).astype(np.int64)
+                                     ).map('{:,}'.format)
+            chunk.to_csv(f, header=False, index=False, quoting=csv.QUOTE_ALL, lineterminator=',\n')
+
+
+def write_comex(path, template, rows, rng, chunk_rows=CHUNK_ROWS):
+    """Comex Stat 格式：Year,Month,Country,US$ FOB"""
+    months = _months(*month_range(template))
+    values = template['US$ FOB'].to_numpy(dtype=float)
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for start, stop in _chunks(rows, chunk_rows):
+            picks = rng.integers(0, len(template), stop - start)
+            dates = months[_month_positions(start, stop, rows, len(months))]
+            pd.DataFrame({
+                'Year': dates.year,
+                'Month': dates.month,
+                'Country': template['Country'].to_numpy()[picks],
+                'US$ FOB': np.rint(values[picks] * _noise(rng, len(picks))).astype(np.int64),
+            }).to_csv(f, header=start == 0, index=False, lineterminator='\n')
+
+
+def month_range(comex):
+    dates = pd.to_datetime(pd.DataFrame({'year': comex['Year'], 'month': comex['Month'], 'day': 1}))
+    return dates.min(), dates.max()
+
+
+def write_indec(path, template, rows, rng, chunk_rows=CHUNK_ROWS, header_width=None):
+    """INDEC 格式（agen.csv）：表头用空格补齐到固定宽度，价格列由数量和金额推出"""
+    template = template.rename(columns=str.strip)
+    dates = pd.to_datetime(template['FECHA_'])
+    months = _months(dates.min(), dates.max())
+    kilos = template['PESO_NETO_KILOS'].to_numpy(dtype=float)
+    price = template['MONTO_FOB_DOLAR'].to_numpy(dtype=float) / np.maximum(kilos, 1)
+    average = template['PRECIO_PROMEDIO'].to_numpy(dtype=float)
+    high = template['PRECIO_MAX'].to_numpy(dtype=float) / np.where(average > 0, average, 1)
+    low = template['PRECIO_MIN'].to_numpy(dtype=float) / np.where(average > 0, average, 1)
+
+    header = ','.join(template.columns)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(header.ljust(header_width or len(header)) + '\n')
+        for start, stop in _chunks(rows, chunk_rows):
+            picks = rng.integers(0, len(template), stop - start)
+            chunk_kilos = np.rint(kilos[picks] * _noise(rng, len(picks)))
+            value = np.round(chunk_kilos * price[picks] * _noise(rng, len(picks)), 2)
+            chunk_average = np.round(value / np.maximum(chunk_kilos, 1), 2)
+            pd.DataFrame({
+                'FECHA_': months[_month_positions(start, stop, rows, len(months))].strftime('%Y-%m-%d'),
+                'POS_NCM': template['POS_NCM'].to_numpy()[picks],
+                'UN': template['UN'].to_numpy()[picks],
+                'PESO_NETO_KILOS': chunk_kilos,
+                'MONTO_FOB_DOLAR': value,
+                'CANT_DECLARACIONES': template['CANT_DECLARACIONES'].to_numpy()[picks],
+                'CANT_UNIDAD_ESTADISTICA': chunk_kilos,
+                'PRECIO_MAX': np.round(chunk_average * high[picks], 2),
+                'PRECIO_MIN': np.round(chunk_average * low[picks], 2),
+                'PRECIO_PROMEDIO': chunk_average,
+            }).to_csv(f, header=False, index=False, lineterminator='\n')
+
+
+def generate(output_dir, rows, seed=0, template_dir=DATASET_DIR, chunk_rows=CHUNK_ROWS):
+    """在 output_dir 下生成与 dataset/ 同名、同格式的合成数据
+
+    每个数据源（海关、巴西、阿根廷）各 rows 行，海关行数按模板文件大小分给各年度文件。
+    返回 {文件名: 行数}。
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    written = {}
+
+    templates = [read_customs(os.path.join(template_dir, name), exclude=()) for name in CUSTOMS_FILES]
+    for name, template, count in zip(CUSTOMS_FILES, templates, split_rows(rows, [len(t) for t in templates])):
+        write_customs(os.path.join(output_dir, name), template, int(count), rng, chunk_rows)
+        written[name] = int(count)
+
+    write_comex(os.path.join(output_dir, BRAZIL_FILE), pd.read_csv(os.path.join(template_dir, BRAZIL_FILE)),
+                rows, rng, chunk_rows)
+    written[BRAZIL_FILE] = rows
+
+    argentina_path = os.path.join(template_dir, ARGENTINA_FILE)
+    with open(argentina_path, encoding='utf-8') as f:
+        header_width = len(f.readline().rstrip('\n'))
+    write_indec(os.path.join(output_dir, ARGENTINA_FILE), pd.read_csv(argentina_path), rows, rng, chunk_rows,
+                header_width)
+    written[ARGENTINA_FILE] = rows
+    return written
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按 dataset/ 的格式生成指定行数的合成数据')
+    parser.add_argument('rows', type=float, help='每个数据源的行数，例如 1e6')
+    parser.add_argument('--output', default=None, help='输出目录，默认 ../dataset/synthetic/<行数>/')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    rows = int(args.rows)
+    output_dir = args.output or os.path.join(DATASET_DIR, 'synthetic', str(rows))
+    for name, count in generate(output_dir, rows, args.seed, chunk_rows=args.chunk_rows).items():
+        print(f"{name}: {count} 行")
+    print(f"已生成至 {output_dir}")
@@ -1,64 +1,91 @@
 import pandas as pd
-import numpy as np
-from scipy import stats
-import statsmodels.api as sm
-
-# 读取合并后的数据
-df = pd.read_csv('../dataset/merge.csv')
-df['date'] = pd.to_datetime(df['date'])
-
-def decode_trade_partner(row):
-    """根据410和502列确定贸易伙伴"""
-    if row['410'] == 0 and row['502'] == 0:
-        return 'Argentina'
-    elif row['410'] == 1:
-        return 'Brazil'
-    elif row['502'] == 1:
-        return 'USA'
-    else:
-        return 'Unknown'
-
-def decode_product_type(row):
-    """根据12019019和12019020列确定商品类型"""
-    if row['12019019'] == 1:
-        return 'GM Yellow Soybean'
-    elif row['12019020'] == 1:
-        return 'Black Soybean'
-    elif row['12019019'] == 0 and row['12019020'] == 0:
-        return 'Non-GM Yellow Soybean'
-    else:
-        return 'Unknown'
 
-# 数据预处理
-df['trade_partner'] = df.apply(decode_trade_partner, axis=1)
-df['product_type'] = df.apply(decode_product_type, axis=1)
+import results_store
+from buildcache import fingerprint, is_fresh, module_version, record
+from instrument import phase, write_report
+from loaders import load_merge
+from resampling import resampling_table
+from schema import decode
 
-# 确定进出口方向（从中国视角）
-df['is_import'] = df['12019019'] == 1  # 中国进口GM黄大豆
-df['is_export'] = df['12019020'] == 1  # 中国出口黑大豆
+MERGE_PATH = '../dataset/merge.csv'
 
-# 筛选出中国与美国的进出口数据
-df_usa = df[df['trade_partner'] == 'USA'].copy()
+# 结果文件：USA 数据切片、关税参数、指标和代码都没有变化时直接读取上次的结果，不再重复检验
+IMPORT_RESULTS_PATH = '../dataset/china_import_usa_tariff_impact.csv'
+EXPORT_RESULTS_PATH = '../dataset/china_export_usa_tariff_impact.csv'
 
 # 关税实施时间点
-tariff_date = pd.to_datetime('2025-04-09')
+TARIFF_DATE = pd.Timestamp('2025-04-09')
+
+# 进出口方向（从中国视角）
+IMPORT_PRODUCT = 12019019  # 中国进口GM黄大豆
+EXPORT_PRODUCT = 12019020  # 中国出口黑大豆
+
+# 定义指标列表
+SALES_METRICS = [
+    {"name": "price", "unit": "元/千克"},
+    {"name": "amount", "unit": "千克"},
+    {"name": "CNY", "unit": "人民币"}
+]
+
+# 结果数据库中的统一指标名和单位
+STORE_METRICS = {"price": ("price", "CNY/kg"), "amount": ("quantity", "kg"), "CNY": ("value", "CNY")}
+
+# 结果数据库中的统一检验名
+STORE_TESTS = {"独立样本 t-test": "t-test", "Mann-Whitney U 检验": "Mann-Whitney U"}
+
+
+def load_usa(path=MERGE_PATH):
+    """读取合并后的数据，返回 (中国从美国进口, 中国对美国出口)，均按日期排序"""
+    with phase('load') as p:
+        df = p.count(load_merge(path, decoded=False))
+
+    # 数据预处理：还原贸易伙伴和商品类型
+    with phase('decode', rows=len(df)):
+        decode(df)
+
+    with phase('filter') as p:
+        # 确定进出口方向（从中国视角）
+        df['is_import'] = df['product'] == IMPORT_PRODUCT
+        df['is_export'] = df['product'] == EXPORT_PRODUCT
+
+        # 筛选出中国与美国的进出口数据
+        df_usa = p.count(df[df['trade_partner'] == 'USA'].copy())
+
+    # 分离中国从美国进口数据、中国对美国出口数据
+    china_import_usa = df_usa[df_usa['is_import']].sort_values('date')
+    china_export_usa = df_usa[df_usa['is_export']].sort_values('date')
+    return china_import_usa, china_export_usa
 
-# 分离中国从美国进口数据
-china_import_usa = df_usa[df_usa['is_import'] == True].sort_values('date')
-# 分离中国对美国出口数据
-china_export_usa = df_usa[df_usa['is_export'] == True].sort_values('date')
 
 # 划分关税前后阶段
-def split_tariff_period(data):
+def split_tariff_period(data, tariff_date=TARIFF_DATE):
     """将数据分为关税前和关税后两个阶段"""
     pre_tariff = data[data['date'] < tariff_date]
     post_tariff = data[data['date'] >= tariff_date]
     return pre_tariff, post_tariff
 
-# 中国从美国进口关税前后数据
-pre_import, post_import = split_tariff_period(china_import_usa)
-# 中国对美国出口关税前后数据
-pre_export, post_export = split_tariff_period(china_export_usa)
+
+def select_test(pre_values, post_values):
+    """假设检验：t-test（如果数据正态分布）或 Mann-Whitney U 检验（非正态分布），返回 (检验方法, p值)"""
+    # scipy.stats 导入较慢，只在真正做检验时加载
+    from scipy import stats
+
+    try:
+        # 首先检查数据是否正态分布（Shapiro-Wilk 检验）
+        _, p_norm_pre = stats.shapiro(pre_values)
+        _, p_norm_post = stats.shapiro(post_values)
+
+        if p_norm_pre > 0.05 and p_norm_post > 0.05:
+            # 正态分布，使用独立样本 t-test
+            _, p_value = stats.ttest_ind(pre_values, post_values)
+            return "独立样本 t-test", p_value
+    except:
+        # 如果样本量太小（Shapiro-Wilk 检验要求样本量 3-5000），直接使用 Mann-Whitney U 检验
+        pass
+    # 非正态分布，使用 Mann-Whitney U 检验
+    _, p_value = stats.mannwhitneyu(pre_values, post_values)
+    return "Mann-Whitney U 检验", p_value
+
 
 # 定义统计模型分析函数
 def tariff_impact_analysis(pre_data, post_data, metric_name, metric_unit):
@@ -78,7 +105,7 @@ def tariff_impact_analysis(pre_data, post_data, metric_name, metric_unit):
             "p值": None,
             "显著性": "无数据"
         }
-    
+
     # 计算描述性统计
     pre_mean = pre_data[metric_name].mean()
     pre_std = pre_data[metric_name].std()
@@ -89,24 +116,7 @@ def tariff_impact_analysis(pre_data, post_data, metric_name, metric_unit):
     change = post_mean - pre_mean
     change_percent = (change / pre_mean) * 100 if pre_mean != 0 else 0
 
-    # 假设检验：t-test（如果数据正态分布）或 Mann-Whitney U 检验（非正态分布）
-    try:
-        # 首先检查数据是否正态分布（Shapiro-Wilk 检验）
-        _, p_norm_pre = stats.shapiro(pre_data[metric_name])
-        _, p_norm_post = stats.shapiro(post_data[metric_name])
-        
-        if p_norm_pre > 0.05 and p_norm_post > 0.05:
-            # 正态分布，使用独立样本 t-test
-            _, p_value = stats.ttest_ind(pre_data[metric_name], post_data[metric_name])
-            test_name = "独立样本 t-test"
-        else:
-            # 非正态分布，使用 Mann-Whitney U 检验
-            _, p_value = stats.mannwhitneyu(pre_data[metric_name], post_data[metric_name])
-            test_name = "Mann-Whitney U 检验"
-    except:
-        # 如果样本量太小（Shapiro-Wilk 检验要求样本量 3-5000），直接使用 Mann-Whitney U 检验
-        _, p_value = stats.mannwhitneyu(pre_data[metric_name], post_data[metric_name])
-        test_name = "Mann-Whitney U 检验"
+    test_name, p_value = select_test(pre_data[metric_name], post_data[metric_name])
 
     # 判断影响是否显著
     significance = "显著" if p_value < 0.05 else "不显著"
@@ -128,66 +138,153 @@ def tariff_impact_analysis(pre_data, post_data, metric_name, metric_unit):
 
     return result
 
-# 定义指标列表
-sales_metrics = [
-    {"name": "price", "unit": "元/千克"},
-    {"name": "amount", "unit": "千克"},
-    {"name": "CNY", "unit": "人民币"}
-]
 
-# 中国从美国进口的关税影响分析
-print("==================== 中国从美国进口关税影响分析 ====================")
-import_results = []
-for metric in sales_metrics:
-    result = tariff_impact_analysis(pre_import, post_import, metric["name"], metric["unit"])
-    import_results.append(result)
-    print(f"\n--- {metric['name']} ({metric['unit']}) ---")
-    for key, value in result.items():
-        if key not in ["指标", "单位"]:
-            if value is None:
-                print(f"{key}: N/A")
-            elif isinstance(value, float):
-                print(f"{key}: {value:.4f}")
-            else:
-                print(f"{key}: {value}")
-
-# 中国对美国出口的关税影响分析
-print("\n\n==================== 中国对美国出口关税影响分析 ====================")
-export_results = []
-for metric in sales_metrics:
-    result = tariff_impact_analysis(pre_export, post_export, metric["name"], metric["unit"])
-    export_results.append(result)
-    print(f"\n--- {metric['name']} ({metric['unit']}) ---")
-    for key, value in result.items():
-        if key not in ["指标", "单位"]:
-            if isinstance(value, float):
-                print(f"{key}: {value:.4f}")
-            else:
-                print(f"{key}: {value}")
-
-# 综合评估
-print("\n\n==================== 关税影响综合评估 ====================")
-
-# 进口方面
-print("\n1. 中国从美国进口影响：")
-for result in import_results:
-    trend = "上涨" if result["变化量"] > 0 else "下降"
-    print(f"   {result['指标']}: 关税后{trend}{abs(result['变化百分比(%)']):.2f}%，影响{result['显著性']}")
-
-# 出口方面
-print("\n2. 中国对美国出口影响：")
-for result in export_results:
-    trend = "上涨" if result["变化量"] > 0 else "下降"
-    print(f"   {result['指标']}: 关税后{trend}{abs(result['变化百分比(%)']):.2f}%，影响{result['显著性']}")
-
-# 输出详细结果到文件
-import_results_df = pd.DataFrame(import_results)
-export_results_df = pd.DataFrame(export_results)
-
-# 保存结果为CSV文件
-import_results_df.to_csv('../dataset/china_import_usa_tariff_impact.csv', index=False, encoding='utf-8-sig')
-export_results_df.to_csv('../dataset/china_export_usa_tariff_impact.csv', index=False, encoding='utf-8-sig')
-
-print("\n\n分析结果已保存至dataset文件夹：")
-print("- china_import_usa_tariff_impact.csv (中国从美国进口关税影响)")
-print("- china_export_usa_tariff_impact.csv (中国对美国出口关税影响)")
\ No newline at end of file
+def impact_results(pre_data, post_data, metrics=SALES_METRICS):
+    """计算各指标的关税影响，每个指标一个结果字典"""
+    results = [tariff_impact_analysis(pre_data, post_data, metric["name"], metric["unit"]) for metric in metrics]
+
+    # 样本很小（每期只有几个月），所有指标一起补充置换检验 p 值和 bootstrap 置信区间
+    names = [metric["name"] for metric in metrics]
+    resampled = resampling_table([pre_data[name] for name in names], [post_data[name] for name in names])
+    for result, (_, row) in zip(results, resampled.iterrows()):
+        result["置换检验p值"] = None if pd.isna(row["perm_p_value"]) else row["perm_p_value"]
+        result["变化量95%置信区间下限"] = None if pd.isna(row["ci_low"]) else row["ci_low"]
+        result["变化量95%置信区间上限"] = None if pd.isna(row["ci_high"]) else row["ci_high"]
+    return results
+
+
+def results_fingerprint(china_import_usa, china_export_usa, tariff_date=TARIFF_DATE, metrics=SALES_METRICS):
+    """USA 数据切片、关税参数、指标和代码的指纹"""
+    metric_columns = ['date'] + [metric["name"] for metric in metrics]
+    return fingerprint(
+        china_import_usa[metric_columns], china_export_usa[metric_columns],
+        tariff_date, metrics, module_version(__file__))
+
+
+def _read_results(path):
+    saved = pd.read_csv(path, encoding='utf-8-sig').astype(object)
+    return saved.where(saved.notna(), None).to_dict('records')
+
+
+def analyze(path=MERGE_PATH, tariff_date=TARIFF_DATE, use_cache=True):
+    """中国与美国之间大豆进出口的关税影响
+
+    返回 {'import': [...], 'export': [...], 'monthly': {...}, 'cached': bool, 'fingerprint': str}，
+    import/export 为每个指标一个结果字典，monthly 为两个方向每月的指标。use_cache 为 True 且输入、参数和代码都没有变化时
+    直接读取上次保存的结果文件。
+    """
+    china_import_usa, china_export_usa = load_usa(path)
+    fp = results_fingerprint(china_import_usa, china_export_usa, tariff_date)
+    cached = use_cache and is_fresh([IMPORT_RESULTS_PATH, EXPORT_RESULTS_PATH], fp)
+
+    with phase('test_import', rows=len(china_import_usa)):
+        if cached:
+            import_results = _read_results(IMPORT_RESULTS_PATH)
+        else:
+            import_results = impact_results(*split_tariff_period(china_import_usa, tariff_date))
+    with phase('test_export', rows=len(china_export_usa)):
+        if cached:
+            export_results = _read_results(EXPORT_RESULTS_PATH)
+        else:
+            export_results = impact_results(*split_tariff_period(china_export_usa, tariff_date))
+    monthly_columns = ['date'] + [metric["name"] for metric in SALES_METRICS]
+    return {'import': import_results, 'export': export_results, 'cached': cached, 'fingerprint': fp,
+            'monthly': {'import': china_import_usa[monthly_columns], 'export': china_export_usa[monthly_columns]}}
+
+
+def save(results):
+    """保存结果为CSV文件并记录指纹"""
+    with phase('save'):
+        pd.DataFrame(results['import']).to_csv(IMPORT_RESULTS_PATH, index=False, encoding='utf-8-sig')
+        pd.DataFrame(results['export']).to_csv(EXPORT_RESULTS_PATH, index=False, encoding='utf-8-sig')
+        record([IMPORT_RESULTS_PATH, EXPORT_RESULTS_PATH], results['fingerprint'])
+
+
+def store_records(results, partner='USA'):
+    """结果数据库的统一格式：(关税影响，每个方向每个指标一行, 每月的指标)"""
+    rows, trends = [], []
+    for direction in ('import', 'export'):
+        for result in results[direction]:
+            metric, unit = STORE_METRICS[result['指标']]
+            rows.append({
+                'subject': partner, 'flow': direction, 'metric': metric, 'unit': unit,
+                'pre_mean': result['关税前平均值'], 'post_mean': result['关税后平均值'],
+                'pre_std': result['关税前标准差'], 'post_std': result['关税后标准差'],
+                'change': result['变化量'], 'change_percent': result['变化百分比(%)'],
+                'test': STORE_TESTS.get(result['检验方法']),
+                'p_value': result['p值'], 'perm_p_value': result['置换检验p值'],
+                'ci_low': result['变化量95%置信区间下限'], 'ci_high': result['变化量95%置信区间上限'],
+            })
+        monthly = results['monthly'][direction].melt(id_vars='date', var_name='metric')
+        metrics = monthly['metric'].map(lambda name: STORE_METRICS[name][0])
+        trends.append(pd.DataFrame({'subject': partner, 'flow': direction, 'metric': metrics,
+                                    'period': monthly['date'].dt.strftime('%Y-%m'), 'value': monthly['value']}))
+    return rows, pd.concat(trends, ignore_index=True)
+
+
+def print_results(results):
+    # 中国从美国进口的关税影响分析
+    print("==================== 中国从美国进口关税影响分析 ====================")
+    for metric, result in zip(SALES_METRICS, results['import']):
+        print(f"\n--- {metric['name']} ({metric['unit']}) ---")
+        for key, value in result.items():
+            if key not in ["指标", "单位"]:
+                if value is None:
+                    print(f"{key}: N/A")
+                elif isinstance(value, float):
+                    print(f"{key}: {value:.4f}")
+                else:
+                    print(f"{key}: {value}")
+
+    # 中国对美国出口的关税影响分析
+    print("\n\n==================== 中国对美国出口关税影响分析 ====================")
+    for metric, result in zip(SALES_METRICS, results['export']):
+        print(f"\n--- {metric['name']} ({metric['unit']}) ---")
+        for key, value in result.items():
+            if key not in ["指标", "单位"]:
+                if isinstance(value, float):
+                    print(f"{key}: {value:.4f}")
+                else:
+                    print(f"{key}: {value}")
+
+    # 综合评估
+    print("\n\n==================== 关税影响综合评估 ====================")
+
+    # 进口方面
+    print("\n1. 中国从美国进口影响：")
+    for result in results['import']:
+        trend = "上涨" if result["变化量"] > 0 else "下降"
+        print(f"   {result['指标']}: 关税后{trend}{abs(result['变化百分比(%)']):.2f}%，影响{result['显著性']}")
+
+    # 出口方面
+    print("\n2. 中国对美国出口影响：")
+    for result in results['export']:
+        trend = "上涨" if result["变化量"] > 0 else "下降"
+        print(f"   {result['指标']}: 关税后{trend}{abs(result['变化百分比(%)']):.2f}%，影响{result['显著性']}")
+
+
+def main():
+    results = analyze()
+    print_results(results)
+
+    # 输出详细结果到文件
+    if results['cached']:
+        print("\n\n输入数据、参数和代码均未变化，结果文件保持不变：")
+    else:
+        save(results)
+        print("\n\n分析结果已保存至dataset文件夹：")
+    print("- china_import_usa_tariff_impact.csv (中国从美国进口关税影响)")
+    print("- china_export_usa_tariff_impact.csv (中国对美国出口关税影响)")
+
+    # 每次运行的结果都追加到结果数据库
+    with phase('store'):
+        run_id = results_store.record_run('china_usa', *store_records(results), fingerprint=results['fingerprint'],
+                                          params={'tariff_date': TARIFF_DATE})
+    print(f"结果数据库：{results_store.DB_PATH}（run_id={run_id}）")
+
+    # 各阶段耗时、CPU 时间、峰值内存和行数
+    print(f"\n运行报告：{write_report()}")
+
+
+if __name__ == '__main__':
+    main()
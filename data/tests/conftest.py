@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# 分析脚本是 data/ 下的同级模块，数据路径相对于 data/（'../dataset/'）
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DATA_DIR)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(monkeypatch):
+    """测试在 data/ 目录下运行，与直接运行脚本时相同"""
+    monkeypatch.chdir(DATA_DIR)
+    return DATA_DIR
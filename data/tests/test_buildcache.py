@@ -0,0 +1,21 @@
+import os
+
+import buildcache
+
+
+def test_module_version_covers_transitive_imports():
+    """fx 的缓存依赖 cube（ALL）、ingest（file_hash）及其导入的模块"""
+    modules = {os.path.basename(path) for path in buildcache.local_modules('fx.py')}
+    assert {'fx.py', 'cube.py', 'ingest.py', 'customs.py', 'loaders.py', 'schema.py'} <= modules
+
+
+def test_dependency_change_invalidates_version(tmp_path):
+    (tmp_path / 'a.py').write_text('import b\n')
+    (tmp_path / 'b.py').write_text('from c import value\n')
+    (tmp_path / 'c.py').write_text('value = 1\n')
+    paths = buildcache.local_modules('a.py', str(tmp_path))
+    assert [os.path.basename(path) for path in paths] == ['a.py', 'b.py', 'c.py']
+
+    before = buildcache.code_version(*paths)
+    (tmp_path / 'c.py').write_text('value = 2\n')
+    assert buildcache.code_version(*paths) != before
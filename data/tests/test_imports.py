@@ -0,0 +1,13 @@
+import pytest
+
+from benchmark import ANALYSIS_MODULES, IMPORT_BUDGET_S, import_times
+
+
+@pytest.mark.parametrize('module', ANALYSIS_MODULES)
+def test_import_budget(module):
+    """每个分析模块在新的解释器中导入：不加载重依赖，耗时不超过预算"""
+    record = import_times([module]).iloc[0]
+    assert record['error'] == ''
+    assert record['heavy'] == [], f"{module} 导入时加载了 {', '.join(record['heavy'])}（应在用到时再加载）"
+    assert record['import_s'] <= IMPORT_BUDGET_S, f"{module} 导入耗时 {record['import_s']:.2f} 秒"
+
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from loaders import DATASET_DIR, load_comex, load_indec, load_merge
+
+# 紧凑类型相对默认 read_csv 的最小内存节省倍数（实测 1.5x、3.0x、1.6x）
+MIN_SAVINGS = {'merge.csv': 1.4, 'braz.csv': 2.5, 'agen.csv': 1.5}
+
+EXPECTED_TYPES = {
+    'merge.csv': {'partner': 'int16', 'product': 'int32', 'amount': 'int64', 'CNY': 'int64', 'price': 'float64'},
+    'braz.csv': {'Year': 'int16', 'Month': 'int8', 'Country': 'category', 'US$ FOB': 'int64'},
+    'agen.csv': {'POS_NCM': 'category', 'UN': 'int8', 'CANT_DECLARACIONES': 'int16',
+                 'PESO_NETO_KILOS': 'float64', 'MONTO_FOB_DOLAR': 'float64', 'PRECIO_PROMEDIO': 'float64'},
+}
+DATE_COLUMNS = {'merge.csv': 'date', 'agen.csv': 'FECHA_'}
+
+LOADERS = {
+    'merge.csv': lambda path: load_merge(path, decoded=False),
+    'braz.csv': load_comex,
+    'agen.csv': load_indec,
+}
+
+
+def _memory(df):
+    return df.memory_usage(deep=True).sum()
+
+
+@pytest.mark.parametrize('name', list(LOADERS))
+def test_compact_types(name):
+    typed = LOADERS[name](DATASET_DIR + name)
+    assert {column: str(typed[column].dtype) for column in EXPECTED_TYPES[name]} == EXPECTED_TYPES[name]
+    if name in DATE_COLUMNS:
+        assert typed[DATE_COLUMNS[name]].dtype.kind == 'M'
+
+
+@pytest.mark.parametrize('name', list(LOADERS))
+def test_memory_savings(name):
+    untyped = pd.read_csv(DATASET_DIR + name)
+    typed = LOADERS[name](DATASET_DIR + name)
+    assert _memory(untyped) / _memory(typed) >= MIN_SAVINGS[name]
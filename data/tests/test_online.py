@@ -0,0 +1,23 @@
+import pytest
+
+import online
+import tariff_model
+from cube import china_facts
+from loaders import load_merge
+
+
+def test_china_tests_match_tariff_model(tmp_path):
+    """由运行状态得到的 USA 进出口检验方法和 p 值与 tariff_model 相同"""
+    connection = online.connect(str(tmp_path / 'online.sqlite'))
+    try:
+        online.update(connection, 'china', china_facts(load_merge(tariff_model.MERGE_PATH)))
+        impact = online.impact_table(connection).set_index(['subject', 'product', 'metric'])
+    finally:
+        connection.close()
+
+    for data in tariff_model.load_usa():
+        product = data['product_type'].iloc[0]
+        for result in tariff_model.impact_results(*tariff_model.split_tariff_period(data)):
+            row = impact.loc[('USA', product, result['指标'])]
+            assert row['test'] == tariff_model.STORE_TESTS[result['检验方法']]
+            assert row['p_value'] == pytest.approx(result['p值'], rel=1e-9)
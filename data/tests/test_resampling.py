@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+import resampling
+from resampling import resampling_table
+
+
+def _samples(sizes, seed=1):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(size=n) for n, _ in sizes], [rng.normal(size=n) for _, n in sizes]
+
+
+def test_single_series_matches_batched():
+    """同一序列单独计算与和其他序列一起批量计算的结果相同"""
+    pre_samples, post_samples = _samples([(3, 4), (12, 7), (12, 7), (5, 30)])
+    batched = resampling_table(pre_samples, post_samples)
+    for i in range(len(pre_samples)):
+        single = resampling_table(pre_samples[i:i + 1], post_samples[i:i + 1])
+        pd.testing.assert_frame_equal(single, batched.iloc[[i]].reset_index(drop=True))
+
+
+def test_chunking_does_not_change_results(monkeypatch):
+    """分块大小只影响内存，不影响 p 值和置信区间（精确和随机置换都覆盖）"""
+    pre_samples, post_samples = _samples([(3, 4), (1, 40), (12, 7), (60, 80)])
+    whole = resampling_table(pre_samples, post_samples)
+    monkeypatch.setattr(resampling, 'CHUNK_ELEMENTS', 37)
+    pd.testing.assert_frame_equal(resampling_table(pre_samples, post_samples), whole)
@@ -0,0 +1,24 @@
+import pytest
+
+import brazil_export_analysis as brazil
+import server
+from loaders import load_comex
+from market_share import monthly_pivot
+
+
+@pytest.fixture
+def data():
+    return {'braz_pivot': monthly_pivot(load_comex(brazil.BRAZ_PATH))}
+
+
+def test_brazil_share(data):
+    share = server.brazil_share(data, 'China', 2025)
+    assert 0 < share['pre'] < 100 and 0 < share['post'] < 100
+    assert share['change'] == pytest.approx(share['post'] - share['pre'])
+
+
+@pytest.mark.parametrize('country, year', [('Nowhere', 2025), ('China', 2030)])
+def test_brazil_share_without_data(data, country, year):
+    """未知目的地或没有数据的年份返回 400，而不是份额 0"""
+    with pytest.raises(LookupError):
+        server.brazil_share(data, country, year)